@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# Program make_synthetic.py
+# v 1.0
+#
+# Writes synthetic input files for the benchmarks: g.vcf files shaped like the GATK
+# HaplotypeCaller output read by gvcf_to_maple_haploid.py, .maple files as written by
+# gvcf_to_maple_haploid.py, and .bed masking regions for mask_maple.py.
+# The files are made from a seeded random number generator, the same arguments always
+# give the same files.
+#
+
+import sys
+import zlib
+import random
+import struct
+import argparse
+
+# Largest amount of data compressed into one BGZF block, as bgzip does
+BGZF_BLOCK_SIZE = 0xff00
+
+# An empty BGZF block, the end of file marker
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+# The default mix of g.vcf line types, as weights
+GVCF_MIX = {'reference': 40, 'snp': 20, 'insertion': 3, 'deletion': 3, 'star': 2, 'nocall': 2}
+
+
+def bgzf_block(data):
+
+    #  Returns data compressed as one BGZF block (a gzip member with the 'BC' extra subfield).
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, ord('B'), ord('C'), 2,
+                         len(deflated) + 25)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+#
+#END of def bgzf_block(data):
+#
+
+
+class BgzfWriter:
+
+    #  A binary file object writing BGZF (bgzip) compressed data, as read by
+    #  gvcf_to_maple_haploid.py -t.
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.pending = bytearray()
+
+    def write(self, data):
+        self.pending += data
+        while len(self.pending) >= BGZF_BLOCK_SIZE:
+            self.file.write(bgzf_block(bytes(self.pending[:BGZF_BLOCK_SIZE])))
+            del self.pending[:BGZF_BLOCK_SIZE]
+
+    def close(self):
+        if self.pending:
+            self.file.write(bgzf_block(bytes(self.pending)))
+        self.file.write(BGZF_EOF)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+#
+#END of class BgzfWriter:
+#
+
+
+def gvcf_lines(rng, sample, contigs, records_per_contig, mix=None):
+
+    #  Yields the lines of a synthetic g.vcf file.
+    #
+    #  Arguments:
+    #      rng (random.Random): the random number generator.
+    #      sample (str): the sample name of the last column.
+    #      contigs (int): the number of contigs (chromosomes).
+    #      records_per_contig (int): the number of data lines of each contig.
+    #      mix (dict): weights of the line types 'reference' (a <NON_REF> block), 'snp',
+    #                  'insertion', 'deletion', 'star' (a '*' allele) and 'nocall'
+    #                  (GT:GQ:PL or GT:PL, no read depth); default GVCF_MIX.
+    #
+    #  Yields:
+    #     str: each line, including the newline.
+
+    mix = mix or GVCF_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    names = [f"CP0435{31 + contig}.1" for contig in range(contigs)]
+
+    yield "##fileformat=VCFv4.2\n"
+    yield '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+    for name in names:
+        yield f"##contig=<ID={name},length={records_per_contig * 200}>\n"
+    yield f"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{sample}\n"
+
+    for name in names:
+        position = 1
+        for kind in rng.choices(kinds, weights, k=records_per_contig):
+            ref = rng.choice('ACGT')
+            alt = rng.choice([base for base in 'ACGT' if base != ref])
+            DP = rng.choice((0, 3, 12, 25, 40, 97, 140))
+            GQ = rng.choice((0, 20, 60, 99, 99, 99))
+            if kind == 'reference':
+                end = position + rng.randint(0, 400)
+                yield (f"{name}\t{position}\t.\t{ref}\t<NON_REF>\t.\t.\tEND={end}\tGT:DP:GQ:MIN_DP:PL\t"
+                       f"0:{DP}:{GQ}:{DP // 2}:0,{GQ * 10}\n")
+                position = end + 1
+                continue
+            if kind == 'snp':
+                allele = rng.choice((0, 1, 1, 1))
+                line = (f"{name}\t{position}\t.\t{ref}\t{alt},<NON_REF>\t{DP * 40}.04\t.\tDP={DP};MLEAC=1,0\t"
+                        f"GT:AD:DP:GQ:PL:SB\t{allele}:0,{DP},0:{DP}:{GQ}:{GQ * 40},0,{GQ * 40}:0,0,{DP // 2},{DP // 2}\n")
+            elif kind == 'insertion':
+                line = (f"{name}\t{position}\t.\t{ref}\t{ref}{alt}{alt},<NON_REF>\t{DP * 40}.01\t.\tDP={DP}\t"
+                        f"GT:AD:DP:GQ:PL:SB\t1:0,{DP},0:{DP}:{GQ}:{GQ * 40},0,{GQ * 40}:0,0,{DP // 2},{DP // 2}\n")
+            elif kind == 'deletion':
+                line = (f"{name}\t{position}\t.\t{ref}{alt}{alt}\t{ref},<NON_REF>\t{DP * 40}.01\t.\tDP={DP}\t"
+                        f"GT:AD:DP:GQ:PL:SB\t1:0,{DP},0:{DP}:{GQ}:{GQ * 40},0,{GQ * 40}:0,0,{DP // 2},{DP // 2}\n")
+            elif kind == 'star':
+                line = (f"{name}\t{position}\t.\t{ref}\t*,{alt},<NON_REF>\t{DP * 40}.01\t.\tDP={DP}\t"
+                        f"GT:AD:DP:GQ:PL:SB\t1:0,{DP},0,0:{DP}:{GQ}:{GQ * 40},0,{GQ * 40},0,0,0:0,0,{DP // 2},{DP // 2}\n")
+            elif rng.random() < 0.5:
+                line = f"{name}\t{position}\t.\t{ref}\t{alt},<NON_REF>\t0\t.\tMLEAC=0,0;MLEAF=NaN,NaN\tGT:GQ:PL\t.:0:0,0,0\n"
+            else:
+                line = f"{name}\t{position}\t.\t{ref}\t{alt},<NON_REF>\t0.01\t.\tMLEAC=0,0;MLEAF=NaN,NaN\tGT:PL\t.:0,0,0\n"
+            yield line
+            position += 1 + (2 if kind == 'deletion' else 0)
+
+#
+#END of def gvcf_lines(rng, sample, contigs, records_per_contig, mix=None):
+#
+
+
+def maple_lines(rng, samples, contigs, records_per_sample, n_density=0.3, deletion_density=0.05):
+
+    #  Yields the lines of a synthetic .maple file.
+    #
+    #  Arguments:
+    #      rng (random.Random): the random number generator.
+    #      samples (list): the sample names, one block of records per sample and contig.
+    #      contigs (int): the number of contigs, headers are '>sample_contig#'.
+    #      records_per_sample (int): the number of records of each sample, over all contigs.
+    #      n_density (float): the fraction of records that are 'n' runs.
+    #      deletion_density (float): the fraction of records that are '-' runs.
+    #
+    #  Yields:
+    #     str: each line, including the newline.
+
+    per_contig = max(records_per_sample // contigs, 1)
+    for sample in samples:
+        for contig in range(1, contigs + 1):
+            yield f">{sample}_{contig}\n"
+            position = rng.randint(1, 50)
+            for record in range(per_contig):
+                kind = rng.random()
+                if kind < n_density:
+                    length = rng.choice((1, 1, 2, 5, 20, 100, 400))
+                    yield f"n\t{position}\t{length}\n"
+                    position += length + rng.randint(1, 30)
+                elif kind < n_density + deletion_density:
+                    length = rng.randint(1, 12)
+                    yield f"-\t{position}\t{length}\n"
+                    position += length + rng.randint(1, 30)
+                else:
+                    yield f"{rng.choice('ACGT')}\t{position}\n"
+                    position += rng.randint(1, 60)
+
+#
+#END of def maple_lines(rng, samples, contigs, records_per_sample, n_density=0.3, deletion_density=0.05):
+#
+
+
+def bed_lines(rng, contigs, regions_per_contig, contig_length, mean_region_size=200):
+
+    #  Yields the lines of a synthetic .bed file of masking regions, sorted and not overlapping.
+    #
+    #  Arguments:
+    #      rng (random.Random): the random number generator.
+    #      contigs (int): the number of contigs, named 'chr1', 'chr2' ...
+    #      regions_per_contig (int): the number of masking regions of each contig.
+    #      contig_length (int): the regions are spread over positions 0 to contig_length.
+    #      mean_region_size (int): the mean length of a masking region.
+    #
+    #  Yields:
+    #     str: each line, including the newline.
+
+    gap = max(contig_length // max(regions_per_contig, 1) - mean_region_size, 1)
+    for contig in range(1, contigs + 1):
+        end = 0
+        for region in range(regions_per_contig):
+            start = end + rng.randint(1, 2 * gap)
+            end = start + rng.randint(1, 2 * mean_region_size)
+            yield f"chr{contig}\t{start}\t{end}\tTR\n"
+
+#
+#END of def bed_lines(rng, contigs, regions_per_contig, contig_length, mean_region_size=200):
+#
+
+
+def write_lines(path, lines, compress=False):
+
+    #  Writes lines to path, BGZF compressed with compress.
+
+    if compress:
+        with BgzfWriter(path) as fout:
+            chunk = []
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= 4096:
+                    fout.write("".join(chunk).encode())
+                    chunk = []
+            fout.write("".join(chunk).encode())
+    else:
+        with open(path, 'w') as fout:
+            fout.writelines(lines)
+
+#
+#END of def write_lines(path, lines, compress=False):
+#
+
+
+def process_arguments_synthetic():
+
+    #  Reads the command line arguments.
+
+    parser = argparse.ArgumentParser(description='''Writes a synthetic input file for the benchmarks.
+     Writes one of:
+      gvcf  - a g.vcf file (BGZF compressed if the name ends with .gz)
+      maple - a .maple file of one or more samples
+      bed   - a .bed file of masking regions'''
+    ,formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('kind',choices=['gvcf','maple','bed'],help='The kind of file to write.')
+    parser.add_argument('output_file',help='The name of the file to write.')
+    parser.add_argument('--seed',type=int,default=1,help='The random seed; default 1.')
+    parser.add_argument('--contigs',type=int,default=1,help='The number of contigs; default 1.')
+    parser.add_argument('--records',type=int,default=100000,help='gvcf: data lines per contig, maple: records per sample, bed: regions per contig;\ndefault 100000.')
+    parser.add_argument('--samples',type=int,default=1,help='maple: the number of samples; default 1.')
+    parser.add_argument('--n_density',type=float,default=0.3,help="maple: the fraction of records that are 'n' runs; default 0.3.")
+    parser.add_argument('--contig_length',type=int,default=5000000,help='bed: the length of each contig; default 5000000.')
+    parser.add_argument('--region_size',type=int,default=200,help='bed: the mean masking region length; default 200.')
+    parser.add_argument('--mix',help="gvcf: weights of the line types, e.g. 'reference=40,snp=20,insertion=3,deletion=3,star=2,nocall=2'.")
+    return parser.parse_args()
+
+#
+#END of def process_arguments_synthetic():
+#
+
+
+if __name__ == "__main__":
+
+    args = process_arguments_synthetic()
+    rng = random.Random(args.seed)
+
+    if args.kind == 'gvcf':
+        mix = None
+        if args.mix:
+            mix = {kind: float(weight) for kind, weight in (item.split('=') for item in args.mix.split(','))}
+            unknown = set(mix) - set(GVCF_MIX)
+            if unknown:
+                sys.exit(f"Error: unknown g.vcf line types {sorted(unknown)}, use {sorted(GVCF_MIX)}")
+        sample = args.output_file.split('/')[-1].split('.')[0]
+        write_lines(args.output_file, gvcf_lines(rng, sample, args.contigs, args.records, mix),
+                    args.output_file.endswith('.gz'))
+    elif args.kind == 'maple':
+        samples = [f"SYN{number:05d}" for number in range(1, args.samples + 1)]
+        write_lines(args.output_file, maple_lines(rng, samples, args.contigs, args.records, args.n_density))
+    else:
+        write_lines(args.output_file, bed_lines(rng, args.contigs, args.records, args.contig_length, args.region_size))
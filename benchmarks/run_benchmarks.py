@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+# Program run_benchmarks.py
+# v 1.0
+#
+# Times gvcf_to_maple_haploid.py and mask_maple.py on synthetic inputs from make_synthetic.py.
+# Each scenario runs the command line tool as a subprocess and reports its wall time,
+# records per second, input MB per second and peak resident memory.  The results are
+# written as JSON so that runs on different versions can be compared.
+#
+# Every scenario that uses a faster code path (threads, worker processes, the numpy
+# engine, binary maple files) is also checked to give byte identical output to the
+# default code path, and optionally to a reference copy of each script.
+#
+
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'maple_io'))
+sys.path.append(os.path.join(HERE, '..', 'maple_binary'))
+import make_synthetic
+import maple_io
+import maple_binary
+
+CONVERTER = os.path.join(HERE, '..', 'gvcf_to_maple_haploid', 'gvcf_to_maple_haploid.py')
+MASKER = os.path.join(HERE, '..', 'mask_maple', 'mask_maple.py')
+
+
+def run_timed(command, cwd):
+
+    #  Runs a command and measures it.
+    #
+    #  Arguments:
+    #      command (list): the command and its arguments.
+    #      cwd (str): the working directory.
+    #
+    #  Returns:
+    #     tuple: (wall seconds, peak resident memory in MB)
+    #
+    #  Raises:
+    #     RuntimeError: the command exits with an error.
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr = process.stderr.read()
+    pid, status, rusage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    process.stderr.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}: {stderr.decode().strip()}")
+
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = rusage.ru_maxrss / (1 << 20 if sys.platform == 'darwin' else 1 << 10)
+    return seconds, peak
+
+#
+#END of def run_timed(command, cwd):
+#
+
+
+def make_inputs(work_dir, scale, seed):
+
+    #  Writes the synthetic inputs of the scenarios into work_dir.
+    #
+    #  Arguments:
+    #      work_dir (str): the directory for the inputs.
+    #      scale (float): multiplies the size of every input, 1 is a few seconds per scenario.
+    #      seed (int): the random seed.
+    #
+    #  Returns:
+    #     dict: the input paths and their record counts.
+
+    rng = random.Random(seed)
+    gvcf_records = max(int(100000 * scale), 100)
+    maple_records = max(int(200000 * scale), 100)
+    inputs = {'gvcf_records': 3 * gvcf_records, 'maple_records': maple_records,
+              'batch_samples': 8, 'combined_samples': 20}
+
+    inputs['gvcf'] = os.path.join(work_dir, 'SYN00001.g.vcf')
+    make_synthetic.write_lines(inputs['gvcf'], make_synthetic.gvcf_lines(rng, 'SYN00001', 3, gvcf_records))
+    inputs['gvcf_gz'] = os.path.join(work_dir, 'SYN00002.g.vcf.gz')
+    make_synthetic.write_lines(inputs['gvcf_gz'], make_synthetic.gvcf_lines(rng, 'SYN00002', 3, gvcf_records), True)
+    # the quality file of the g.vcf.gz (-q), written next to the input as the scenarios name the contigs
+    subprocess.run([sys.executable, CONVERTER, '-i', os.path.basename(inputs['gvcf_gz']), '-d', 'quality', '-q'],
+                   cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+    inputs['quality'] = os.path.join(work_dir, 'quality', 'SYN00002.mapleq')
+
+    os.makedirs(os.path.join(work_dir, 'batch'), exist_ok=True)
+    batch_records = max(gvcf_records // 4, 100)
+    inputs['batch_records'] = inputs['batch_samples'] * 3 * batch_records
+    for sample in range(inputs['batch_samples']):
+        name = f"SYN{100 + sample:05d}"
+        make_synthetic.write_lines(os.path.join(work_dir, 'batch', f"{name}.g.vcf.gz"),
+                                   make_synthetic.gvcf_lines(rng, name, 3, batch_records), True)
+
+    inputs['bed'] = os.path.join(work_dir, 'mask.bed')
+    make_synthetic.write_lines(inputs['bed'], make_synthetic.bed_lines(rng, 3, max(int(5000 * scale), 10), maple_records * 10))
+    inputs['bed_chr1'] = os.path.join(work_dir, 'mask_chr1.bed')
+    make_synthetic.write_lines(inputs['bed_chr1'], make_synthetic.bed_lines(rng, 1, max(int(15000 * scale), 10), maple_records * 30))
+    inputs['contig_map'] = os.path.join(work_dir, 'contig.map')
+    with open(inputs['contig_map'], 'w') as fout:
+        fout.writelines(f"{contig}\tchr{contig}\n" for contig in range(1, 4))
+
+    os.makedirs(os.path.join(work_dir, 'maples'), exist_ok=True)
+    maple_files = []
+    for sample in range(4):
+        name = f"SYN{200 + sample:05d}"
+        path = os.path.join(work_dir, 'maples', f"{name}.maple")
+        make_synthetic.write_lines(path, make_synthetic.maple_lines(rng, [name], 1, maple_records))
+        maple_binary.convert_maple_file(path)
+        maple_files.append(path)
+    inputs['maple_records'] = 4 * maple_records
+    inputs['maple_list'] = os.path.join(work_dir, 'maples.list')
+    with open(inputs['maple_list'], 'w') as fout:
+        fout.writelines(f"{path}\n" for path in maple_files)
+    inputs['maple_binary_list'] = os.path.join(work_dir, 'maples_binary.list')
+    with open(inputs['maple_binary_list'], 'w') as fout:
+        fout.writelines(f"{path}b\n" for path in maple_files)
+
+    inputs['combined'] = os.path.join(work_dir, 'combined.maple')
+    samples = [f"SYN{300 + sample:05d}" for sample in range(inputs['combined_samples'])]
+    combined_records = max(maple_records // 4, 100)
+    make_synthetic.write_lines(inputs['combined'], make_synthetic.maple_lines(rng, samples, 3, combined_records))
+    inputs['combined_records'] = inputs['combined_samples'] * combined_records
+    return inputs
+
+#
+#END of def make_inputs(work_dir, scale, seed):
+#
+
+
+def scenarios(inputs, jobs, threads):
+
+    #  Returns the benchmark scenarios.
+    #
+    #  Each scenario is a dict with 'name', 'tool', 'args' (the tool arguments, '{out}' is replaced
+    #  by the output directory), 'records' and 'bytes' (the input size), 'outputs' (the output
+    #  files compared between scenarios, relative to the output directory) and 'same_as' (the
+    #  scenario whose outputs must be byte identical), 'binary' if the outputs are binary maple
+    #  files compared as text.  A scenario with 'reference_args' is also compared with a reference
+    #  copy of its tool run with these arguments, those of the first release (the 'reference_inputs'
+    #  are copied into '{out}' as the first release writes the maple file next to its input).
+
+    def size(*paths):
+        return sum(os.path.getsize(path) for path in paths)
+
+    batch_dir = os.path.join(os.path.dirname(inputs['gvcf']), 'batch')
+    batch_files = sorted(os.path.join(batch_dir, name) for name in os.listdir(batch_dir))
+    batch_outputs = [os.path.basename(path).replace('.g.vcf.gz', '.maple') for path in batch_files]
+    with open(inputs['maple_list']) as fin:
+        maple_outputs = [os.path.basename(line.strip()) for line in fin]
+    maple_size = size(*(line.strip() for line in open(inputs['maple_list'])))
+    mask = ['-m', inputs['bed'], '-C', inputs['contig_map']]
+    mask_list = ['-m', inputs['bed_chr1']]
+    threshold = ['-DP', '20', '-GQ', '99', '-o', 'AND']
+    sweep = [('20', '99', 'AND'), ('10', '90', 'AND'), ('20', '50', 'OR'), ('5', '0', 'AND')]
+    # the converter names the contigs after its input path, relative to the work directory the
+    # scenarios run in, as the reference is run next to its copy of the input
+    gvcf, gvcf_gz = os.path.basename(inputs['gvcf']), os.path.basename(inputs['gvcf_gz'])
+
+    return [
+        {'name': 'convert_plain', 'tool': CONVERTER, 'args': ['-i', gvcf, '-d', '{out}'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf']), 'outputs': ['SYN00001.maple'],
+         'reference_args': ['-i', gvcf] + threshold, 'reference_inputs': [inputs['gvcf']]},
+        {'name': 'convert_bgzf', 'tool': CONVERTER, 'args': ['-i', gvcf_gz, '-d', '{out}'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']), 'outputs': ['SYN00002.maple'],
+         'reference_args': ['-i', gvcf_gz] + threshold, 'reference_inputs': [inputs['gvcf_gz']]},
+        {'name': 'convert_numpy', 'tool': CONVERTER, 'args': ['-i', gvcf_gz, '-d', '{out}', '-e', 'numpy'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']), 'outputs': ['SYN00002.maple'],
+         'same_as': 'convert_bgzf'},
+        {'name': 'convert_bgzf_threads', 'tool': CONVERTER,
+         'args': ['-i', gvcf_gz, '-d', '{out}', '-t', str(threads)] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']), 'outputs': ['SYN00002.maple'],
+         'same_as': 'convert_bgzf'},
+        {'name': 'convert_binary', 'tool': CONVERTER, 'args': ['-i', gvcf_gz, '-d', '{out}', '--binary'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']), 'outputs': ['SYN00002.maple'],
+         'same_as': 'convert_bgzf', 'binary': True},
+        {'name': 'convert_masked', 'tool': CONVERTER, 'args': ['-i', gvcf_gz, '-d', '{out}',
+         '-m', inputs['bed'], '--mask_contig_map', inputs['contig_map']] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']), 'outputs': ['SYN00002.maple']},
+        {'name': 'convert_sweep', 'tool': CONVERTER,
+         'args': ['-i', gvcf_gz, '-d', '{out}', '-s', ','.join(':'.join(combination) for combination in sweep)],
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['gvcf_gz']),
+         'outputs': ['SYN00002_DP%s_GQ%s_%s.maple' % combination for combination in sweep]},
+        {'name': 'convert_quality', 'tool': CONVERTER, 'args': ['-i', inputs['quality'], '-d', '{out}'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['quality']), 'outputs': ['SYN00002.maple'],
+         'same_as': 'convert_bgzf'},
+        {'name': 'convert_quality_numpy', 'tool': CONVERTER,
+         'args': ['-i', inputs['quality'], '-d', '{out}', '-e', 'numpy'] + threshold,
+         'records': inputs['gvcf_records'], 'bytes': size(inputs['quality']), 'outputs': ['SYN00002.maple'],
+         'same_as': 'convert_bgzf'},
+        {'name': 'convert_batch_serial', 'tool': CONVERTER, 'args': ['-b', os.path.join(batch_dir, '*.g.vcf.gz'), '-d', '{out}'] + threshold,
+         'records': inputs['batch_records'], 'bytes': size(*batch_files), 'outputs': batch_outputs},
+        {'name': 'convert_batch_jobs', 'tool': CONVERTER,
+         'args': ['-b', os.path.join(batch_dir, '*.g.vcf.gz'), '-d', '{out}', '-j', str(jobs)] + threshold,
+         'records': inputs['batch_records'], 'bytes': size(*batch_files), 'outputs': batch_outputs,
+         'same_as': 'convert_batch_serial'},
+        {'name': 'mask_python', 'tool': MASKER, 'args': ['-l', inputs['maple_list'], '-d', '{out}'] + mask_list,
+         'records': inputs['maple_records'], 'bytes': maple_size, 'outputs': maple_outputs,
+         'reference_args': ['-l', inputs['maple_list'], '-d', '{out}'] + mask_list},
+        {'name': 'mask_numpy', 'tool': MASKER, 'args': ['-l', inputs['maple_list'], '-d', '{out}', '-e', 'numpy'] + mask_list,
+         'records': inputs['maple_records'], 'bytes': maple_size, 'outputs': maple_outputs, 'same_as': 'mask_python'},
+        {'name': 'mask_mmap', 'tool': MASKER, 'args': ['-l', inputs['maple_list'], '-d', '{out}', '-e', 'mmap'] + mask_list,
+         'records': inputs['maple_records'], 'bytes': maple_size, 'outputs': maple_outputs, 'same_as': 'mask_python'},
+        {'name': 'mask_jobs', 'tool': MASKER, 'args': ['-l', inputs['maple_list'], '-d', '{out}', '-j', str(jobs)] + mask_list,
+         'records': inputs['maple_records'], 'bytes': maple_size, 'outputs': maple_outputs, 'same_as': 'mask_python'},
+        {'name': 'mask_numpy_binary', 'tool': MASKER,
+         'args': ['-l', inputs['maple_binary_list'], '-d', '{out}', '-e', 'numpy', '--binary'] + mask_list,
+         'records': inputs['maple_records'], 'bytes': size(*(line.strip() for line in open(inputs['maple_binary_list']))),
+         'outputs': maple_outputs, 'same_as': 'mask_python', 'binary': True},
+        {'name': 'mask_combined_python', 'tool': MASKER, 'args': ['-i', inputs['combined'], '-o', '{out}/combined.maple'] + mask,
+         'records': inputs['combined_records'], 'bytes': size(inputs['combined']), 'outputs': ['combined.maple']},
+        {'name': 'mask_combined_numpy', 'tool': MASKER,
+         'args': ['-i', inputs['combined'], '-o', '{out}/combined.maple', '-e', 'numpy'] + mask,
+         'records': inputs['combined_records'], 'bytes': size(inputs['combined']), 'outputs': ['combined.maple'],
+         'same_as': 'mask_combined_python'},
+        {'name': 'mask_combined_mmap', 'tool': MASKER,
+         'args': ['-i', inputs['combined'], '-o', '{out}/combined.maple', '-e', 'mmap'] + mask,
+         'records': inputs['combined_records'], 'bytes': size(inputs['combined']), 'outputs': ['combined.maple'],
+         'same_as': 'mask_combined_python'},
+    ]
+
+#
+#END of def scenarios(inputs, jobs, threads):
+#
+
+
+def read_output(scenario, out_dir, name):
+
+    #  Returns the bytes of an output file of a scenario, a binary maple file as its text.
+
+    if scenario.get('binary'):
+        path = os.path.join(out_dir, maple_binary.binary_filename(name))
+        with open(path, 'rb') as fin:
+            return "".join(maple_io.format_maple_record(record)
+                           for record in maple_binary.read_maple_binary(fin)).encode()
+    with open(os.path.join(out_dir, name), 'rb') as fin:
+        return fin.read()
+
+#
+#END of def read_output(scenario, out_dir, name):
+#
+
+
+def run_scenario(scenario, work_dir, repeat, reference=None):
+
+    #  Runs a scenario repeat times and checks its output.
+    #
+    #  Arguments:
+    #      scenario (dict): from scenarios().
+    #      work_dir (str): the directory of the inputs, outputs go under work_dir/out.
+    #      repeat (int): the number of runs, the fastest is reported.
+    #      reference (str): a reference copy of the scenario's tool to compare the output with, or None,
+    #                       see 'reference_args' in scenarios().
+    #
+    #  Returns:
+    #     dict: the result of the scenario.
+
+    out_dir = os.path.join(work_dir, 'out', scenario['name'])
+    runs = []
+    for run in range(repeat):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        args = [arg.replace('{out}', out_dir) for arg in scenario['args']]
+        runs.append(run_timed([sys.executable, scenario['tool']] + args, work_dir))
+
+    seconds = min(run[0] for run in runs)
+    result = {'name': scenario['name'], 'tool': os.path.basename(scenario['tool']),
+              'args': [arg.replace(work_dir, '.') for arg in scenario['args']],
+              'records': scenario['records'], 'input_bytes': scenario['bytes'],
+              'seconds': round(seconds, 4), 'all_seconds': [round(run[0], 4) for run in runs],
+              'records_per_second': round(scenario['records'] / seconds, 1),
+              'mb_per_second': round(scenario['bytes'] / (1 << 20) / seconds, 3),
+              'peak_rss_mb': round(max(run[1] for run in runs), 1)}
+
+    if reference and scenario.get('reference_args'):
+        reference_dir = out_dir + '_reference'
+        shutil.rmtree(reference_dir, ignore_errors=True)
+        os.makedirs(reference_dir)
+        for path in scenario.get('reference_inputs', []):
+            shutil.copy(path, reference_dir)
+        args = [arg.replace('{out}', reference_dir) for arg in scenario['reference_args']]
+        run_timed([sys.executable, os.path.abspath(reference)] + args, reference_dir if scenario.get('reference_inputs') else work_dir)
+        result['same_as_reference'] = all(read_output(scenario, out_dir, name) == read_output({}, reference_dir, name)
+                                          for name in scenario['outputs'])
+    return result
+
+#
+#END of def run_scenario(scenario, work_dir, repeat, reference=None):
+#
+
+
+def check_identical(scenario, work_dir):
+
+    #  Compares the outputs of a scenario with those of its 'same_as' scenario.
+    #
+    #  Returns:
+    #     list: the output files that differ.
+
+    out_dir = os.path.join(work_dir, 'out', scenario['name'])
+    same_dir = os.path.join(work_dir, 'out', scenario['same_as'])
+    return [name for name in scenario['outputs']
+            if read_output(scenario, out_dir, name) != read_output({}, same_dir, name)]
+
+#
+#END of def check_identical(scenario, work_dir):
+#
+
+
+def git_commit():
+
+    #  Returns the git commit of the scripts, or None outside of a git checkout.
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#
+#END of def git_commit():
+#
+
+
+def process_arguments_benchmarks():
+
+    #  Reads the command line arguments.
+
+    parser = argparse.ArgumentParser(description='''Times gvcf_to_maple_haploid.py and mask_maple.py on synthetic inputs.
+     Writes:
+      a JSON file of results, one entry per scenario with seconds, records/s, MB/s and peak RSS
+     Checks:
+      that every faster code path gives byte identical output to the default code path'''
+    ,formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-o','--output_json',help='The JSON results file; default benchmark_results.json.',default='benchmark_results.json')
+    parser.add_argument('-w','--work_dir',help='The directory for the synthetic inputs and outputs; default bench_work.',default='bench_work')
+    parser.add_argument('-s','--scale',type=float,default=1.0,help='Multiplies the input sizes; default 1.')
+    parser.add_argument('-r','--repeat',type=int,default=3,help='Runs of each scenario, the fastest is reported; default 3.')
+    parser.add_argument('-k','--scenario',action='append',help='Run only the scenarios with this name (repeatable); default all.')
+    parser.add_argument('-j','--jobs',type=int,default=4,help='Worker processes for the -j scenarios; default 4.')
+    parser.add_argument('-t','--threads',type=int,default=4,help='Threads for the -t scenario; default 4.')
+    parser.add_argument('--seed',type=int,default=1,help='The random seed of the inputs; default 1.')
+    parser.add_argument('--reference_converter',help='A reference copy of gvcf_to_maple_haploid.py, e.g. from an earlier release,\nwhose output the\nconvert_plain and convert_bgzf scenarios must match.')
+    parser.add_argument('--reference_masker',help='A reference copy of mask_maple.py whose output the mask_python scenario must match.')
+    parser.add_argument('--keep',action='store_true',help='Keep the work directory.')
+    return parser.parse_args()
+
+#
+#END of def process_arguments_benchmarks():
+#
+
+
+if __name__ == "__main__":
+
+    args = process_arguments_benchmarks()
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+    print(f"Writing synthetic inputs to {work_dir}", file=sys.stderr)
+    inputs = make_inputs(work_dir, args.scale, args.seed)
+    selected = scenarios(inputs, args.jobs, args.threads)
+    if args.scenario:
+        # a scenario checked against another needs the other one too
+        names = set(args.scenario) | {scenario.get('same_as') for scenario in selected if scenario['name'] in args.scenario}
+        selected = [scenario for scenario in selected if scenario['name'] in names]
+    references = {CONVERTER: args.reference_converter, MASKER: args.reference_masker}
+
+    results = []
+    failed = False
+    for scenario in selected:
+        try:
+            result = run_scenario(scenario, work_dir, args.repeat, references[scenario['tool']])
+        except RuntimeError as e:
+            print(f"FAILED {scenario['name']}: {e}", file=sys.stderr)
+            results.append({'name': scenario['name'], 'error': str(e)})
+            failed = True
+            continue
+        if scenario.get('same_as') and any(result['name'] == scenario['same_as'] for result in results):
+            differ = check_identical(scenario, work_dir)
+            result['identical_to'] = scenario['same_as']
+            result['identical'] = not differ
+            if differ:
+                print(f"DIFFERS {scenario['name']} from {scenario['same_as']}: {', '.join(differ)}", file=sys.stderr)
+                failed = True
+        if result.get('same_as_reference') is False:
+            print(f"DIFFERS {scenario['name']} from the reference script", file=sys.stderr)
+            failed = True
+        results.append(result)
+        print(f"{result['name']:24} {result['seconds']:8.3f}s {result['records_per_second']:12.0f} records/s "
+              f"{result['mb_per_second']:8.2f} MB/s {result['peak_rss_mb']:8.1f} MB peak", file=sys.stderr)
+
+    with open(args.output_json, 'w') as fout:
+        json.dump({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'git_commit': git_commit(),
+                   'python': platform.python_version(), 'platform': platform.platform(),
+                   'cpu_count': os.cpu_count(), 'scale': args.scale, 'repeat': args.repeat,
+                   'seed': args.seed, 'results': results}, fout, indent=2)
+        fout.write("\n")
+
+    if not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
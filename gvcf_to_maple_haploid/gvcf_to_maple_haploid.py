@@ -7,76 +7,2481 @@
 
 import sys
 import os
+import time
 import gzip
+import glob
+import zlib
+import queue
+import struct
 import argparse
+import functools
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
 
-def read_vcf(vcf_file_path):
+# mask_maple.py is used for masking while converting (-m), maple_io.py opens the files, maple_binary.py is
+# used for binary maple files, maple_metrics.py for --metrics_json and --profile, maple_manifest.py for --manifest, maple_quality.py
+# for the quality files (--quality), maple_shard.py for --shard, maple_qc.py for the QC summaries (--qc)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mask_maple'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_binary'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_metrics'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_manifest'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_quality'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_shard'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_qc'))
+import mask_maple
+import maple_io
+import maple_binary
+import maple_metrics
+import maple_manifest
+import maple_quality
+import maple_shard
+import maple_qc
 
-    #  Reads a VCF.gzipd file and returns its content as a list of lines, 
-    #  skipping comment lines.
+try:
+    import numpy as np
+except ImportError:     # numpy is only needed for -e numpy
+    np = None
+
+# The version of the maple files written, recorded in manifests (--manifest); to be changed with any
+# change to the maple files written, so that every maple file of an earlier version is written again
+VERSION = "1.0"
+
+# End of a region given without an end position, the largest position in a tabix index
+MAX_REGION_END = (1 << 31) - 1
+
+# Size of the chunks of uncompressed g.vcf parsed at once by the numpy engine
+VCF_CHUNK_SIZE = 1 << 22
+
+# The calls (or parsed chunks of the numpy engine) passed at once to each combination of a sweep (--sweep),
+# and the batches queued for each combination, so the parsed g.vcf held in memory stays small
+SWEEP_BATCH_SIZE = 4096
+SWEEP_QUEUE_SIZE = 8
+
+# The kinds of FORMAT column, as tested line by line by parse_vcf()
+FORMAT_OTHER = 0        # any other FORMAT, the line is unexpected
+FORMAT_REFERENCE = 1    # starts with GT:DP:GQ, a reference block
+FORMAT_ALTERNATE = 2    # starts with GT:AD:DP:GQ, an alternate line
+FORMAT_NO_CALL = 3      # starts with GT:GQ:PL or is GT:PL, no read depth
+
+
+class VcfReadError(Exception):
+
+    #  Raised when the input file cannot be opened, read or decompressed.
+    #  The message is already formatted for printing to the user.
+    pass
+
+#
+#END of class VcfReadError(Exception):
+#
+
+
+class MapleNameError(Exception):
+
+    #  Raised when no .maple output filename can be made from the input filename.
+    pass
+
+#
+#END of class MapleNameError(Exception):
+#
+
+
+class SweepAborted(Exception):
+
+    #  Raised in the threads of a sweep when the g.vcf file could not be read to the end, so
+    #  that no partial maple file is kept.
+    pass
+
+#
+#END of class SweepAborted(Exception):
+#
+
+
+def vcf_is_gzip(vcf_file_path):
+
+    #  Checks the first two bytes of the input file for the gzip magic number.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not), '-' for stdin.
+    #
+    #  Returns:
+    #     bool: True if the file is gzip (or bgzip) compressed.
+
+    return maple_io.read_start(vcf_file_path, 2) == b'\x1f\x8b'
+
+#
+#END of def vcf_is_gzip(vcf_file_path):
+#
+
+
+def maple_names(vcf_file_text, is_gzip, output_dir=None):
+
+    #  Makes the output maple filename and the maple root (used in the '>' headers)
+    #  from the input filename.
+    #
+    #  Arguments:
+    #      vcf_file_text (str): the input filename as given by the user.
+    #      is_gzip (bool): True if the input file is gzip compressed.
+    #      output_dir (str): directory for the maple file, None to write it next to the input file.
+    #
+    #  Returns:
+    #     tuple: (maple_fileout, maple_root)
+
+    if is_gzip:
+        # replace string "g.vcf.gz" with "maple" for output file
+        maple_fileout = vcf_file_text.replace("g.vcf.gz","maple")
+        maple_root = vcf_file_text.replace(".g.vcf.gz","")
+    else:
+        # replace string "g.vcf" with "maple" for output file
+        maple_fileout = vcf_file_text.replace("g.vcf","maple")
+        maple_root = vcf_file_text
+        if ".g.vcf.gz" in vcf_file_text:
+            maple_root = vcf_file_text.replace(".g.vcf.gz","")
+        elif ".g.vcf" in vcf_file_text:
+            maple_root = vcf_file_text.replace(".g.vcf","")
+
+    if output_dir is not None:
+        maple_fileout = os.path.join(output_dir, os.path.basename(maple_fileout))
+
+    return maple_fileout, maple_root
+
+#
+#END of def maple_names(vcf_file_text, is_gzip, output_dir=None):
+#
+
+
+def vcf_is_bgzf(vcf_file_path):
+
+    #  Checks if the input file is BGZF compressed (bgzip, as written by GATK and htslib).
+    #  A BGZF file is a series of gzip members, each with a 'BC' extra field holding the
+    #  size of the compressed block, so each block can be inflated on its own.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file.
+    #
+    #  Returns:
+    #     bool: True if the first block of the file is a BGZF block.
+
+    header = maple_io.read_start(vcf_file_path, 18)
+    return (len(header) == 18 and header[:4] == b'\x1f\x8b\x08\x04'
+            and header[12:16] == b'BC\x02\x00')
+
+#
+#END of def vcf_is_bgzf(vcf_file_path):
+#
+
+
+def read_bgzf_blocks(file):
+
+    #  Reads the BGZF blocks of an open file, starting at the current file position.
+    #
+    #  Arguments:
+    #      file (file): BGZF file opened in binary mode.
+    #
+    #  Yields:
+    #     bytes: each whole compressed block, gzip header and trailer included.
+
+    while True:
+        header = file.read(12)
+        if not header:
+            return
+        if (len(header) < 12) or (header[:4] != b'\x1f\x8b\x08\x04'):
+            raise IOError(f"not a BGZF block at offset {file.tell() - len(header)}")
+
+        # the 'BC' subfield of the extra field holds the block size - 1
+        extra_length = struct.unpack('<H', header[10:12])[0]
+        extra = file.read(extra_length)
+        block_size = None
+        i = 0
+        while i + 4 <= len(extra):
+            subfield_length = struct.unpack('<H', extra[i+2:i+4])[0]
+            if extra[i:i+2] == b'BC' and subfield_length == 2:
+                block_size = struct.unpack('<H', extra[i+4:i+6])[0] + 1
+            i += 4 + subfield_length
+        if block_size is None:
+            raise IOError(f"BGZF block without a BC field at offset {file.tell() - 12 - len(extra)}")
+
+        rest = file.read(block_size - 12 - extra_length)
+        if len(rest) != block_size - 12 - extra_length:
+            raise EOFError("Compressed file ended before the end of the last BGZF block")
+        yield header + extra + rest
+
+#
+#END of def read_bgzf_blocks(file):
+#
+
+
+def inflate_bgzf_block(block):
+
+    #  Inflates one BGZF block and checks its CRC32 and length.  zlib releases the GIL, so
+    #  blocks can be inflated in parallel threads.
+    #
+    #  Arguments:
+    #      block (bytes): a whole BGZF block from read_bgzf_blocks().
+    #
+    #  Returns:
+    #     bytes: the uncompressed data of the block.
+
+    extra_length = struct.unpack('<H', block[10:12])[0]
+    crc, data_length = struct.unpack('<II', block[-8:])
+    data = zlib.decompress(block[12 + extra_length:-8], -15)
+    if (len(data) != data_length) or (zlib.crc32(data) != crc):
+        raise IOError("CRC check failed for a BGZF block")
+    return data
+
+#
+#END of def inflate_bgzf_block(block):
+#
+
+
+def read_bgzf(file, threads):
+
+    #  Inflates the BGZF blocks of an open file across a pool of threads, keeping the
+    #  original order of the data.  Only a few blocks per thread are held in memory.
+    #
+    #  Arguments:
+    #      file (file): BGZF file opened in binary mode.
+    #      threads (int): number of threads inflating blocks.
+    #
+    #  Yields:
+    #     bytes: the uncompressed data of each block, in file order.
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        pending = collections.deque()
+        for block in read_bgzf_blocks(file):
+            pending.append(executor.submit(inflate_bgzf_block, block))
+            if len(pending) >= 4 * threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+#
+#END of def read_bgzf(file, threads):
+#
+
+
+def split_lines(chunks):
+
+    #  Joins chunks of uncompressed bytes and splits them into lines of text, newlines are
+    #  handled the same way as reading the file in text mode.
+    #
+    #  Arguments:
+    #      chunks (iterator of bytes): uncompressed data, lines may span chunks.
+    #
+    #  Yields:
+    #     str: each line, without its newline.
+
+    carry = b''
+    for chunk in chunks:
+        data = carry + chunk
+        last_newline = data.rfind(b'\n')
+        if last_newline < 0:
+            carry = data
+            continue
+        carry = data[last_newline+1:]
+        text = data[:last_newline].decode()
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        yield from text.split('\n')
+    if carry:
+        text = carry.decode()
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        yield from text.split('\n')
+
+#
+#END of def split_lines(chunks):
+#
+
+
+def read_vcf(vcf_file_path, is_gzip, threads=1):
+
+    #  Reads a VCF.gzipd (or plain text) file and yields its content one line at a time,
+    #  skipping comment lines.  Lines are decompressed as they are read, the whole file
+    #  is never held in memory.  A BGZF file is inflated by threads threads when threads > 1,
+    #  plain gzip and uncompressed files are always read in a single thread.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not), '-' for stdin.
+    #      is_gzip (bool): True if the file is gzip compressed.
+    #      threads (int): number of threads inflating BGZF blocks.
+    #
+    #  Yields:
+    #     str: each non comment line from the VCF file, stripped of its newline.
+    #
+    #  Raises:
+    #     VcfReadError: if the file cannot be read or decompressed.
+
+    try:
+        if is_gzip and (threads > 1) and vcf_is_bgzf(vcf_file_path):
+            with maple_io.input_file(vcf_file_path, 'rb') as file:
+                for line in split_lines(read_bgzf(file, threads)):
+                    if not line.startswith('#'):
+                        yield line.strip()
+            return
+
+        with maple_io.input_file(vcf_file_path, 'rb' if is_gzip else 'r') as file:
+            if is_gzip:
+                # read the gzip file in text mode for automatic decompression
+                file = gzip.open(file, 'rt')
+            for line in file:                       # Read each line
+                if not line.startswith('#'):        # If the line does not begin with a comment '#'
+                    yield line.strip()              # Pass the line on to be processed
+
+    except Exception as e:
+        if is_gzip:
+            raise VcfReadError(f"An error occurred: {e}")
+        raise VcfReadError(f"Error reading file non-gzip: {e}")
+
+#
+#END of def read_vcf(vcf_file_path, is_gzip, threads=1):
+#
+
+
+def line_chunks(chunks, chunk_size=VCF_CHUNK_SIZE):
+
+    #  Joins pieces of uncompressed bytes into chunks of about chunk_size bytes holding whole
+    #  lines, for the numpy engine.
+    #
+    #  Arguments:
+    #      chunks (iterator of bytes): uncompressed data, lines may span pieces.
+    #      chunk_size (int): the least size of a chunk, but for the last one.
+    #
+    #  Yields:
+    #     bytes: each chunk, ending with a newline but for the end of the data.
+
+    pieces = []
+    size = 0
+    for chunk in chunks:
+        pieces.append(chunk)
+        size += len(chunk)
+        if size < chunk_size:
+            continue
+        data = b''.join(pieces)
+        last_newline = data.rfind(b'\n')
+        if last_newline < 0:
+            pieces = [data]
+            continue
+        yield data[:last_newline+1]
+        pieces = [data[last_newline+1:]]
+        size = len(pieces[0])
+    data = b''.join(pieces)
+    if data:
+        yield data
+
+#
+#END of def line_chunks(chunks, chunk_size=VCF_CHUNK_SIZE):
+#
+
+
+def read_vcf_chunks(vcf_file_path, is_gzip, threads=1):
+
+    #  Reads a VCF.gzipd (or plain text) file in chunks of whole lines for the numpy engine,
+    #  comment lines included.  The chunks are decompressed as they are read, as by read_vcf().
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not), '-' for stdin.
+    #      is_gzip (bool): True if the file is gzip compressed.
+    #      threads (int): number of threads inflating BGZF blocks.
+    #
+    #  Yields:
+    #     bytes: chunks of about VCF_CHUNK_SIZE bytes, see line_chunks().
+    #
+    #  Raises:
+    #     VcfReadError: if the file cannot be read or decompressed.
+
+    try:
+        if is_gzip and (threads > 1) and vcf_is_bgzf(vcf_file_path):
+            with maple_io.input_file(vcf_file_path, 'rb') as file:
+                yield from line_chunks(read_bgzf(file, threads))
+            return
+
+        with maple_io.input_file(vcf_file_path, 'rb') as file:
+            if is_gzip:
+                file = gzip.open(file, 'rb')
+            yield from line_chunks(iter(lambda: file.read(VCF_CHUNK_SIZE), b''))
+
+    except Exception as e:
+        if is_gzip:
+            raise VcfReadError(f"An error occurred: {e}")
+        raise VcfReadError(f"Error reading file non-gzip: {e}")
+
+#
+#END of def read_vcf_chunks(vcf_file_path, is_gzip, threads=1):
+#
+
+
+def lines_to_chunks(lines, chunk_size=VCF_CHUNK_SIZE):
+
+    #  Joins lines of text, e.g. from read_vcf_regions(), into chunks for the numpy engine.
+    #
+    #  Arguments:
+    #      lines (iterator of str): the lines, without their newlines.
+    #      chunk_size (int): the least size of a chunk, but for the last one.
+    #
+    #  Yields:
+    #     bytes: the lines of each chunk, each ending with a newline.
+
+    batch = []
+    size = 0
+    for line in lines:
+        batch.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield ('\n'.join(batch) + '\n').encode()
+            batch = []
+            size = 0
+    if batch:
+        yield ('\n'.join(batch) + '\n').encode()
+
+#
+#END of def lines_to_chunks(lines, chunk_size=VCF_CHUNK_SIZE):
+#
+
+
+def parse_region(region_text):
+
+    #  Parses a region as used by tabix, bcftools and samtools.
+    #
+    #  Arguments:
+    #      region_text (str): 'contig', 'contig:start' or 'contig:start-end', 1-based and inclusive.
+    #
+    #  Returns:
+    #     tuple: (contig, start, end), 1-based and inclusive.
+
+    contig, start, end = region_text, 1, MAX_REGION_END
+    if ':' in region_text:
+        name, span = region_text.rsplit(':', 1)
+        bounds = span.split('-')
+        if bounds[0].isdigit() and (len(bounds) == 1 or (len(bounds) == 2 and bounds[1].isdigit())):
+            contig = name
+            start = int(bounds[0])
+            if len(bounds) == 2:
+                end = int(bounds[1])
+    if start < 1 or end < start:
+        raise ValueError(f"invalid region '{region_text}'")
+    return contig, start, end
+
+#
+#END of def parse_region(region_text):
+#
+
+
+def read_regions_file(regions_file_path):
+
+    #  Reads a regions file in .bed format, one region per line: contig, start (0-based) and end.
+    #  A line with only a contig selects the whole contig.  Comment, 'track' and 'browser' lines
+    #  are ignored.
+    #
+    #  Arguments:
+    #      regions_file_path (str): Path to the regions file.
+    #
+    #  Returns:
+    #     list: (contig, start, end) tuples, 1-based and inclusive.
+
+    regions = []
+    with open(regions_file_path, 'r') as fregions:
+        for line in fregions:
+            columns = line.strip().split('\t')
+            if (not columns[0]) or line.startswith(('#', 'track', 'browser')):
+                continue
+            if len(columns) >= 3:
+                regions.append((columns[0], int(columns[1])+1, int(columns[2])))
+            else:
+                regions.append((columns[0], 1, MAX_REGION_END))
+    return regions
+
+#
+#END of def read_regions_file(regions_file_path):
+#
+
+
+def read_vcf_index(vcf_file_path):
+
+    #  Reads the tabix (.tbi) or CSI (.csi) index of a bgzip compressed g.vcf file.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the .g.vcf.gz file, the index is vcf_file_path + '.tbi' or '.csi'.
+    #
+    #  Returns:
+    #     dict: 'names' the contigs in file order, 'min_shift' and 'depth' of the binning scheme,
+    #           'bins' a list per contig of {bin: (loffset, [(chunk_begin, chunk_end), ...])}, and
+    #           'linear' a list per contig of the linear index (.tbi only, empty lists for .csi).
+    #           Offsets are BGZF virtual offsets.
+
+    if not vcf_is_bgzf(vcf_file_path):
+        raise VcfReadError(f"Error: '{vcf_file_path}' is not bgzip compressed, a region needs a .tbi or .csi index")
+
+    for suffix in ('.tbi', '.csi'):
+        if os.path.exists(vcf_file_path + suffix):
+            with gzip.open(vcf_file_path + suffix, 'rb') as findex:
+                data = findex.read()
+            break
+    else:
+        raise VcfReadError(f"Error: no .tbi or .csi index found for '{vcf_file_path}'")
+
+    index = {'bins': [], 'linear': []}
+    if data[:4] == b'TBI\x01':
+        n_ref, _, _, _, _, _, _, names_length = struct.unpack_from('<8i', data, 4)
+        names = data[36:36+names_length]
+        offset = 36 + names_length
+        index['min_shift'], index['depth'] = 14, 5
+    elif data[:4] == b'CSI\x01':
+        index['min_shift'], index['depth'], aux_length = struct.unpack_from('<3i', data, 4)
+        names_length = struct.unpack_from('<i', data, 16 + 24)[0]
+        names = data[16+28:16+28+names_length]
+        offset = 16 + aux_length
+        n_ref = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+    else:
+        raise VcfReadError(f"Error: unknown index format for '{vcf_file_path}'")
+    index['names'] = [name.decode() for name in names.split(b'\0')[:n_ref]]
+
+    for ref in range(n_ref):
+        bins = {}
+        n_bin = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+        for b in range(n_bin):
+            if data[:4] == b'TBI\x01':
+                bin_number, n_chunk = struct.unpack_from('<Ii', data, offset)
+                loffset = 0
+                offset += 8
+            else:
+                bin_number, loffset, n_chunk = struct.unpack_from('<IQi', data, offset)
+                offset += 16
+            chunks = struct.unpack_from(f'<{2*n_chunk}Q', data, offset)
+            offset += 16 * n_chunk
+            bins[bin_number] = (loffset, list(zip(chunks[0::2], chunks[1::2])))
+        index['bins'].append(bins)
+
+        linear = []
+        if data[:4] == b'TBI\x01':
+            n_intv = struct.unpack_from('<i', data, offset)[0]
+            linear = list(struct.unpack_from(f'<{n_intv}Q', data, offset + 4))
+            offset += 4 + 8 * n_intv
+        index['linear'].append(linear)
+
+    return index
+
+#
+#END of def read_vcf_index(vcf_file_path):
+#
+
+
+def region_bins(begin, end, min_shift, depth):
+
+    #  Lists the bins that may hold records overlapping a region, see the SAM/tabix specification.
+    #
+    #  Arguments:
+    #      begin (int): 0-based start of the region.
+    #      end (int): end of the region (exclusive).
+    #      min_shift, depth (int): the binning scheme of the index.
+    #
+    #  Returns:
+    #     list: the bin numbers.
+
+    bins = []
+    end -= 1
+    shift = min_shift + 3*depth
+    first_bin = 0
+    for level in range(depth + 1):
+        bins.extend(range(first_bin + (begin >> shift), first_bin + (end >> shift) + 1))
+        shift -= 3
+        first_bin += 1 << (3*level)
+    return bins
+
+#
+#END of def region_bins(begin, end, min_shift, depth):
+#
+
+
+def region_offset(index, ref, begin, end):
+
+    #  Finds the virtual offset to start reading records that overlap a region.
+    #
+    #  Arguments:
+    #      index (dict): from read_vcf_index().
+    #      ref (int): the contig number in the index.
+    #      begin (int): 0-based start of the region.
+    #      end (int): end of the region (exclusive).
+    #
+    #  Returns:
+    #     int: the BGZF virtual offset, or None if no record can overlap the region.
+
+    min_shift, depth = index['min_shift'], index['depth']
+    bins = index['bins'][ref]
+    end = min(end, 1 << (min_shift + 3*depth))
+
+    # records ending before the region start are all before this offset
+    min_offset = 0
+    linear = index['linear'][ref]
+    if linear:
+        min_offset = linear[min(begin >> min_shift, len(linear) - 1)]
+    else:
+        bin_number = ((1 << (3*depth)) - 1) // 7 + (begin >> min_shift)
+        while (bin_number > 0) and (bin_number not in bins):
+            bin_number = (bin_number - 1) >> 3
+        if bin_number in bins:
+            min_offset = bins[bin_number][0]
+
+    offsets = [chunk_begin for bin_number in region_bins(begin, end, min_shift, depth) if bin_number in bins
+               for chunk_begin, chunk_end in bins[bin_number][1] if chunk_end > min_offset]
+    if not offsets:
+        return None
+    return max(min(offsets), min_offset)
+
+#
+#END of def region_offset(index, ref, begin, end):
+#
+
+
+def vcf_record_end(aline):
+
+    #  Returns the last position of a g.vcf record, from END= in the INFO column for a
+    #  reference block, otherwise from the length of the reference allele.
+
+    for info in aline[7].split(';'):
+        if info.startswith('END='):
+            return int(info[4:])
+    return int(aline[1]) + len(aline[3]) - 1
+
+#
+#END of def vcf_record_end(aline):
+#
+
+
+def read_vcf_regions(vcf_file_path, regions, threads=1):
+
+    #  Reads only the g.vcf lines overlapping a list of regions, using the .tbi or .csi index to
+    #  seek straight to the BGZF blocks holding them.  Lines are yielded in file order, a line
+    #  overlapping more than one region is yielded once.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the bgzip compressed .g.vcf.gz file.
+    #      regions (list): (contig, start, end) tuples, 1-based and inclusive.
+    #      threads (int): number of threads inflating BGZF blocks.
+    #
+    #  Yields:
+    #     str: each g.vcf line overlapping a region, stripped of its newline.
+    #
+    #  Raises:
+    #     VcfReadError: if the file or its index cannot be read.
+
+    try:
+        index = read_vcf_index(vcf_file_path)
+        ref_numbers = {name: ref for ref, name in enumerate(index['names'])}
+
+        # sort the regions in file order and merge overlapping or touching regions
+        merged = []
+        for contig, start, end in sorted(regions, key=lambda region: (ref_numbers.get(region[0], -1), region[1])):
+            if contig not in ref_numbers:
+                print(f"*** Region contig {contig} not found in the index of {vcf_file_path}", file=sys.stderr)
+            elif merged and (merged[-1][0] == contig) and (start <= merged[-1][2] + 1):
+                merged[-1][2] = max(merged[-1][2], end)
+            else:
+                merged.append([contig, start, end])
+
+        with open(vcf_file_path, 'rb') as file:
+            previous_contig, previous_end = None, 0
+            for contig, start, end in merged:
+                # records starting in the previous region of this contig have already been yielded
+                if contig != previous_contig:
+                    previous_end = 0
+                done_before = previous_end
+                previous_contig, previous_end = contig, end
+
+                virtual_offset = region_offset(index, ref_numbers[contig], start - 1, end)
+                if virtual_offset is None:
+                    continue
+
+                # the low 16 bits of a virtual offset are the offset within the uncompressed block
+                file.seek(virtual_offset >> 16)
+                if threads > 1:
+                    chunks = read_bgzf(file, threads)
+                else:
+                    chunks = (inflate_bgzf_block(block) for block in read_bgzf_blocks(file))
+                first_chunk = next(chunks, b'')[virtual_offset & 0xffff:]
+
+                for line in split_lines(itertools.chain([first_chunk], chunks)):
+                    if (not line) or line.startswith('#'):
+                        continue
+                    aline = line.split('\t', 9)
+                    position = int(aline[1])
+                    if (aline[0] != contig) or (position > end):
+                        break
+                    if (position > done_before) and (vcf_record_end(aline) >= start):
+                        yield line.strip()
+                chunks.close()
+
+    except VcfReadError:
+        raise
+    except Exception as e:
+        raise VcfReadError(f"An error occurred: {e}")
+
+#
+#END of def read_vcf_regions(vcf_file_path, regions, threads=1):
+#
+
+
+def parse_vcf(lines, maple_root, vcf_file_path, chromosome_numbers=None, counts=None, header_chromosomes=None):
+
+    #  Classifies each g.vcf line and yields the calls that can appear in the maple file.
+    #  No DP or GQ thresholds are applied here, see filter_vcf().
+    #
+    #  Arguments:
+    #      lines (iterator of str): the non comment lines of the g.vcf file.
+    #      maple_root (str): the text for the '>' headers, the chromosome number is appended.
+    #      vcf_file_path (str): Path to the VCF file, used in messages.
+    #      chromosome_numbers (dict): chromosome number of each chromosome, when lines are only
+    #                                 part of the file; by default chromosomes are counted from 1.
+    #      counts (dict): counts the lines of each kind when all lines are read: 'reference_block',
+    #                     'reference_site' (an alternate line with the reference called), 'snp',
+    #                     'deletion_skipped', 'insertion_skipped', 'star_allele', 'missing_genotype'
+    #                     (GT '.'), 'no_call' (GT:GQ:PL or GT:PL) and 'unexpected'.
+    #      header_chromosomes (dict): filled with the g.vcf chromosome (CHROM) of each header text as
+    #                                 the header is yielded, e.g. for the mask, see mask_maple.make_mask().
+    #
+    #  Yields:
+    #     tuple: ('>', header_text, 0) when a new chromosome starts, otherwise
+    #            (allele, position, length, DP, GQ) where allele is '' for a reference
+    #            call (a reference block or a single reference site) or the single base
+    #            of the called alternate allele.
+
+    chromosome = "initialize"       # Initialize g.vcf.gz chromosome string
+    chromosome_number = 0
+    reference_blocks = reference_sites = snps = deletions = insertions = stars = missing = no_calls = unexpected = 0
+
+    for line in lines:
+
+        # split line into array aline by tab separator
+        aline = line.split('\t')
+
+        # Check to see if this is a new chromosome; using filename as chromosome number:
+        if aline[0] != chromosome:
+            chromosome_number += 1
+            if chromosome_numbers:
+                chromosome_number = chromosome_numbers[aline[0]]
+            chromosome = aline[0]                       #save the g.vcf.gz new chromosome string
+            header_text = maple_root + "_" + str(chromosome_number)
+            if header_chromosomes is not None:
+                header_chromosomes[header_text] = chromosome
+            yield ('>', header_text, 0)
+
+        # Check to see if the reference allele more than one base, if more than one base then skip output
+        # This indicates a deletion - note there could possibly be an exception which is not addressed here.
+        # If the reference allele is n bases long and the best alternate allele is the same length, then this
+        # would not be an insertion event, but the maple cannot have a multi base string (? is this true?)
+        if len(aline[3]) > 1:
+            deletions += 1
+            continue
+
+        # Check to see if this is a reference segment.  Note col 8 always starts with 'GT:'
+        # When col 4 is only "<NON_REF>" aline[9] always starts with 0: aline[8] is always 'GT:DP:GQ'
+        # When col 4 is only "<NON_REF>" there are no multiple choice alternate alleles
+        elif (aline[4] == "<NON_REF>") and (aline[8].startswith("GT:DP:GQ")) and (aline[9].startswith("0:")):
+            # split aline[9] by ':' into values for 'GT:DP:GQ:'
+            stats = aline[9].split(':')
+            end_of_sequence = aline[7].split('=')
+            position = int(aline[1])
+            reference_blocks += 1
+            yield ('', position, int(end_of_sequence[1])-position+1, int(stats[1]), int(stats[2]))
+
+        # Check to see if this is a alternate segment.  Note col 8 always starts with 'GT:'
+        # When col 4 has more than one option (has ',') as in ",<NON_REF>" aline[8] is always 'GT:AD:DP:GQ'
+        # When col 4 ",<NON_REF>" there can be multiple alternate alleles, the best alternate is the value of GT
+        # We use the DP value rather than the individual AD
+        # Check the alternate allele is only one base (no inserts allowed!)
+        elif (",<NON_REF>" in aline[4]) and (aline[8].startswith("GT:AD:DP:GQ")):
+            # split aline[9] by ':' into values for 'GT:AD:DP:GQ:'
+            stats = aline[9].split(':')
+
+            if stats[0] == '.':              # no DP or GQ for '.', nothing to print
+                missing += 1
+                continue
+            allele = int(stats[0])           # index of GT
+
+            # regardless of DP or GQ values - both an insertion and criteria not met are flagged as 'n'
+            alleles = aline[4].split(',')    # split the alternate alleles by separator ','
+            if (allele < 1):                 # if the best allele is the reference, 'n' if it fails criteria
+                reference_sites += 1
+                yield ('', int(aline[1]), 1, int(stats[2]), int(stats[3]))
+
+            elif len(alleles[allele-1]) != 1:  # if allele length > 1 base, then it isn't valid, skip output
+                insertions += 1
+                continue
+
+            elif alleles[allele-1] == '*':   # if allele is '*', then it is part of a deletion, skip output
+                stars += 1
+                continue
+
+            else:                            # the alternate genotype and its position
+                snps += 1
+                yield (alleles[allele-1], int(aline[1]), 1, int(stats[2]), int(stats[3]))
+
+        # Check to see if this is a bad call
+        # When aline[8] is 'GT:GQ:PL' - there is no read depth
+        # can't be sure if it's an indel - skip output
+        elif (aline[8].startswith("GT:GQ:PL")) or (aline[8] == "GT:PL"):
+            no_calls += 1
+            continue
+
+        # Unknown condition catch - will be skipped in output maple file
+        else:
+            unexpected += 1
+            print(f"*** Unexpected line type in {vcf_file_path}:\n{line}", file=sys.stderr)
+
+    if counts is not None:
+        maple_metrics.add_counts(counts, {'reference_block': reference_blocks, 'reference_site': reference_sites,
+                                          'snp': snps, 'deletion_skipped': deletions, 'insertion_skipped': insertions,
+                                          'star_allele': stars, 'missing_genotype': missing, 'no_call': no_calls,
+                                          'unexpected': unexpected})
+
+#
+#END of def parse_vcf(lines, maple_root, vcf_file_path, chromosome_numbers=None, counts=None, header_chromosomes=None):
+#
+
+
+def filter_vcf(calls, DP_min=20, GQ_min=99, operation='AND', counts=None):
+
+    #  Applies the DP and GQ criteria to the calls from parse_vcf() and yields maple records.
+    #
+    #  Arguments:
+    #      calls (iterator of tuple): the calls yielded by parse_vcf().
+    #      DP_min (int): the minimum read depth.
+    #      GQ_min (int): the minimum genotype quality.
+    #      operation (str): 'AND' - a call passes if (DP >= DP_min) and (GQ >= GQ_min),
+    #                       'OR' - a call passes if (DP >= DP_min) or (GQ >= GQ_min).
+    #      counts (dict): counts the calls passing and failing the criteria when all calls are read:
+    #                     'reference_pass', 'reference_fail' (reference blocks and sites), 'snp_pass'
+    #                     and 'snp_fail'.
+    #
+    #  Yields:
+    #     tuple: a maple record (base, position, length); base is '>' for a header
+    #            (position is then the header text), 'n' for a run of length positions
+    #            that failed the criteria or an alternate base (length 0).
+
+    reference_pass = reference_fail = snp_pass = snp_fail = 0
+    for call in calls:
+        if call[0] == '>':
+            yield call
+            continue
+
+        allele, position, length, DP, GQ = call
+
+        # check if critera is not met
+        if (operation == 'AND'):
+            missing_call = (DP < DP_min) or (GQ < GQ_min)
+        else:
+            missing_call = (DP < DP_min) and (GQ < GQ_min)
+
+        # if critera is not met, print sequence as 'missing' or 'n'
+        if missing_call:
+            if allele:
+                snp_fail += 1
+            else:
+                reference_fail += 1
+            yield ('n', position, length)
+
+        # else print the alternate genotype and its position, a passing reference is not printed
+        elif allele:
+            snp_pass += 1
+            yield (allele, position, 0)
+
+        else:
+            reference_pass += 1
+
+    if counts is not None:
+        maple_metrics.add_counts(counts, {'reference_pass': reference_pass, 'reference_fail': reference_fail,
+                                          'snp_pass': snp_pass, 'snp_fail': snp_fail})
+
+#
+#END of def filter_vcf(calls, DP_min=20, GQ_min=99, operation='AND', counts=None):
+#
+
+
+def merge_n_runs(records, merge_stats):
+
+    #  Merges touching or overlapping 'n' runs of the same chromosome into one run, so the
+    #  maple file holds the fewest 'n' records covering the same positions.
+    #
+    #  Arguments:
+    #      records (iterator of tuple): maple records from filter_vcf().
+    #      merge_stats (dict): counts 'n_in' and 'n_out', the 'n' records before and after merging.
+    #
+    #  Yields:
+    #     tuple: the maple records with 'n' runs merged.
+
+    merge_stats.setdefault('n_in', 0)
+    merge_stats.setdefault('n_out', 0)
+    run = None                                   # the 'n' run being extended [position, end+1]
+
+    for record in records:
+        if record[0] == 'n':
+            merge_stats['n_in'] += 1
+            if run and (record[1] <= run[1]):    # touches or overlaps the current run
+                run[1] = max(run[1], record[1] + record[2])
+                continue
+            if run:
+                merge_stats['n_out'] += 1
+                yield ('n', run[0], run[1] - run[0])
+            run = [record[1], record[1] + record[2]]
+        else:
+            if run:
+                merge_stats['n_out'] += 1
+                yield ('n', run[0], run[1] - run[0])
+                run = None
+            yield record
+
+    if run:
+        merge_stats['n_out'] += 1
+        yield ('n', run[0], run[1] - run[0])
+
+#
+#END of def merge_n_runs(records, merge_stats):
+#
+
+
+def format_keys(format_text, format_cache):
+
+    #  Resolves the keys of a FORMAT column by name, once for each FORMAT text of a file.
+    #
+    #  Arguments:
+    #      format_text (bytes): the FORMAT column.
+    #      format_cache (dict): the result for each FORMAT text already resolved.
+    #
+    #  Returns:
+    #     tuple: (kind, DP field, GQ field) - kind one of FORMAT_OTHER, FORMAT_REFERENCE,
+    #            FORMAT_ALTERNATE or FORMAT_NO_CALL, the kinds parse_vcf() tells apart by the start
+    #            of the FORMAT text; the fields are the index of DP and GQ in the sample column,
+    #            -1 when the keys are not where parse_vcf() reads them (e.g. GT:DP:GQX).
+
+    keys = format_cache.get(format_text)
+    if keys is not None:
+        return keys
+
+    index = {}
+    for field, key in enumerate(format_text.split(b':')):
+        index.setdefault(key, field)
+    if format_text.startswith(b"GT:DP:GQ"):
+        kind, fields = FORMAT_REFERENCE, (1, 2)
+    elif format_text.startswith(b"GT:AD:DP:GQ"):
+        kind, fields = FORMAT_ALTERNATE, (2, 3)
+    elif format_text.startswith(b"GT:GQ:PL") or (format_text == b"GT:PL"):
+        kind, fields = FORMAT_NO_CALL, (-1, -1)
+    else:
+        kind, fields = FORMAT_OTHER, (-1, -1)
+    if (kind == FORMAT_REFERENCE) or (kind == FORMAT_ALTERNATE):
+        if (index.get(b'DP'), index.get(b'GQ')) != fields:
+            fields = (-1, -1)
+
+    keys = (kind, fields[0], fields[1])
+    format_cache[format_text] = keys
+    return keys
+
+#
+#END of def format_keys(format_text, format_cache):
+#
+
+
+def column_codes(buf, begins, ends):
+
+    #  Numbers the distinct texts of a column of many lines at once: the bytes of the column of
+    #  every line are laid out as the rows of a table, padded with zeros, and the rows sorted.
+    #
+    #  Arguments:
+    #      buf (numpy array): the bytes of the lines, without zero bytes.
+    #      begins, ends (numpy array): the column of each line, buf[begins:ends].
+    #
+    #  Returns:
+    #     tuple: (codes, texts) - the index in texts of the text of each line, texts the distinct
+    #            texts as bytes.
+
+    lengths = ends - begins
+    offsets = np.arange(max(int(lengths.max()), 1))
+    table = np.where(offsets < lengths[:, None], buf[np.minimum(begins[:, None] + offsets, buf.size - 1)], 0)
+    rows = np.ascontiguousarray(table.astype(np.uint8)).view(np.dtype((np.void, offsets.size))).reshape(-1)
+    unique_rows, firsts, codes = np.unique(rows, return_index=True, return_inverse=True)
+    texts = [buf[begin:end].tobytes() for begin, end in zip(begins[firsts].tolist(), ends[firsts].tolist())]
+    return codes.reshape(-1), texts
+
+#
+#END of def column_codes(buf, begins, ends):
+#
+
+
+def bytes_at(buf, begins, pattern):
+
+    #  Tells for each of begins whether the bytes of buf starting there are pattern.
+
+    last = buf.size - 1
+    found = np.ones(begins.size, dtype=bool)
+    for offset, byte in enumerate(pattern):
+        found &= buf[np.minimum(begins + offset, last)] == byte
+    return found & (begins + len(pattern) <= buf.size)
+
+#
+#END of def bytes_at(buf, begins, pattern):
+#
+
+
+def read_vcf_numbers(buf, begins, ends):
+
+    #  Reads the numbers filling buf[begins:ends] of many lines at once, as int() of each text.
+    #
+    #  Returns:
+    #     numpy array: the numbers, None if a text is empty or not all digits (parse_vcf()
+    #                  then decides how the line is read).
+
+    values, number_ends = mask_maple.read_maple_numbers(buf, begins, ends)
+    if (values is None) or (number_ends != ends).any() or (ends <= begins).any():
+        return None
+    return values
+
+#
+#END of def read_vcf_numbers(buf, begins, ends):
+#
+
+
+def field_bounds(separators, begins, ends, fields):
+
+    #  Finds a field of a column split by a separator, for many lines at once.
+    #
+    #  Arguments:
+    #      separators (numpy array): the position of every separator byte, followed by the size of
+    #                                the data.
+    #      begins, ends (numpy array): the column of each line.
+    #      fields (numpy array): the index of the field of each line.
+    #
+    #  Returns:
+    #     tuple: (field_begins, field_ends, present) - present is False where the column has fewer
+    #            fields.
+
+    last = separators.size - 1
+    first = np.searchsorted(separators, begins)
+    before = separators[np.clip(first + fields - 1, 0, last)]
+    after = separators[np.clip(first + fields, 0, last)]
+    present = (fields == 0) | (before < ends)
+    field_begins = np.where(fields == 0, begins, before + 1)
+    field_ends = np.where(after < ends, after, ends)
+    return field_begins, field_ends, present
+
+#
+#END of def field_bounds(separators, begins, ends, fields):
+#
+
+
+def parse_vcf_chunk(data, format_cache):
+
+    #  The numpy engine: classifies all the lines of a chunk of a g.vcf at once, with the rules
+    #  of parse_vcf().  The columns are found from the positions of the tabs, the FORMAT keys are
+    #  resolved by name once for each FORMAT text (see format_keys()), and POS, END, GT, DP and GQ
+    #  are read into arrays.
+    #
+    #  Arguments:
+    #      data (bytes): whole lines of the g.vcf, comment lines included.
+    #      format_cache (dict): the FORMAT keys already resolved, see format_keys().
+    #
+    #  Returns:
+    #     dict: 'chromosome_codes' the index in 'chromosomes' (bytes) of the chromosome of each data
+    #           line; for the calls, in line order: 'call_lines' the data line, 'bases' the ASCII
+    #           code of the called alternate base (0 for a reference call), 'positions', 'lengths',
+    #           'DP' and 'GQ'; 'unexpected' the text of the unexpected lines and 'counts' the lines
+    #           of each kind, see parse_vcf().
+    #           None if the chunk holds lines the numpy engine does not parse (non-ASCII text, '\r', zero bytes,
+    #           blank lines, white space around a line, missing columns, fields that are not plain
+    #           numbers, ...), then parse_vcf() is used instead.
+
+    if (b'\r' in data) or (b'\x00' in data):
+        return None
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == 10)
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.concatenate((newlines, [buf.size]))
+    if line_starts[-1] == buf.size:                 # the chunk ends with a newline
+        line_starts = line_starts[:-1]
+        line_ends = line_ends[:-1]
+    is_data = buf[line_starts] != ord('#')
+    starts = line_starts[is_data]
+    ends = line_ends[is_data]
+    empty = np.zeros(0, dtype=np.int64)
+    chunk = {'chromosome_codes': empty, 'chromosomes': [], 'call_lines': empty, 'bases': empty.astype(np.uint8),
+             'positions': empty, 'lengths': empty, 'DP': empty, 'GQ': empty, 'unexpected': [], 'counts': {}}
+    if starts.size == 0:
+        return chunk
+
+    # lines parse_vcf() would read differently: stripped white space, non-ASCII text
+    if (ends <= starts).any() or (buf[starts] <= 32).any() or (buf[ends - 1] <= 32).any():
+        return None
+    if (buf >= 128).any():
+        high = np.flatnonzero(buf >= 128)
+        if is_data[np.searchsorted(line_starts, high, side='right') - 1].any():
+            return None
+
+    # the first ten columns of each line, the sample column ends at the next tab
+    tabs = np.flatnonzero(buf == 9)
+    first_tabs = np.searchsorted(tabs, starts)
+    tab_counts = np.searchsorted(tabs, ends) - first_tabs
+    if (tab_counts < 9).any():
+        return None
+    T = [tabs[first_tabs + column] for column in range(9)]
+    sample_starts = T[8] + 1
+    sample_ends = np.where(tab_counts > 9, tabs[np.minimum(first_tabs + 9, tabs.size - 1)], ends)
+    alt_starts = T[3] + 1
+    alt_ends = T[4]
+
+    chromosome_codes = column_codes(buf, starts, T[0])
+    format_codes = column_codes(buf, T[7] + 1, T[8])
+    format_keys_array = np.array([format_keys(text, format_cache) for text in format_codes[1]], dtype=np.int64)
+    kinds, dp_fields, gq_fields = format_keys_array[format_codes[0]].T
+
+    # ALT is exactly <NON_REF>, or holds ,<NON_REF>
+    angles = np.flatnonzero(buf == ord('<'))
+    non_refs = angles[bytes_at(buf, angles, b"<NON_REF>")]
+    lines = np.maximum(np.searchsorted(starts, non_refs, side='right') - 1, 0)
+    inside = (non_refs >= alt_starts[lines]) & (non_refs + 9 <= alt_ends[lines])
+    alt_is_non_ref = np.zeros(starts.size, dtype=bool)
+    alt_is_non_ref[lines[inside & (non_refs == alt_starts[lines]) & (non_refs + 9 == alt_ends[lines])]] = True
+    after_comma = inside & (non_refs > alt_starts[lines]) & (buf[non_refs - 1] == ord(','))
+    alt_has_non_ref = np.zeros(starts.size, dtype=bool)
+    alt_has_non_ref[lines[after_comma]] = True
+    commas = np.append(np.flatnonzero(buf == ord(',')), buf.size)
+
+    # the kind of each line, in the order parse_vcf() tests them
+    deletion = (T[3] - T[2] - 1) > 1
+    gt_is_zero = ((buf[sample_starts] == ord('0')) & (sample_starts + 1 < sample_ends) &
+                  (buf[np.minimum(sample_starts + 1, buf.size - 1)] == ord(':')))
+    block = ~deletion & alt_is_non_ref & (kinds == FORMAT_REFERENCE) & gt_is_zero
+    alternate = ~deletion & ~block & alt_has_non_ref & (kinds == FORMAT_ALTERNATE)
+    no_call = ~deletion & ~block & ~alternate & (kinds == FORMAT_NO_CALL)
+    unexpected = ~deletion & ~block & ~alternate & ~no_call
+    if ((block | alternate) & (dp_fields < 0)).any():
+        return None
+
+    # the called allele of the alternate lines: '.', the reference, or an alternate allele
+    colons = np.append(np.flatnonzero(buf == ord(':')), buf.size)
+    alternates = np.flatnonzero(alternate)
+    gt_begins, gt_ends, present = field_bounds(colons, sample_starts[alternates], sample_ends[alternates],
+                                               np.zeros(alternates.size, dtype=np.int64))
+    missing = ((gt_ends - gt_begins) == 1) & (buf[np.minimum(gt_begins, buf.size - 1)] == ord('.'))
+    called = alternates[~missing]
+    alleles = read_vcf_numbers(buf, gt_begins[~missing], gt_ends[~missing])
+    if alleles is None:
+        return None
+    reference_site = np.zeros(starts.size, dtype=bool)
+    reference_site[called[alleles == 0]] = True
+    variants = called[alleles > 0]
+    alleles = alleles[alleles > 0]
+    allele_begins, allele_ends, present = field_bounds(commas, alt_starts[variants], alt_ends[variants], alleles - 1)
+    if not present.all():
+        return None
+    single_base = (allele_ends - allele_begins) == 1
+    star = single_base & (buf[np.minimum(allele_begins, buf.size - 1)] == ord('*'))
+    snp = np.zeros(starts.size, dtype=bool)
+    snp[variants[single_base & ~star]] = True
+    bases = np.zeros(starts.size, dtype=np.uint8)
+    bases[variants[single_base & ~star]] = buf[allele_begins[single_base & ~star]]
+
+    # POS, END of the reference blocks, DP and GQ of the calls
+    call_lines = np.flatnonzero(block | reference_site | snp)
+    positions = read_vcf_numbers(buf, T[0][call_lines] + 1, T[1][call_lines])
+    dp_begins, dp_ends, dp_present = field_bounds(colons, sample_starts[call_lines], sample_ends[call_lines],
+                                                  dp_fields[call_lines])
+    gq_begins, gq_ends, gq_present = field_bounds(colons, sample_starts[call_lines], sample_ends[call_lines],
+                                                  gq_fields[call_lines])
+    if (positions is None) or not (dp_present.all() and gq_present.all()):
+        return None
+    DP = read_vcf_numbers(buf, dp_begins, dp_ends)
+    GQ = read_vcf_numbers(buf, gq_begins, gq_ends)
+    equals = np.append(np.flatnonzero(buf == ord('=')), buf.size)
+    blocks = block[call_lines]
+    end_begins, end_ends, present = field_bounds(equals, T[6][call_lines][blocks] + 1, T[7][call_lines][blocks],
+                                                 np.ones(np.count_nonzero(blocks), dtype=np.int64))
+    block_ends = read_vcf_numbers(buf, end_begins, end_ends) if present.all() else None
+    if (DP is None) or (GQ is None) or (block_ends is None):
+        return None
+    lengths = np.ones(call_lines.size, dtype=np.int64)
+    lengths[blocks] = block_ends - positions[blocks] + 1
+
+    chunk.update({'chromosome_codes': chromosome_codes[0], 'chromosomes': chromosome_codes[1],
+                  'call_lines': call_lines, 'bases': bases[call_lines], 'positions': positions,
+                  'lengths': lengths, 'DP': DP, 'GQ': GQ,
+                  'unexpected': [data[start:end].decode() for start, end in
+                                 zip(starts[unexpected].tolist(), ends[unexpected].tolist())]})
+    chunk['counts'] = {'reference_block': int(np.count_nonzero(block)),
+                       'reference_site': int(np.count_nonzero(reference_site)),
+                       'snp': int(np.count_nonzero(snp)), 'deletion_skipped': int(np.count_nonzero(deletion)),
+                       'insertion_skipped': int(np.count_nonzero(~single_base)),
+                       'star_allele': int(np.count_nonzero(star)), 'missing_genotype': int(np.count_nonzero(missing)),
+                       'no_call': int(np.count_nonzero(no_call)), 'unexpected': len(chunk['unexpected'])}
+    return chunk
+
+#
+#END of def parse_vcf_chunk(data, format_cache):
+#
+
+
+def parse_vcf_chunks(chunks, maple_root, vcf_file_path, chromosome_numbers=None, counts=None,
+                     header_chromosomes=None):
+
+    #  The parsing stage of the numpy engine: parses chunks of a g.vcf with parse_vcf_chunk() and
+    #  numbers the chromosomes, without the DP and GQ criteria, see filter_vcf_chunks().  A chunk
+    #  parse_vcf_chunk() does not parse goes through parse_vcf().
+    #
+    #  Arguments:
+    #      chunks (iterator of bytes): whole lines of the g.vcf, see read_vcf_chunks().
+    #      maple_root, vcf_file_path, chromosome_numbers, header_chromosomes: see parse_vcf().
+    #      counts (dict): counts the lines of each kind, see parse_vcf().
+    #
+    #  Yields:
+    #     tuple: (chunk, changes, header_texts) - chunk the dict of parse_vcf_chunk(), changes the
+    #            call lines where a chromosome starts and header_texts their header texts; or
+    #            (calls, None, None) for a chunk parsed line by line - calls the list of calls of
+    #            parse_vcf(), the headers numbered as in the whole file, no header first when the
+    #            chunk continues the chromosome before.
+
+    chromosome = None           # the chromosome of the last line
+    chromosome_number = 0
+    format_cache = {}
+
+    for data in chunks:
+        chunk = parse_vcf_chunk(data, format_cache)
+
+        if chunk is None:
+            # the chunk line by line, its first header is dropped if it continues the chromosome
+            try:
+                text = data.decode()
+            except UnicodeDecodeError as e:
+                raise VcfReadError(f"An error occurred: {e}")
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            lines = [line.strip() for line in text.split('\n') if not line.startswith('#')]
+            if text.endswith('\n'):
+                lines.pop()
+            if not lines:
+                continue
+            continuing = lines[0].split('\t', 1)[0] == chromosome
+            headers = 0
+            calls = []
+            chunk_chromosomes = {}
+            for call in parse_vcf(lines, maple_root, vcf_file_path, chromosome_numbers, counts, chunk_chromosomes):
+                if call[0] == '>':
+                    headers += 1
+                    if continuing and (headers == 1):
+                        continue
+                    line_chromosome = chunk_chromosomes[call[1]]
+                    if not chromosome_numbers:
+                        call = ('>', maple_root + "_" + str(chromosome_number + headers - continuing), 0)
+                    if header_chromosomes is not None:
+                        header_chromosomes[call[1]] = line_chromosome
+                calls.append(call)
+            yield (calls, None, None)
+            chromosome = lines[-1].split('\t', 1)[0]
+            chromosome_number += headers - continuing
+            if chromosome_numbers:
+                chromosome_number = chromosome_numbers[chromosome]
+            continue
+
+        for line in chunk['unexpected']:
+            print(f"*** Unexpected line type in {vcf_file_path}:\n{line}", file=sys.stderr)
+        codes = chunk['chromosome_codes']
+        if codes.size == 0:
+            continue
+        if counts is not None:
+            maple_metrics.add_counts(counts, chunk['counts'])
+
+        # a header where the chromosome changes, before the records of its line
+        changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        if chunk['chromosomes'][codes[0]].decode() != chromosome:
+            changes = np.concatenate(([0], changes))
+        header_texts = []
+        for change in changes:
+            chromosome = chunk['chromosomes'][codes[change]].decode()
+            chromosome_number += 1
+            if chromosome_numbers:
+                chromosome_number = chromosome_numbers[chromosome]
+            header_texts.append(maple_root + "_" + str(chromosome_number))
+            if header_chromosomes is not None:
+                header_chromosomes[header_texts[-1]] = chromosome
+        yield (chunk, changes, header_texts)
+
+#
+#END of def parse_vcf_chunks(chunks, maple_root, vcf_file_path, chromosome_numbers=None, counts=None,
+#                            header_chromosomes=None):
+#
+
+
+def filter_vcf_chunks(parsed_chunks, DP_min=20, GQ_min=99, operation='AND', counts=None):
+
+    #  The filtering stage of the numpy engine: applies the DP and GQ criteria to every call of a
+    #  chunk from parse_vcf_chunks() at once, as filter_vcf() does call by call.  The chunks are
+    #  only read, so that the chunks parsed once can be filtered with many criteria (--sweep).
+    #
+    #  Arguments:
+    #      parsed_chunks (iterator of tuple): from parse_vcf_chunks().
+    #      DP_min, GQ_min, operation: the DP and GQ criteria, see filter_vcf().
+    #      counts (dict): counts the calls passing and failing the criteria, see filter_vcf().
+    #
+    #  Yields:
+    #     tuple: (header_text, types, positions, lengths), see vcf_chunks_to_maple().
+
+    for chunk, changes, header_texts in parsed_chunks:
+
+        if changes is None:
+            # the calls of a chunk parsed line by line
+            header_text = None
+            types, positions, lengths = [], [], []
+            for record in filter_vcf(chunk, DP_min, GQ_min, operation, counts):
+                if record[0] != '>':
+                    types.append(record[0])
+                    positions.append(record[1])
+                    lengths.append(record[2])
+                    continue
+                if (header_text is not None) or types:
+                    yield (header_text, np.frombuffer(''.join(types).encode(), dtype=np.uint8),
+                           np.array(positions, dtype=np.int64), np.array(lengths, dtype=np.int64))
+                header_text = record[1]
+                types, positions, lengths = [], [], []
+            if (header_text is not None) or types:
+                yield (header_text, np.frombuffer(''.join(types).encode(), dtype=np.uint8),
+                       np.array(positions, dtype=np.int64), np.array(lengths, dtype=np.int64))
+            continue
+
+        # check if critera is not met, for every call at once
+        DP, GQ = chunk['DP'], chunk['GQ']
+        if (operation == 'AND'):
+            missing_call = (DP < DP_min) | (GQ < GQ_min)
+        else:
+            missing_call = (DP < DP_min) & (GQ < GQ_min)
+        is_snp = chunk['bases'] != 0
+        if counts is not None:
+            maple_metrics.add_counts(counts, {'reference_pass': int(np.count_nonzero(~missing_call & ~is_snp)),
+                                              'reference_fail': int(np.count_nonzero(missing_call & ~is_snp)),
+                                              'snp_pass': int(np.count_nonzero(~missing_call & is_snp)),
+                                              'snp_fail': int(np.count_nonzero(missing_call & is_snp))})
+
+        # the failing calls as 'n' runs and the passing alternate bases, a passing reference is not written
+        written = missing_call | is_snp
+        record_lines = chunk['call_lines'][written]
+        types = np.where(missing_call, ord('n'), chunk['bases'])[written].astype(np.uint8)
+        positions = chunk['positions'][written]
+        lengths = np.where(missing_call, chunk['lengths'], 0)[written]
+
+        bounds = np.concatenate(([0], np.searchsorted(record_lines, changes), [record_lines.size]))
+        for block in range(changes.size + 1):
+            header_text = header_texts[block-1] if block > 0 else None
+            begin, end = bounds[block], bounds[block+1]
+            if (header_text is not None) or (end > begin):
+                yield (header_text, types[begin:end], positions[begin:end], lengths[begin:end])
+
+#
+#END of def filter_vcf_chunks(parsed_chunks, DP_min=20, GQ_min=99, operation='AND', counts=None):
+#
+
+
+def vcf_chunks_to_maple(chunks, maple_root, vcf_file_path, DP_min=20, GQ_min=99, operation='AND',
+                        chromosome_numbers=None, counts=None, header_chromosomes=None):
+
+    #  The numpy engine: converts chunks of a g.vcf into blocks of maple records, as parse_vcf()
+    #  and filter_vcf() do line by line, see parse_vcf_chunks() and filter_vcf_chunks().  The DP
+    #  and GQ criteria are applied to every call of a chunk at once.  A chunk parse_vcf_chunk()
+    #  does not parse goes through parse_vcf() and filter_vcf(), so the records are always those
+    #  of the python engine.
+    #
+    #  Arguments:
+    #      chunks (iterator of bytes): whole lines of the g.vcf, see read_vcf_chunks().
+    #      maple_root, vcf_file_path, chromosome_numbers, header_chromosomes: see parse_vcf().
+    #      DP_min, GQ_min, operation: the DP and GQ criteria, see filter_vcf().
+    #      counts (dict): counts the lines of each kind, see parse_vcf() and filter_vcf().
+    #
+    #  Returns:
+    #     iterator of tuple: (header_text, types, positions, lengths) - the records following a
+    #            header, or continuing the records of the chromosome before when header_text is
+    #            None; types a uint8 array of the ASCII codes of the record types, positions and
+    #            lengths int64 arrays.  See maple_block_records() and write_maple_blocks().
+
+    return filter_vcf_chunks(parse_vcf_chunks(chunks, maple_root, vcf_file_path, chromosome_numbers, counts,
+                                              header_chromosomes), DP_min, GQ_min, operation, counts)
+
+#
+#END of def vcf_chunks_to_maple(chunks, maple_root, vcf_file_path, DP_min=20, GQ_min=99, operation='AND',
+#                               chromosome_numbers=None, counts=None, header_chromosomes=None):
+#
+
+
+def maple_block_records(blocks):
+
+    #  Returns the blocks of the numpy engine as maple records, for -n, -m and --binary.
+    #
+    #  Arguments:
+    #      blocks (iterator of tuple): from vcf_chunks_to_maple().
+    #
+    #  Yields:
+    #     tuple: the maple records (base, position, length), see filter_vcf().
+
+    for header_text, types, positions, lengths in blocks:
+        if header_text is not None:
+            yield ('>', header_text, 0)
+        yield from zip(types.tobytes().decode('latin-1'), positions.tolist(), lengths.tolist())
+
+#
+#END of def maple_block_records(blocks):
+#
+
+
+def vcf_to_maple(lines, maple_root, DP_min=20, GQ_min=99, operation='AND', merge_n=False, mask=None,
+                 counts=None, vcf_file_text='<stream>', engine='python'):
+
+    #  Converts the lines of a g.vcf into maple records, without reading or writing any file.
+    #  The records are yielded as the lines are read, so a large g.vcf is never held in memory.
+    #  For use from Python, e.g. to convert many samples in one process sharing one loaded mask:
+    #
+    #      mask = mask_maple.load_mask('fasTAN.bed')
+    #      with gzip.open('SRR21943188.g.vcf.gz', 'rt') as fin:
+    #          for record in vcf_to_maple(fin, 'SRR21943188', 20, 99, 'AND', mask=mask):
+    #              fout.write(maple_io.format_maple_record(record))
+    #
+    #  Arguments:
+    #      lines (iterator of str): the lines of the g.vcf, comment lines included or not, e.g. an
+    #                               open text file.
+    #      maple_root (str): the text for the '>' headers, the chromosome number is appended.
+    #      DP_min, GQ_min, operation: the DP and GQ criteria, see filter_vcf().
+    #      merge_n (bool): merge touching 'n' runs, see merge_n_runs().
+    #      mask (dict): masking regions from mask_maple.load_mask() or mask_maple.make_mask(), or None;
+    #                   each header is masked with the regions of its g.vcf chromosome (CHROM) first.
+    #      counts (dict): counts the lines of each kind, see parse_vcf() and filter_vcf().
+    #      vcf_file_text (str): the name of the g.vcf, used in messages.
+    #      engine (str): 'python' - line by line, 'numpy' - in chunks, see vcf_chunks_to_maple().
+    #
+    #  Yields:
+    #     tuple: the maple records (base, position, length), see filter_vcf().
+
+    lines = (line.strip() for line in lines if not line.startswith('#'))
+    header_chromosomes = {}
+    if engine == 'numpy':
+        records = maple_block_records(vcf_chunks_to_maple(lines_to_chunks(lines), maple_root, vcf_file_text,
+                                                          DP_min, GQ_min, operation, counts=counts,
+                                                          header_chromosomes=header_chromosomes))
+    else:
+        records = filter_vcf(parse_vcf(lines, maple_root, vcf_file_text, counts=counts,
+                                       header_chromosomes=header_chromosomes), DP_min, GQ_min, operation, counts)
+    if merge_n:
+        records = merge_n_runs(records, {})
+    if mask is not None:
+        records = mask_maple.mask_maple_records(records, dict(mask, chromosomes=header_chromosomes))
+    return records
+
+#
+#END of def vcf_to_maple(lines, maple_root, DP_min=20, GQ_min=99, operation='AND', merge_n=False, mask=None,
+#                        counts=None, vcf_file_text='<stream>', engine='python'):
+#
+
+
+def quality_maple_names(quality_file_text, output_dir=None):
+
+    #  Makes the output maple filename from the name of a quality file, SRR.mapleq becomes SRR.maple.
+    #
+    #  Returns:
+    #     tuple: (maple_fileout, None), the '>' headers are read from the quality file.
+
+    maple_fileout = maple_quality.maple_filename(quality_file_text)
+    if output_dir is not None:
+        maple_fileout = os.path.join(output_dir, os.path.basename(maple_fileout))
+    return maple_fileout, None
+
+#
+#END of def quality_maple_names(quality_file_text, output_dir=None):
+#
+
+
+def check_quality_criteria(quality_file_path, regions, criteria):
+
+    #  Checks that a maple file can be made from a quality file: it holds the whole g.vcf, and
+    #  DP up to maple_quality.MAX_DP and GQ up to maple_quality.MAX_GQ.
+    #
+    #  Arguments:
+    #      quality_file_path (str): Path to the quality file.
+    #      regions (list): the regions asked for, None for the whole file.
+    #      criteria (list): (DP_min, GQ_min, operation) of each maple file to write.
+    #
+    #  Raises:
+    #     VcfReadError: the quality file cannot give the maple file asked for.
+
+    if regions:
+        raise VcfReadError(f"Error: -r and -R need an indexed g.vcf.gz, not the quality file '{quality_file_path}'.")
+    for DP_min, GQ_min, operation in criteria:
+        if (DP_min > maple_quality.MAX_DP) or (GQ_min > maple_quality.MAX_GQ):
+            raise VcfReadError(f"Error: the quality file '{quality_file_path}' holds DP up to {maple_quality.MAX_DP} "
+                               f"and GQ up to {maple_quality.MAX_GQ}, not -DP {DP_min} -GQ {GQ_min}.")
+
+#
+#END of def check_quality_criteria(quality_file_path, regions, criteria):
+#
+
+
+def read_quality_file(quality_file_path):
+
+    #  Reads the calls of a quality file as parse_vcf() yields them, see maple_quality.read_quality_calls().
+
+    with open(quality_file_path, 'rb') as fin:
+        yield from maple_quality.read_quality_calls(fin)
+
+#
+#END of def read_quality_file(quality_file_path):
+#
+
+
+def quality_chunks(quality_file_path):
+
+    #  Reads the blocks of a quality file as parse_vcf_chunks() yields its parsed chunks, for the
+    #  numpy engine: each block is a chunk of calls, with its header as a header change at the
+    #  first call.
+    #
+    #  Yields:
+    #     tuple: (chunk, changes, header_texts), see parse_vcf_chunks().
+
+    for header_text, alleles, starts, ends, DP, GQ in maple_quality.read_quality_blocks(quality_file_path):
+        positions = starts.astype(np.int64)
+        chunk = {'call_lines': np.arange(alleles.size, dtype=np.int64), 'bases': alleles, 'positions': positions,
+                 'lengths': ends.astype(np.int64) - positions + 1, 'DP': DP.astype(np.int64), 'GQ': GQ.astype(np.int64)}
+        if header_text is None:
+            yield chunk, np.zeros(0, dtype=np.int64), []
+        else:
+            yield chunk, np.zeros(1, dtype=np.int64), [header_text]
+
+#
+#END of def quality_chunks(quality_file_path):
+#
+
+
+def write_quality_file(parsed, quality_fileout, engine='python'):
+
+    #  Passes on the parsed g.vcf, writing its calls to a quality file as well (see maple_quality.py)
+    #  so the maple file can be made again with other DP and GQ criteria from the quality file alone.
+    #  The quality file is written atomically once the g.vcf is read to the end, nothing is written
+    #  for a g.vcf file without any data lines.
+    #
+    #  Arguments:
+    #      parsed (iterator): the calls of parse_vcf(), or the parsed chunks of parse_vcf_chunks()
+    #                         with the numpy engine.
+    #      quality_fileout (str): Path to the quality file.
+    #      engine (str): the engine that parsed the g.vcf, see convert_vcf_file().
+    #
+    #  Yields:
+    #     the calls or parsed chunks, unchanged.
+
+    parsed = iter(parsed)
+    first = next(parsed, None)
+    if first is None:
+        return
+    parsed = itertools.chain([first], parsed)
+    if os.path.dirname(quality_fileout):
+        os.makedirs(os.path.dirname(quality_fileout), exist_ok=True)
+
+    with maple_io.atomic_output(quality_fileout, 'wb') as fout:
+        maple_quality.write_quality_header(fout)
+        if engine != 'numpy':
+            yield from maple_quality.write_quality_calls(fout, parsed)
+            return
+
+        for chunk, changes, header_texts in parsed:
+            if changes is None:     # the calls of a chunk parse_vcf_chunk() could not parse
+                collections.deque(maple_quality.write_quality_calls(fout, chunk), maxlen=0)
+            else:
+                bounds = np.concatenate(([0], np.searchsorted(chunk['call_lines'], changes), [chunk['call_lines'].size]))
+                for block in range(changes.size + 1):
+                    header_text = header_texts[block - 1] if block else None
+                    begin, end = bounds[block], bounds[block + 1]
+                    if (header_text is not None) or (end > begin):
+                        positions = chunk['positions'][begin:end]
+                        maple_quality.write_quality_block(fout, header_text, chunk['bases'][begin:end], positions,
+                                                          positions + chunk['lengths'][begin:end] - 1,
+                                                          chunk['DP'][begin:end], chunk['GQ'][begin:end])
+            yield chunk, changes, header_texts
+
+#
+#END of def write_quality_file(parsed, quality_fileout, engine='python'):
+#
+
+
+def convert_vcf_file(vcf_file_path, DP_min=20, GQ_min=99, operation='AND', output_dir=None, threads=1, regions=None,
+                     merge_n=False, mask=None, binary=False, engine='python', sweep=None, quality=False, output=None,
+                     sample_name=None, qc=False, metrics=None):
+
+    #  Streams the g.vcf file through parse_vcf() and filter_vcf() into the maple file,
+    #  records are written as they are decompressed.  The maple file is written atomically,
+    #  nothing is written for a g.vcf file without any data lines.  The input can be a quality
+    #  file (see maple_quality.py) in place of the g.vcf, SRR.mapleq is made into SRR.maple.
+    #  A g.vcf read from stdin, or a maple file written to stdout, is streamed through a pipe.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not), or to a quality file; '-' for
+    #                           a g.vcf on stdin, which needs sample_name.
+    #      DP_min, GQ_min, operation: the DP and GQ criteria, see filter_vcf().
+    #      output_dir (str): directory for the maple file, None to write it next to the input file.
+    #      threads (int): number of threads inflating a BGZF input file.
+    #      regions (list): (contig, start, end) tuples, 1-based and inclusive, to convert only the
+    #                      records overlapping these regions using the .tbi or .csi index.
+    #      merge_n (bool): merge touching 'n' runs, a line with the number of 'n' records
+    #                      collapsed is printed to stderr.
+    #      mask (dict): masking regions from mask_maple.load_mask(), the maple records are masked
+    #                   as by mask_maple.py before being written, each header with the regions of its
+    #                   g.vcf chromosome (CHROM) first, see mask_maple.mask_contig().
+    #      binary (bool): write a binary maple file (.mapleb) with maple_binary.py.
+    #      engine (str): 'python' - parse_vcf() and filter_vcf() line by line, 'numpy' - whole
+    #                    chunks at once with vcf_chunks_to_maple(), the maple file is the same.
+    #      sweep (list): (DP_min, GQ_min, operation) combinations, to write one maple file for each
+    #                    from a single pass over the g.vcf in place of DP_min, GQ_min and operation,
+    #                    see convert_sweep().
+    #      quality (bool): write the calls with their DP and GQ to a quality file next to the maple
+    #                      file as well, see write_quality_file().
+    #      output (str): Path to the maple file, as given (no .mapleb for binary, output_dir is not
+    #                    used); '-' for stdout, the default for stdin.  None to name the maple file
+    #                    from the input filename.
+    #      sample_name (str): the sample name of the '>' headers of a g.vcf, None to take it from the
+    #                         input filename.
+    #      qc (bool): write a QC summary next to the maple file, the records, 'n' bases and SNPs of
+    #                 each header and the records and bases masked, counted as the maple file is
+    #                 written, see maple_qc.py.  Not with sweep.
+    #      metrics (dict): filled with the metrics of the file, see maple_metrics.py: the time of the
+    #                      decompress, parse, filter (with merging and masking) and write phases, the
+    #                      line counts of parse_vcf() and filter_vcf(), and the mask statistics of
+    #                      mask_maple.mask_maple_records().  The numpy engine parses and applies the
+    #                      DP and GQ criteria in the parse phase.  Timing each phase adds a little time.
+    #
+    #  Returns:
+    #     tuple: (maple_fileout, number of maple records written), with sweep the maple file of
+    #            the first combination and the records written over all combinations.
+    #
+    #  Raises:
+    #     VcfReadError: the input file cannot be opened, read or decompressed, or a quality file
+    #                   is given with regions or criteria above what it holds.
+    #     MapleNameError: the input filename is not .g.vcf.gz or .g.vcf, stdin without sample_name,
+    #                     or a quality file or sweep written to stdout.
+    #     MapleFormatError: the quality file is damaged.
+    #     IOError: the output file cannot be written.
+
+    is_stdin = vcf_file_path == maple_io.STDIO
+    try:
+        is_gzip = vcf_is_gzip(vcf_file_path)
+        is_quality = (not is_gzip) and (not is_stdin) and maple_quality.is_quality_file(vcf_file_path)
+    except FileNotFoundError:
+        raise VcfReadError(f"Error: The file '{vcf_file_path}' was not found.")
+    except Exception as e:
+        raise VcfReadError(f"An error occurred: {e}")
+
+    if is_quality:
+        maple_fileout, maple_root = quality_maple_names(vcf_file_path, output_dir)
+    elif is_stdin:
+        maple_fileout, maple_root = maple_io.STDIO, None
+    else:
+        maple_fileout, maple_root = maple_names(vcf_file_path, is_gzip, output_dir)
+    if output is not None:
+        maple_fileout = output
+        output_dir = os.path.dirname(output) or None
+    if sample_name is not None:
+        maple_root = sample_name
+    if is_stdin and (maple_root is None):
+        raise MapleNameError("Error: a g.vcf read from stdin needs a sample name for the maple headers.")
+    if (maple_fileout == maple_io.STDIO) and (quality or sweep or qc):
+        raise MapleNameError("Error: a quality file, QC summary or sweep cannot be written with the maple file to stdout.")
+    if is_stdin and regions:
+        raise VcfReadError("Error: -r and -R need an indexed g.vcf.gz, not stdin.")
+    header_chromosomes = {}     # the g.vcf chromosome of each header, filled as the g.vcf is parsed
+    if mask is not None:
+        mask = dict(mask, chromosomes=header_chromosomes)
+    if metrics is not None:
+        metrics.update({'input': vcf_file_path, 'output': None, 'error': None, 'records_written': 0})
+        counts = metrics.setdefault('counts', {})
+        seconds = {}
+    else:
+        counts = None
+    if is_quality:
+        check_quality_criteria(vcf_file_path, regions, [(DP_min, GQ_min, operation)] + list(sweep or []))
+        if engine == 'numpy':
+            parsed = quality_chunks(vcf_file_path)
+        else:
+            parsed = read_quality_file(vcf_file_path)
+        if metrics is not None:
+            parsed = maple_metrics.timed(parsed, seconds, 'decompress')
+    elif regions:
+        # number the chromosomes as in a run over the whole file
+        try:
+            index = read_vcf_index(vcf_file_path)
+        except VcfReadError:
+            raise
+        except Exception as e:
+            raise VcfReadError(f"An error occurred: {e}")
+        chromosome_numbers = {name: ref + 1 for ref, name in enumerate(index['names'])}
+        lines = read_vcf_regions(vcf_file_path, regions, threads)
+        if engine == 'numpy':
+            lines = lines_to_chunks(lines)
+    else:
+        chromosome_numbers = None
+        if engine == 'numpy':
+            lines = read_vcf_chunks(vcf_file_path, is_gzip, threads)
+        else:
+            lines = read_vcf(vcf_file_path, is_gzip, threads)
+    if not is_quality:
+        if metrics is not None:
+            lines = maple_metrics.timed(lines, seconds, 'decompress')
+        if engine == 'numpy':
+            parsed = parse_vcf_chunks(lines, maple_root, vcf_file_path, chromosome_numbers, counts, header_chromosomes)
+        else:
+            parsed = parse_vcf(lines, maple_root, vcf_file_path, chromosome_numbers, counts, header_chromosomes)
+        if quality:
+            parsed = write_quality_file(parsed, maple_quality.quality_filename(maple_fileout), engine)
+
+    if sweep:
+        return convert_sweep(parsed, sweep, maple_fileout, output_dir, merge_n, mask, binary, engine, metrics)
+
+    blocks = None   # the blocks of the numpy engine, written as they are without -n, -m or --binary
+    if engine == 'numpy':
+        blocks = filter_vcf_chunks(parsed, DP_min, GQ_min, operation, counts)
+        if metrics is not None:
+            blocks = maple_metrics.timed(blocks, seconds, 'parse')
+        records = None
+        if merge_n or (mask is not None) or binary:
+            records = maple_block_records(blocks)
+    else:
+        calls = parsed
+        if metrics is not None:
+            calls = maple_metrics.timed(calls, seconds, 'parse')
+        records = filter_vcf(calls, DP_min, GQ_min, operation, counts)
+
+    merge_stats = {}
+    if merge_n:
+        records = merge_n_runs(records, merge_stats)
+
+    mask_stats = {}
+    header_stats = {} if qc else None
+    if mask is not None:
+        records = mask_maple.mask_maple_records(records, mask, mask_stats, header_stats)
+
+    contigs = {}    # the QC counters of each header
+    if qc:
+        if records is None:
+            blocks = maple_qc.count_blocks(blocks, contigs)
+        else:
+            records = maple_qc.count_records(records, contigs)
+
+    if metrics is not None:
+        if records is not None:
+            records = maple_metrics.timed(records, seconds, 'filter')
+        start = time.perf_counter()
+    try:
+        if records is None:
+            maple_fileout, record_count = write_maple_blocks(blocks, maple_fileout, output_dir, output is None)
+        else:
+            maple_fileout, record_count = write_maple_records(records, maple_fileout, output_dir, binary, output is None)
+        if metrics is not None:
+            metrics['output'] = maple_fileout if record_count else None
+            metrics['records_written'] = record_count
+    finally:
+        if metrics is not None:
+            total = time.perf_counter() - start
+            metrics['seconds'] = round(total, 6)
+            metrics['phases'] = maple_metrics.exclusive_phases(seconds, ['decompress', 'parse', 'filter', 'write'], total)
+            if merge_n:
+                metrics['merge_n'] = merge_stats
+            if mask is not None:
+                metrics['mask'] = mask_stats
+
+    if merge_n and record_count:
+        print(f"{maple_fileout}: merged {merge_stats['n_in']} 'n' records into {merge_stats['n_out']}, "
+              f"{merge_stats['n_in'] - merge_stats['n_out']} collapsed", file=sys.stderr)
+
+    if qc and record_count:
+        if header_stats:
+            maple_qc.add_masked(contigs, header_stats)
+        maple_qc.write_summary(maple_qc.qc_filename(maple_fileout), 'gvcf_to_maple_haploid',
+                               os.path.basename(maple_root) if maple_root else maple_qc.qc_sample_name(maple_fileout),
+                               vcf_file_path, maple_fileout, contigs)
+
+    return maple_fileout, record_count
+
+#
+#END of def convert_vcf_file(vcf_file_path, DP_min=20, GQ_min=99, operation='AND', output_dir=None, threads=1, regions=None,
+#                            merge_n=False, mask=None, binary=False, engine='python', sweep=None, quality=False, output=None,
+#                            sample_name=None, qc=False, metrics=None):
+#
+
+
+def parse_sweep(sweep_text):
+
+    #  Reads the combinations of DP and GQ criteria of a sweep (--sweep).
+    #
+    #  Arguments:
+    #      sweep_text (str): DP:GQ:operation combinations separated by ',', e.g. '20:99:AND,10:90:OR';
+    #                        the operation is AND when left out.
+    #
+    #  Returns:
+    #     list: (DP_min, GQ_min, operation) tuples in the order given, each once.
+    #
+    #  Raises:
+    #     ValueError: a combination is not DP:GQ or DP:GQ:AND|OR.
+
+    combinations = []
+    for text in sweep_text.split(','):
+        if not text.strip():
+            continue
+        fields = text.strip().split(':')
+        if len(fields) == 2:
+            fields.append('AND')
+        if (len(fields) != 3) or (fields[2].upper() not in ('AND', 'OR')):
+            raise ValueError(f"'{text}' is not DP:GQ or DP:GQ:AND|OR")
+        combination = (int(fields[0]), int(fields[1]), fields[2].upper())
+        if combination not in combinations:
+            combinations.append(combination)
+    return combinations
+
+#
+#END of def parse_sweep(sweep_text):
+#
+
+
+def sweep_filename(maple_fileout, DP_min, GQ_min, operation):
+
+    #  Returns the maple filename of one combination of a sweep: SRR21943188.maple becomes
+    #  SRR21943188_DP20_GQ99_AND.maple.  The '>' headers in the file are not changed.
+
+    head, extension, tail = maple_fileout.rpartition('.maple')
+    if not extension:
+        return maple_fileout
+    return f"{head}_DP{DP_min}_GQ{GQ_min}_{operation}{extension}{tail}"
+
+#
+#END of def sweep_filename(maple_fileout, DP_min, GQ_min, operation):
+#
+
+
+def fan_out(items, consumers, batch_size=SWEEP_BATCH_SIZE):
+
+    #  Passes the items of one iterator to several consumers, each reading its own iterator of
+    #  all the items in a thread of its own, so the items are produced once for all consumers.
+    #  Items are passed in batches through a bounded queue for each consumer, the slowest
+    #  consumer sets the pace.  When the items cannot be read to the end, each consumer gets
+    #  SweepAborted from its iterator and the error is raised.
     #
     #  Arguments:
-    #      vcf_file_path (str): Path to the VCF file (gzipped).
+    #      items (iterator): the items, read in the calling thread.
+    #      consumers (list): functions taking an iterator of the items.
+    #      batch_size (int): the number of items passed at once.
     #
     #  Returns:
-    #     list: A list of strings, where each string is a line from the VCF file.
+    #     list: what each consumer returned, in order.
+    #
+    #  Raises:
+    #     the first error of a consumer, or the error reading the items.
 
+    queues = [queue.Queue(SWEEP_QUEUE_SIZE) for consumer in consumers]
 
-    # lines to return
-    lines = []
-    global maple_fileout
-    global maple_root
-    # Initialize the output maplefile name
-    maple_fileout="initialize"
-    
-    # read gzip *.g.vcf.gz file
-    try:
-        # open the gzip file in text mode for automatic decompression
-        with gzip.open(vcf_file_path, 'rt') as file:
+    def queued(batches):
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if isinstance(batch, BaseException):
+                raise SweepAborted(f"the input was not read to the end: {batch!r}")
+            yield from batch
 
-            # replace string "g.vcf.gz" with "maple" for output file
-            maple_fileout = vcf_file_text.replace("g.vcf.gz","maple")
-            maple_root = vcf_file_text.replace(".g.vcf.gz","")            
+    def put(batches, future, batch):
+        while not future.done():        # a consumer that failed reads no more
+            try:
+                batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
 
-            for line in file:                       # Read each line
-                if not line.startswith('#'):        # If the line does not begin with a comment '#'
-                    lines.append(line.strip())      # Save the lines in the array lines.
-                    
-    except FileNotFoundError:
-         print(f"Error: The file '{vcf_file_path}' was not found.")
-         
-    except gzip.BadGzipFile:
+    with concurrent.futures.ThreadPoolExecutor(len(consumers)) as executor:
+        futures = [executor.submit(consumer, queued(batches)) for consumer, batches in zip(consumers, queues)]
+        items = iter(items)
         try:
-            # for non gzip file
-            with open(vcf_file_path, 'r') as file:
+            for batch in iter(lambda: list(itertools.islice(items, batch_size)), []):
+                for batches, future in zip(queues, futures):
+                    put(batches, future, batch)
+        except BaseException as e:
+            for batches, future in zip(queues, futures):
+                put(batches, future, e)
+            raise
+        for batches, future in zip(queues, futures):
+            put(batches, future, None)
+        return [future.result() for future in futures]
 
-                # replace string "g.vcf" with "maple" for output file                
-                maple_fileout = vcf_file_text.replace("g.vcf","maple")
-                if ".g.vcf.gz" in vcf_file_text:
-                    maple_root = vcf_file_text.replace(".g.vcf.gz","")                            
-                elif ".g.vcf" in vcf_file_text:
-                    maple_root = vcf_file_text.replace(".g.vcf","")                            
+#
+#END of def fan_out(items, consumers, batch_size=SWEEP_BATCH_SIZE):
+#
+
+
+def count_maple_records(records, totals):
+
+    #  Passes on maple records, counting in totals the 'n_records', the 'n_bases' they cover and
+    #  the 'snps' (alternate bases).
+
+    for record in records:
+        if record[0] == 'n':
+            totals['n_records'] += 1
+            totals['n_bases'] += record[2]
+        elif record[0] != '>' and record[0] != '-':
+            totals['snps'] += 1
+        yield record
+
+#
+#END of def count_maple_records(records, totals):
+#
+
+
+def count_maple_blocks(blocks, totals):
+
+    #  Passes on the blocks of the numpy engine, counting as count_maple_records().
+
+    for block in blocks:
+        header_text, types, positions, lengths = block
+        is_n = types == ord('n')
+        totals['n_records'] += int(np.count_nonzero(is_n))
+        totals['n_bases'] += int(lengths[is_n].sum())
+        totals['snps'] += int(np.count_nonzero(~is_n & (types != ord('-'))))
+        yield block
+
+#
+#END of def count_maple_blocks(blocks, totals):
+#
+
+
+def write_sweep_maple(parsed, combination, maple_fileout, output_dir=None, merge_n=False, mask=None, binary=False,
+                      engine='python'):
+
+    #  Writes the maple file of one combination of a sweep from the parsed g.vcf, as
+    #  convert_vcf_file() would with its DP and GQ criteria.
+    #
+    #  Arguments:
+    #      parsed (iterator): the calls of parse_vcf(), or the chunks of parse_vcf_chunks() with
+    #                         the numpy engine.
+    #      combination (tuple): (DP_min, GQ_min, operation).
+    #      maple_fileout (str): Path to the maple file of the g.vcf, see sweep_filename().
+    #      output_dir, merge_n, mask, binary, engine: see convert_vcf_file().
+    #
+    #  Returns:
+    #     dict: 'DP_min', 'GQ_min', 'operation', the 'output' file (None if nothing was written),
+    #           'records_written', 'n_records', 'n_bases' and 'snps' written, the 'counts' of the
+    #           calls passing and failing, and 'merge_n' and 'mask' statistics with -n and -m.
+
+    DP_min, GQ_min, operation = combination
+    result = {'DP_min': DP_min, 'GQ_min': GQ_min, 'operation': operation, 'output': None, 'records_written': 0,
+              'n_records': 0, 'n_bases': 0, 'snps': 0, 'counts': {}}
+
+    blocks = None
+    if engine == 'numpy':
+        blocks = filter_vcf_chunks(parsed, DP_min, GQ_min, operation, result['counts'])
+        records = None
+        if merge_n or (mask is not None) or binary:
+            records = maple_block_records(blocks)
+        else:
+            blocks = count_maple_blocks(blocks, result)
+    else:
+        records = filter_vcf(parsed, DP_min, GQ_min, operation, result['counts'])
+
+    merge_stats = {}
+    if merge_n:
+        records = merge_n_runs(records, merge_stats)
+        result['merge_n'] = merge_stats
+    mask_stats = {}
+    if mask is not None:
+        records = mask_maple.mask_maple_records(records, mask, mask_stats)
+        result['mask'] = mask_stats
+
+    maple_fileout = sweep_filename(maple_fileout, DP_min, GQ_min, operation)
+    if records is None:
+        maple_fileout, record_count = write_maple_blocks(blocks, maple_fileout, output_dir)
+    else:
+        maple_fileout, record_count = write_maple_records(count_maple_records(records, result), maple_fileout,
+                                                          output_dir, binary)
+    if record_count:
+        result['output'] = maple_fileout
+    result['records_written'] = record_count
+    return result
+
+#
+#END of def write_sweep_maple(parsed, combination, maple_fileout, output_dir=None, merge_n=False, mask=None, binary=False,
+#                             engine='python'):
+#
+
+
+def convert_sweep(parsed, sweep, maple_fileout, output_dir=None, merge_n=False, mask=None, binary=False, engine='python',
+                  metrics=None):
+
+    #  Writes one maple file for each combination of DP and GQ criteria from a single pass over
+    #  the g.vcf: the lines are decompressed and parsed once, and the calls passed to a thread for
+    #  each combination, see fan_out() and write_sweep_maple().  The maple file of each
+    #  combination is the one convert_vcf_file() writes with its criteria, under the name of
+    #  sweep_filename().  Nothing is kept of a combination when the g.vcf cannot be read to the end.
+    #
+    #  Arguments:
+    #      parsed (iterator): the calls of parse_vcf(), or the parsed chunks of parse_vcf_chunks()
+    #                         with the numpy engine.
+    #      sweep (list): (DP_min, GQ_min, operation) combinations.
+    #      maple_fileout: from convert_vcf_file().
+    #      output_dir, merge_n, mask, binary, engine: see convert_vcf_file().
+    #      metrics (dict): filled with the metrics of the file: the line counts, the time of the whole
+    #                      sweep and in 'sweep' the result of each combination from write_sweep_maple().
+    #
+    #  Returns:
+    #     tuple: (the maple file of the first combination, records written over all combinations)
+
+    start = time.perf_counter()
+    batch_size = 1 if engine == 'numpy' else SWEEP_BATCH_SIZE
+
+    consumers = [functools.partial(write_sweep_maple, combination=combination, maple_fileout=maple_fileout,
+                                   output_dir=output_dir, merge_n=merge_n, mask=mask, binary=binary, engine=engine)
+                 for combination in sweep]
+    results = fan_out(parsed, consumers, batch_size)
+    for result in results:
+        if merge_n and result['records_written']:
+            print(f"{result['output']}: merged {result['merge_n']['n_in']} 'n' records into {result['merge_n']['n_out']}, "
+                  f"{result['merge_n']['n_in'] - result['merge_n']['n_out']} collapsed", file=sys.stderr)
+
+    record_count = sum(result['records_written'] for result in results)
+    if metrics is not None:
+        metrics['output'] = results[0]['output']
+        metrics['records_written'] = record_count
+        metrics['sweep'] = results
+        metrics['seconds'] = round(time.perf_counter() - start, 6)
+    return results[0]['output'] or maple_fileout, record_count
+
+#
+#END of def convert_sweep(parsed, sweep, maple_fileout, output_dir=None, merge_n=False, mask=None, binary=False, engine='python',
+#                         metrics=None):
+#
+
+
+def write_sweep_summary(summary_file_text, file_metrics):
+
+    #  Writes the summary table of a sweep (--sweep_summary): a line for each combination of each
+    #  g.vcf file converted, tab separated, with the 'n' records and bases and the SNPs written.
+    #
+    #  Arguments:
+    #      summary_file_text (str): Path to the table.
+    #      file_metrics (list): the metrics of each g.vcf file, see convert_sweep().
+
+    with open(summary_file_text, 'w') as fout:
+        fout.write("input\tDP_min\tGQ_min\toperation\tmaple_file\tn_records\tn_bases\tsnps\n")
+        for metrics in file_metrics:
+            for result in metrics.get('sweep', []):
+                fout.write(f"{metrics['input']}\t{result['DP_min']}\t{result['GQ_min']}\t{result['operation']}\t"
+                           f"{result['output']}\t{result['n_records']}\t{result['n_bases']}\t{result['snps']}\n")
+
+#
+#END of def write_sweep_summary(summary_file_text, file_metrics):
+#
+
+
+def write_maple_records(records, maple_fileout, output_dir=None, binary=False, named=True):
+
+    #  Writes the maple records of a g.vcf file atomically, nothing is written when there are
+    #  no records.
+    #
+    #  Arguments:
+    #      records (iterator of tuple): the maple records.
+    #      maple_fileout (str): Path to the maple file, from maple_names(); '-' for stdout.
+    #      output_dir (str): directory for the maple file, created if needed, or None.
+    #      binary (bool): write a binary maple file, the filename extension becomes .mapleb.
+    #      named (bool): maple_fileout is named from the input filename; False to write it as given
+    #                    (--output), without the .maple check and the .mapleb extension.
+    #
+    #  Returns:
+    #     tuple: (maple_fileout, number of maple records written)
+    #
+    #  Raises:
+    #     MapleNameError: maple_fileout is not a .maple filename.
+    #     IOError: the output file cannot be written.
+
+    first_record = next(records, None)
+    if first_record is None:
+        return maple_fileout, 0
+
+    # Check the output maplefile name
+    if named and (".maple" not in maple_fileout):
+        raise MapleNameError(f"An error occurred, cannot use output file, input filename not .g.vcf.gz or .g.vcf and no .maple in output filename")
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if binary:
+        if named:
+            maple_fileout = maple_binary.binary_filename(maple_fileout)
+        with maple_io.output_file(maple_fileout, 'wb') as outfile:
+            record_count = maple_binary.write_maple_binary(outfile, itertools.chain([first_record], records))
+    else:
+        record_count = 1
+        # open maplefile for writing
+        with maple_io.output_file(maple_fileout) as outfile:
+            outfile.write(maple_io.format_maple_record(first_record))
+            for record in records:
+                outfile.write(maple_io.format_maple_record(record))
+                record_count += 1
+
+    return maple_fileout, record_count
+
+#
+#END of def write_maple_records(records, maple_fileout, output_dir=None, binary=False, named=True):
+#
+
+
+def write_maple_blocks(blocks, maple_fileout, output_dir=None, named=True):
+
+    #  Writes the blocks of maple records of the numpy engine to a text maple file atomically,
+    #  each block formatted at once; nothing is written when there are no records.
+    #
+    #  Arguments:
+    #      blocks (iterator of tuple): from vcf_chunks_to_maple().
+    #      maple_fileout (str): Path to the maple file, from maple_names(); '-' for stdout.
+    #      output_dir (str): directory for the maple file, created if needed, or None.
+    #      named (bool): see write_maple_records().
+    #
+    #  Returns:
+    #     tuple: (maple_fileout, number of maple records written)
+    #
+    #  Raises:
+    #     MapleNameError: maple_fileout is not a .maple filename.
+    #     IOError: the output file cannot be written.
+
+    first_block = next(blocks, None)
+    if first_block is None:
+        return maple_fileout, 0
+
+    # Check the output maplefile name
+    if named and (".maple" not in maple_fileout):
+        raise MapleNameError(f"An error occurred, cannot use output file, input filename not .g.vcf.gz or .g.vcf and no .maple in output filename")
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    record_count = 0
+    with maple_io.output_file(maple_fileout) as outfile:
+        for header_text, types, positions, lengths in itertools.chain([first_block], blocks):
+            outfile.write(mask_maple.format_maple_block(header_text, types, positions, lengths))
+            record_count += (header_text is not None) + types.size
+
+    return maple_fileout, record_count
+
+#
+#END of def write_maple_blocks(blocks, maple_fileout, output_dir=None, named=True):
+#
+
+
+def convert_vcf(vcf_file_path, options, file_metrics=None):
+
+    #  Converts a single g.vcf file, reporting errors as the command line tool always has, to
+    #  stdout, or to stderr when the maple file is written to stdout.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not), '-' for stdin.
+    #      options (dict): keyword arguments for convert_vcf_file().
+    #      file_metrics (list): the metrics of the file are appended, see convert_vcf_file(),
+    #                           None to collect none.
+    #
+    #  Returns:
+    #     int: exit code, 1 if the output file cannot be written.
+
+    metrics = None
+    if file_metrics is not None:
+        metrics = {'input': vcf_file_path}
+        file_metrics.append(metrics)
+    messages = sys.stderr if options.get('output') == maple_io.STDIO else sys.stdout
+    try:
+        convert_vcf_file(vcf_file_path, metrics=metrics, **options)
+
+    except VcfReadError as e:
+        print(e, file=messages)
+        if metrics is not None:
+            metrics['error'] = str(e)
+
+    except (MapleNameError, maple_binary.MapleFormatError) as e:
+        print(e, file=messages)
+        if metrics is not None:
+            metrics['error'] = str(e)
+        return 1
+
+    except IOError as e:
+        print(f"An error occurred, writing to output file. {e}", file=messages)
+        if metrics is not None:
+            metrics['error'] = f"An error occurred, writing to output file. {e}"
+        return 1
+
+    return 0
+
+#
+#END of def convert_vcf(vcf_file_path, options, file_metrics=None):
+#
+
+
+def list_batch_files(batch_text):
+
+    #  Reads the list of g.vcf files for a batch run.
+    #
+    #  Arguments:
+    #      batch_text (str): a file containing one g.vcf filename per line (blank lines and
+    #                        lines starting with '#' are ignored), or a glob pattern such as
+    #                        'gvcfs/*.g.vcf.gz'.
+    #
+    #  Returns:
+    #     list: the g.vcf filenames in the order given (sorted for a glob pattern).
+
+    if os.path.isfile(batch_text):
+        with open(batch_text, 'r') as flistin:
+            return [line.strip() for line in flistin if line.strip() and not line.startswith('#')]
+    return sorted(glob.glob(batch_text))
+
+#
+#END of def list_batch_files(batch_text):
+#
+
+
+def init_convert_worker(options, collect_metrics=False):
+
+    #  Keeps the options of convert_vcf_file(), the masking regions among them, in each worker
+    #  process, so they are passed to a worker once rather than with every g.vcf file.  With
+    #  collect_metrics the metrics of each file are collected.
+
+    global worker_options
+    global worker_collect_metrics
+    worker_options = options
+    worker_collect_metrics = collect_metrics
+
+#
+#END of def init_convert_worker(options, collect_metrics=False):
+#
+
+
+def convert_batch_file(vcf_file_path):
+
+    #  Converts one file of a batch run with the options given to init_convert_worker(), errors
+    #  are returned rather than raised so that one bad sample does not stop the batch.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the g.vcf file.
+    #
+    #  Returns:
+    #     tuple: (vcf_file_path, maple_fileout, error message or None, metrics of the file or None)
+
+    metrics = {'input': vcf_file_path} if worker_collect_metrics else None
+    maple_fileout, error = None, None
+    try:
+        maple_fileout, record_count = convert_vcf_file(vcf_file_path, metrics=metrics, **worker_options)
+        if record_count == 0:
+            maple_fileout = None
+
+    except (VcfReadError, MapleNameError, maple_binary.MapleFormatError) as e:
+        error = str(e)
+
+    except IOError as e:
+        error = f"An error occurred, writing to output file. {e}"
 
-                for line in file:
-                    if not line.startswith('#'):
-                        lines.append(line.strip())
-                        
-        except Exception as e:
-             print(f"Error reading file non-gzip: {e}")
-             return None
-         
     except Exception as e:
-        print(f"An error occurred: {e}")
-        return None
+        error = f"An error occurred: {e!r}"
+
+    if metrics is not None:
+        metrics['error'] = error
+    return vcf_file_path, maple_fileout, error, metrics
+
+#
+#END of def convert_batch_file(vcf_file_path):
+#
+
+
+def convert_files(vcf_files, jobs, options, collect_metrics=False):
+
+    #  Converts g.vcf files in jobs worker processes, see convert_batch_file().
+    #
+    #  Arguments:
+    #      vcf_files (list): Paths to the g.vcf files.
+    #      jobs (int): number of worker processes.
+    #      options (dict): keyword arguments for convert_vcf_file().
+    #      collect_metrics (bool): collect the metrics of each file.
+    #
+    #  Yields:
+    #     tuple: the result of each file from convert_batch_file(), in the order of vcf_files, as
+    #            soon as the file is converted.
+
+    if jobs <= 1:
+        init_convert_worker(options, collect_metrics)
+        for vcf_file_path in vcf_files:
+            yield convert_batch_file(vcf_file_path)
+        return
+
+    with multiprocessing.Pool(jobs, initializer=init_convert_worker, initargs=(options, collect_metrics)) as pool:
+        yield from pool.imap(convert_batch_file, vcf_files)
+
+#
+#END of def convert_files(vcf_files, jobs, options, collect_metrics=False):
+#
+
+
+def convert_batch(batch_text, jobs, options, file_metrics=None, shard=None):
+
+    #  Converts every g.vcf file of a batch in jobs worker processes.  Each maple file
+    #  is written next to its input file, or into options['output_dir'].
+    #
+    #  Arguments:
+    #      batch_text (str): list file or glob pattern, see list_batch_files().
+    #      jobs (int): number of worker processes.
+    #      options (dict): keyword arguments for convert_vcf_file().
+    #      file_metrics (list): the metrics of each file are appended, see convert_vcf_file(),
+    #                           None to collect none.
+    #      shard (tuple): (index, count) to convert only the g.vcf files of one shard of the batch,
+    #                     see maple_shard.py; None for all.
+    #
+    #  Returns:
+    #     int: exit code, 0 if every file was converted, 1 if any file failed.
+
+    vcf_files = list_batch_files(batch_text)
+    if not vcf_files:
+        print(f"Error: no g.vcf files found for batch '{batch_text}'", file=sys.stderr)
+        return 1
+    if shard:
+        selected = maple_shard.select_shard(vcf_files, shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(selected)} of {len(vcf_files)} g.vcf files", file=sys.stderr)
+        vcf_files = selected
+
+    results = list(convert_files(vcf_files, jobs, options, file_metrics is not None))
+
+    if file_metrics is not None:
+        file_metrics.extend(metrics for vcf_file_path, maple_fileout, error, metrics in results)
+
+    failures = [(vcf_file_path, error) for vcf_file_path, maple_fileout, error, metrics in results if error]
+    for vcf_file_path, error in failures:
+        print(f"FAILED {vcf_file_path}: {error}", file=sys.stderr)
+    print(f"Converted {len(results) - len(failures)} of {len(results)} g.vcf files, {len(failures)} failed", file=sys.stderr)
+
+    return 1 if failures else 0
+
+#
+#END of def convert_batch(batch_text, jobs, options, file_metrics=None, shard=None):
+#
+
+
+def maple_output_file(vcf_file_path, options):
+
+    #  Returns the path of the maple file convert_vcf_file() writes for a g.vcf file.
+    #
+    #  Arguments:
+    #      vcf_file_path (str): Path to the VCF file (gzipped or not).
+    #      options (dict): keyword arguments for convert_vcf_file().
+
+    if options.get('output'):
+        return options['output']
+    try:
+        is_gzip = vcf_is_gzip(vcf_file_path)
+        is_quality = (not is_gzip) and maple_quality.is_quality_file(vcf_file_path)
+    except Exception:       # the conversion reports the error
+        is_gzip = vcf_file_path.endswith('.gz')
+        is_quality = False
+    if is_quality:
+        maple_fileout = quality_maple_names(vcf_file_path, options.get('output_dir'))[0]
+    else:
+        maple_fileout = maple_names(vcf_file_path, is_gzip, options.get('output_dir'))[0]
+    if options.get('binary'):
+        maple_fileout = maple_binary.binary_filename(maple_fileout)
+    return maple_fileout
+
+#
+#END of def maple_output_file(vcf_file_path, options):
+#
+
+
+def manifest_parameters(args):
 
-    return lines
+    #  Returns everything but the g.vcf file the maple files of a run depend on, for the manifest:
+    #  the DP and GQ criteria, the regions, -n, --binary, the masking regions (the .bed and contig
+    #  map files by their SHA-256), --quality, whose quality file is written with the maple file,
+    #  and --sample_name and --qc when given.  The engine, threads and jobs do not change the maple files.
+
+    parameters = {'DP_min': args.DP_MIN, 'GQ_min': args.GQ_MIN, 'operation': args.operation, 'regions': args.regions,
+                  'merge_n': args.merge_n, 'binary': args.binary, 'quality': args.quality,
+                  'mask_bed': maple_manifest.file_hash(args.mask_bed) if args.mask_bed else None,
+                  'mask_contig': args.mask_contig if args.mask_bed else None,
+                  'mask_contig_map': maple_manifest.file_hash(args.mask_contig_map) if (args.mask_bed and args.mask_contig_map) else None}
+    if args.sample_name:
+        parameters['sample_name'] = args.sample_name
+    if args.qc:
+        parameters['qc'] = True
+    return parameters
+
+#
+#END of def manifest_parameters(args):
+#
+
+
+def convert_manifest(vcf_files, manifest_file_text, jobs, options, parameters, dry_run=False, file_metrics=None,
+                     shard=None):
+
+    #  Converts the g.vcf files whose maple file is not up to date in the manifest, and records the
+    #  maple files written.  The manifest is written even when the run is stopped, so a re-run goes
+    #  on from the files already converted.
+    #
+    #  Arguments:
+    #      vcf_files (list): Paths to the g.vcf files.
+    #      manifest_file_text (str): Path to the manifest, see maple_manifest.py; created if needed.
+    #      jobs (int): number of worker processes.
+    #      options (dict): keyword arguments for convert_vcf_file().
+    #      parameters (dict): from manifest_parameters().
+    #      dry_run (bool): only list the g.vcf files to convert and why, to stdout.
+    #      file_metrics (list): the metrics of each file converted are appended, None to collect none.
+    #      shard (tuple): (index, count) to convert only the g.vcf files of one shard of vcf_files; the
+    #                     shard is recorded in the manifest, with the SHA-256 of each maple file, see
+    #                     maple_shard.py; None for all.
+    #
+    #  Returns:
+    #     int: exit code, 0 if every file was converted, 1 if any file failed.
+    #
+    #  Raises:
+    #     ValueError, IOError: the manifest cannot be read or written.
+
+    manifest = maple_manifest.read_manifest(manifest_file_text)
+    outputs = [(vcf_file_path, maple_output_file(vcf_file_path, options)) for vcf_file_path in vcf_files]
+    if shard:
+        manifest['shard'] = maple_shard.shard_record(outputs, shard, 'gvcf_to_maple_haploid', VERSION, parameters)
+        outputs = [(vcf_file_path, maple_fileout) for vcf_file_path, maple_fileout in outputs
+                   if maple_shard.in_shard(vcf_file_path, shard)]
+        print(f"Shard {shard[0]}/{shard[1]}: {len(outputs)} of {len(vcf_files)} g.vcf files", file=sys.stderr)
+    todo, up_to_date = maple_manifest.plan_outputs(manifest, outputs, 'gvcf_to_maple_haploid', VERSION, parameters)
+    if dry_run:
+        sys.stdout.write(maple_manifest.format_plan(todo, up_to_date))
+        return 0
+    print(f"{len(up_to_date)} maple files up to date, converting {len(todo)}", file=sys.stderr)
+
+    # the g.vcf files as they are before converting
+    input_states = {vcf_file_path: maple_manifest.file_state(vcf_file_path,
+                                                              manifest['outputs'].get(os.path.normpath(maple_fileout)))
+                    for vcf_file_path, maple_fileout, reason in todo}
+    failures = 0
+    try:
+        results = convert_files([vcf_file_path for vcf_file_path, maple_fileout, reason in todo], jobs, options,
+                                file_metrics is not None)
+        for (vcf_file_path, maple_fileout, reason), (path, written_file, error, metrics) in zip(todo, results):
+            if file_metrics is not None:
+                file_metrics.append(metrics)
+            if error:
+                failures += 1
+                print(f"FAILED {vcf_file_path}: {error}", file=sys.stderr)
+            elif input_states[vcf_file_path] is not None:
+                maple_manifest.record_output(manifest, maple_fileout, 'gvcf_to_maple_haploid', VERSION, vcf_file_path,
+                                             input_states[vcf_file_path], parameters, written_file is not None,
+                                             output_hash=shard is not None)
+    finally:
+        maple_manifest.write_manifest(manifest_file_text, manifest)
+    print(f"Converted {len(todo) - failures} of {len(todo)} g.vcf files, {failures} failed", file=sys.stderr)
+
+    return 1 if failures else 0
 
-#            
-#END of def read_vcf(vcf_file_path):
+#
+#END of def convert_manifest(vcf_files, manifest_file_text, jobs, options, parameters, dry_run=False, file_metrics=None,
+#                            shard=None):
 #
 
 
-def process_arguments_vcf():
+def process_arguments_vcf(argv=None, mask_cache=None):
 
     #  Checks to see that 4 arguments are entered on the command line
     #
@@ -86,6 +2491,16 @@ def process_arguments_vcf():
     #      3) GQ_min_val as a command line argument
     #      4) "AND" or "OR" as a command line argument to select choice A or choice B
     #
+    #  Instead of 1) a batch of g.vcf files can be given with -b, see list_batch_files(),
+    #  converted by -j worker processes into the -d directory (default next to each input).
+    #
+    #  argv (list): the arguments, default sys.argv[1:].
+    #  mask_cache (dict): the masks already loaded, see mask_maple.load_mask(); None to read -m.
+    #
+    #  Returns:
+    #     argparse.Namespace: the arguments, with 'regions' the parsed -r and -R regions (None for
+    #                         the whole file) and 'mask' the loaded -m masking regions (or None).
+    #
     #  No return unless 4 valid arguments have been entered.
     #
     parser = argparse.ArgumentParser(description='''A script that takes four command-line arguments.
@@ -98,32 +2513,173 @@ def process_arguments_vcf():
         -e OR used as  (DP >= DP_min_val) OR (GQ >= GQ_min_val)
         -e AND used as (DP >= DP_min_val) AND (GQ >= GQ_min_val)'''
     ,formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument('-i','--input_file',help='The name of the input g.vcf.gz file.',required=True)
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument('-i','--input_file',help='The name of the input g.vcf.gz file, or of a .mapleq quality file written with --quality;\n- for a g.vcf (gzipped or not) on stdin, written to stdout unless --output is given.')
+    input_group.add_argument('-b','--batch',help='A file containing a list of g.vcf.gz (or .mapleq) files, or a quoted glob pattern, to convert as a batch.')
     parser.add_argument('-DP','--DP_MIN', help='The value (integer) of the minimum read depth; recommend using 20.',type=int,default=20)
     parser.add_argument('-GQ','--GQ_MIN', help='The value (integer) of the minimum genotype quality; recommend using 99.',type=int,default=99)
     parser.add_argument('-o','--operation', help='The text AND or the text OR. Usage example: min_read_depth AND min_conf ; recommend using AND.',choices=['AND','OR'],default='AND')
-    parser.add_argument('-v','--verbose',action='store_true',help='Enable verbose output')
-    args = parser.parse_args()
-
-    global vcf_filename    # The first argument
-    global DP_min_val      # The second argument
-    global DP_min_val_int  # The second argument cast to integer
-    global GQ_min_val      # The third argument
-    global GQ_min_val_int  # The third argument cast to integer
-    global choice          # The fourth argument
-    global vcf_file_text   # The text of filename
-    vcf_filename = ""      # Initialize filename
-    
-    vcf_filename = args.input_file
-    DP_min_val = args.DP_MIN
-    GQ_min_val = args.GQ_MIN
-    choice = args.operation
-    vcf_file_text = vcf_filename
-    DP_min_val_int = int(DP_min_val)
-    GQ_min_val_int = int(GQ_min_val)        
-        
-#            
-#END of def process_arguments_vcf():
+    parser.add_argument('-j','--jobs', help='The number of worker processes for a batch; default 1.',type=int,default=1)
+    parser.add_argument('-d','--output_directory', help='The directory for the maple file(s); default next to each input file.')
+    parser.add_argument('--output', help='With -i, the name of the maple file, as given (--binary adds no .mapleb); - for stdout.\nDefault named from the input file.')
+    parser.add_argument('--sample_name', help='With -i, the sample name of the \'>\' headers, e.g. SRR21943188 writes >SRR21943188_1;\ndefault the input filename without .g.vcf.gz, needed with -i -.')
+    parser.add_argument('-t','--threads', help='The number of threads inflating a BGZF (bgzip) input file; default 1.',type=int,default=1)
+    parser.add_argument('-r','--region', help='Convert only the records overlapping a region contig, contig:start or contig:start-end\n(1-based, comma separated or repeated); needs a .tbi or .csi index.',action='append')
+    parser.add_argument('-R','--regions_file', help='Convert only the records overlapping the regions in a .bed file; needs a .tbi or .csi index.')
+    parser.add_argument('-n','--merge_n',action='store_true',help='Merge touching \'n\' runs into one \'n\' record, prints the number of records collapsed.')
+    parser.add_argument('-m','--mask_bed',help='A .bed file of masking regions, the maple file is masked as by mask_maple.py while it is written.')
+    parser.add_argument('--mask_contig',help='The .bed chromosome to mask every chromosome with, as -c of mask_maple.py.')
+    parser.add_argument('--mask_contig_map',help='A file mapping chromosome numbers to .bed chromosomes, as -C of mask_maple.py.')
+    parser.add_argument('--binary',action='store_true',help='Write a binary maple file (.mapleb, see maple_binary.py); default text.')
+    parser.add_argument('-e','--engine', help='The parsing engine, python (default, line by line) or numpy (chunks at once, needs numpy).',choices=['python','numpy'],default='python')
+    parser.add_argument('-s','--sweep',help='Combinations DP:GQ:AND|OR, comma separated, e.g. 20:99:AND,10:90:OR: one maple file for each,\nnamed e.g. SRR21943188_DP20_GQ99_AND.maple, from a single pass over the g.vcf (-DP, -GQ and -o are not used).')
+    parser.add_argument('-q','--quality',action='store_true',help='Write the calls with their DP and GQ to a quality file next to the maple file (SRR21943188.mapleq,\nsee maple_quality.py), to make the maple file again with other -DP and -GQ from it in place of the g.vcf.')
+    parser.add_argument('--qc',action='store_true',help='Write a QC summary next to each maple file (SRR21943188.qc.json, see maple_qc.py): the records,\n\'n\' bases and SNPs of each chromosome, and the records and bases masked with -m.')
+    parser.add_argument('--sweep_summary',help='With --sweep, write a table of the \'n\' records, \'n\' bases and SNPs written for each combination.')
+    parser.add_argument('--manifest',help='A manifest of the maple files written (see maple_manifest.py), created if needed: the maple files\nup to date (same g.vcf content, parameters and version) are skipped, the others converted and recorded.')
+    parser.add_argument('--dry_run',action='store_true',help='With --manifest, list the g.vcf files to convert and why, without converting.')
+    parser.add_argument('--shard',help='I/N: with -b, convert only the I-th of N shards of the batch, picked by a hash of the sample name,\nto run a batch on N nodes; with --manifest the shard is recorded for maple_shard.py to check.')
+    parser.add_argument('--metrics_json',help='Write the metrics of the run to this JSON file: phase times, line counts and mask statistics\nof each g.vcf file, see maple_metrics.py.')
+    parser.add_argument('--profile',help='Profile the run with cProfile and write the stats to this file (the main process only).')
+    parser.add_argument('-v','--verbose',action='store_true',help='Print the metrics of each g.vcf file to stderr.')
+    args = parser.parse_args(argv)
+
+    if (args.engine == 'numpy') and (np is None):
+        parser.error("-e numpy needs the numpy package, install it or use -e python")
+
+    if args.jobs < 1:
+        parser.error("-j/--jobs must be at least 1")
+    if args.dry_run and not args.manifest:
+        parser.error("--dry_run needs --manifest")
+    if args.sweep_summary and not args.sweep:
+        parser.error("--sweep_summary needs --sweep")
+    if args.sweep and args.manifest:
+        parser.error("--sweep cannot be used with --manifest")
+    if args.threads < 1:
+        parser.error("-t/--threads must be at least 1")
+    if (args.output or args.sample_name) and not args.input_file:
+        parser.error("--output and --sample_name need -i/--input_file")
+    if args.output and args.output_directory:
+        parser.error("--output cannot be used with -d/--output_directory")
+    stdin = args.input_file == maple_io.STDIO
+    if stdin and not args.sample_name:
+        parser.error("-i - needs --sample_name")
+    if stdin and not args.output:
+        args.output = maple_io.STDIO
+    if stdin and (args.region or args.regions_file or args.manifest):
+        parser.error("-i - cannot be used with -r, -R or --manifest")
+    if (args.output == maple_io.STDIO) and (args.quality or args.sweep or args.manifest or args.qc):
+        parser.error("-q, --sweep, --manifest and --qc cannot be used with the maple file written to stdout")
+    if args.qc and args.sweep:
+        parser.error("--qc cannot be used with --sweep")
+    if args.shard:
+        if not args.batch:
+            parser.error("--shard needs -b/--batch")
+        try:
+            args.shard = maple_shard.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    args.regions = None    # The regions to convert, None for the whole file
+    try:
+        if args.region:
+            args.regions = [parse_region(text) for texts in args.region for text in texts.split(',') if text]
+        if args.regions_file:
+            args.regions = (args.regions or []) + read_regions_file(args.regions_file)
+    except (ValueError, IOError) as e:
+        parser.error(f"cannot read the regions: {e}")
+
+    if args.sweep:
+        try:
+            args.sweep = parse_sweep(args.sweep)
+        except ValueError as e:
+            parser.error(f"cannot read the sweep: {e}")
+        if not args.sweep:
+            parser.error("--sweep needs at least one DP:GQ:AND|OR combination")
+
+    args.mask = None       # The masking regions, None when not masking
+    if args.mask_bed:
+        try:
+            args.mask = mask_maple.load_mask(args.mask_bed, args.mask_contig, args.mask_contig_map, mask_cache)
+        except (ValueError, IOError) as e:
+            parser.error(f"cannot read the mask file: {e}")
+
+    return args
+
+#
+#END of def process_arguments_vcf(argv=None, mask_cache=None):
+#
+
+
+def convert_options(args):
+
+    #  Returns the keyword arguments for convert_vcf_file() of the command line arguments, from
+    #  process_arguments_vcf().
+
+    options = {'DP_min': args.DP_MIN, 'GQ_min': args.GQ_MIN, 'operation': args.operation,
+               'output_dir': args.output_directory, 'threads': args.threads, 'regions': args.regions,
+               'merge_n': args.merge_n, 'mask': args.mask, 'binary': args.binary, 'engine': args.engine,
+               'quality': args.quality, 'output': args.output, 'sample_name': args.sample_name, 'qc': args.qc}
+    if args.sweep:
+        options['sweep'] = args.sweep
+    return options
+
+#
+#END of def convert_options(args):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool: converts the -i g.vcf file or the -b batch, see process_arguments_vcf().
+    #
+    #  Arguments:
+    #      argv (list): the command line arguments, default sys.argv[1:].
+    #
+    #  Returns:
+    #     int: exit code.
+
+    # Check the command line arguments
+    args = process_arguments_vcf(argv)
+
+    options = convert_options(args)
+    file_metrics = [] if (args.metrics_json or args.verbose or args.sweep_summary) else None
+    start = time.perf_counter()
+
+    with maple_metrics.profiled(args.profile):
+        # Convert the gvcf files whose maple file is not up to date
+        if args.manifest:
+            vcf_files = list_batch_files(args.batch) if args.batch else [args.input_file]
+            try:
+                exit_code = convert_manifest(vcf_files, args.manifest, args.jobs, options, manifest_parameters(args),
+                                             args.dry_run, file_metrics, args.shard)
+            except (ValueError, IOError) as e:
+                print(f"Error reading the file - {e}")
+                exit_code = 1
+
+        # Convert a batch of gvcf files
+        elif args.batch:
+            exit_code = convert_batch(args.batch, args.jobs, options, file_metrics, args.shard)
+
+        # Stream the gvcf file into the maple file
+        elif args.input_file:
+            exit_code = convert_vcf(args.input_file, options, file_metrics)
+        else:
+            exit_code = 1
+
+    if args.verbose:
+        for metrics in file_metrics:
+            print(maple_metrics.summary_line(metrics), file=sys.stderr)
+    if args.sweep_summary:
+        write_sweep_summary(args.sweep_summary, file_metrics)
+    if args.metrics_json:
+        maple_metrics.write_metrics_json(args.metrics_json, 'gvcf_to_maple_haploid', file_metrics, time.perf_counter() - start,
+                                         argv)
+    return exit_code
+
+#
+#END of def main(argv=None):
+#
 #
 
 
@@ -207,146 +2763,5 @@ def process_arguments_vcf():
 #
 
 
-# Check the command line arguments
-process_arguments_vcf()
-
-
-# Read the contents of the gvcf file into vcf_data - an array of strings
-if vcf_filename != "":
-    vcf_data = read_vcf(vcf_filename)
-else:
-    sys.exit(1)
-
-# Initialize g.vcf.gz chromosome string
-chromosome="initialize"
-chromosome_number = 0
-
-# If input file was read into vcf_data
-if vcf_data:
-
-    # Check the output maplefile name
-    if ".maple" in maple_fileout:
-        try:
-            # open maplefile for writing
-            with open(maple_fileout, 'w') as outfile:
-
-                # process lines in input file
-                for line in vcf_data:
-
-                    # split line into array aline by tab separator
-                    aline = line.split('\t')
-                    
-                    # only used in if statements if GT == '.', otherwise used as a catch for omitting a line.
-                    no_call = 0                        
-
-                    # Check to see if this is a new chromosome; using filename as chromosome number:
-                    if aline[0] != chromosome:
-                        chromosome_number += 1
-                        chromosome_text = maple_root + "_" + str(chromosome_number)
-                        chromosome = aline[0]                       #save the g.vcf.gz new chromosome string
-                        output_string=f">{chromosome_text}\n"       #make header for maple file data for next chromosome
-
-                        outfile.write(output_string)   #print the header to the maple file
-
-                    # Check to see if the reference allele more than one base, if more than one base then skip output
-                    # This indicates a deletion - note there could possibly be an exception which is not addressed here.
-                    # If the reference allele is n bases long and the best alternate allele is the same length, then this 
-                    # would not be an insertion event, but the maple cannot have a multi base string (? is this true?)
-                    if len(aline[3]) > 1:
-                        no_call = 1
-
-                    # Check to see if this is a reference segment.  Note col 8 always starts with 'GT:'
-                    # When col 4 is only "<NON_REF>" aline[9] always starts with 0: aline[8] is always 'GT:DP:GQ'
-                    # When col 4 is only "<NON_REF>" there are no multiple choice alternate alleles
-                    # Check the DP and GQ pass the user criteria        
-                    elif (aline[4] == "<NON_REF>") and (aline[8].startswith("GT:DP:GQ")) and (aline[9].startswith("0:")):
-                        missing_call = 0
-                        # split aline[9] by ':' into values for 'GT:DP:GQ:'
-                        stats = aline[9].split(':')
-
-                        # check if critera is not met for validated reference sequence
-                        if (choice == 'AND'):
-                            if (int(stats[1]) < DP_min_val_int) or (int(stats[2]) < GQ_min_val_int):
-                                missing_call = 1
-                        elif (choice == 'OR'):
-                            if ((int(stats[1]) < DP_min_val_int) and (int(stats[2]) < GQ_min_val_int)):
-                                missing_call = 1
-
-                        # if critera is not met for validated reference sequence, print sequence as 'missing' or 'n'
-                        if missing_call:
-                            end_of_sequence = aline[7].split('=')
-
-                            output_string = f"n\t{aline[1]}\t{str(int(end_of_sequence[1])-int(aline[1])+1)}\n"
-                            outfile.write(output_string)
-
-                
-                    # Check to see if this is a alternate segment.  Note col 8 always starts with 'GT:'
-                    # When col 4 has more than one option (has ',') as in ",<NON_REF>" aline[8] is always 'GT:AD:DP:GQ'
-                    # When col 4 ",<NON_REF>" there can be multiple alternate alleles, the best alternate is the value of GT
-                    # Check the value of GT, ##DISCARD THIS -> check the AD is > DP_min_val, use DP instead of individual AD
-                    # Check the DP and GQ pass the user criteria
-                    # Check the alternate allele is only one base (no inserts allowed!)
-                    elif (",<NON_REF>" in aline[4]) and (aline[8].startswith("GT:AD:DP:GQ")):
-                        missing_call = 0
-                        # split aline[9] by ':' into values for 'GT:DP:GQ:'
-                        stats = aline[9].split(':')
-
-                        if stats[0] == '.':
-                            allele = 0                       # index for '.' set to reference, avoid invalid indexing
-                            no_call = 1                      # avoid checking stats, no DP or GQ for '.'
-                        else:
-                            allele = int(stats[0])           # index of GT 
-                        AD_values = stats[1].split(',')      # split the stats for the AD values
-                        allele_AD = int(AD_values[allele])   # find the AD for the GT - will not use
-
-                        # We use the DP value rather than the individual AD
-                        # check if critera is not met for validated alternate sequence
-                        # if the genotype index is '.', there are not complete stats, make missing_call = 1
-                        if (choice == 'AND') and (no_call == 0):
-                            if (int(stats[2]) < DP_min_val_int) or (int(stats[3]) < GQ_min_val_int):
-                                missing_call = 1
-                        elif (choice == 'OR') and (no_call == 0):
-                            if ((int(stats[2]) < DP_min_val_int) and (int(stats[3]) < GQ_min_val_int)):
-                                missing_call = 1
-
-                        # check if alternate allele more than one base
-                        # regardless of DP or GQ values - both an insertion and criteria not met are flagged as 'n'
-                        alleles = aline[4].split(',')      # split the alternate alleles by separator ','
-                        if (allele < 1):                   # if the best allele is the reference stops further elif eval
-                            if (len(aline[3]) == 1) and missing_call:    # if ref allele is one base, and fails criteria
-                                output_string = f"n\t{aline[1]}\t1\n"
-                                outfile.write(output_string)
-                                                                         # the unstated else here is do nothing if '.'
-                        elif len(alleles[allele-1]) != 1:  # if allele length > 1 base, then it isn't valid, skip output
-                            no_call = 1
-
-                        elif alleles[allele-1] == '*':   # if allele is '*', then it is part of a deletion, skip output
-                            no_call = 1
-
-                        # if critera is not met for validated alternate sequence, print sequence as 'missing' or 'n' length 1
-                        elif missing_call:
-                            output_string = f"n\t{aline[1]}\t1\n"
-                            outfile.write(output_string)
-
-                        # else print the alternate genotype and its position
-                        else:
-                            output_string = f"{alleles[allele-1]}\t{aline[1]}\n"   # print the correct alternate, indexed by allele-1
-                            outfile.write(output_string)
-                
-                    # Check to see if this is a bad call
-                    # When aline[8] is 'GT:GQ:PL' - there is no read depth
-                    # can't be sure if it's an indel - skip output
-                    elif (aline[8].startswith("GT:GQ:PL")) or (aline[8] == "GT:PL"):
-                        no_call = 1
-
-                    # Unknown condition catch - will be skipped in output maple file
-                    else:
-                        print(f"*** Unexpected line type in {vcf_filename}:\n{line}", file=sys.stderr)
-
-        except IOError as e:   ## closes try: with open(maple_fileout, 'w') as outfile:
-            print(f"An error occurred, writing to output file. {e}")
-            sys.exit(1)
-            
-    else:  # if '.maple' is not in output filename
-        print(f"An error occurred, cannot use output file, input filename not .g.vcf.gz or .g.vcf and no .maple in output filename")
-        sys.exit(1)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+#!/bin/bash
+set -beu -o pipefail
+
+mkdir -p out
+cp small.g.vcf out/
+(cd out && python3 ../../../gvcf_to_maple_haploid.py -i small.g.vcf -DP 20 -GQ 99 -o AND)
+rm out/small.g.vcf
+diff -r expected out
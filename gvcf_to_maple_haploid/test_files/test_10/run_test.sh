@@ -0,0 +1,13 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# -n merges touching and overlapping 'n' runs, never across a '>' header: the run ending at c1:100 and the run
+# starting at c2:1 stay apart
+mkdir -p out/python out/numpy
+cp merge.g.vcf out/python/
+cp merge.g.vcf out/numpy/
+(cd out/python && python3 ../../../../gvcf_to_maple_haploid.py -i merge.g.vcf -n 2> merge.stderr)
+(cd out/numpy && python3 ../../../../gvcf_to_maple_haploid.py -i merge.g.vcf -n -e numpy 2> merge.stderr)
+rm out/python/merge.g.vcf out/numpy/merge.g.vcf
+diff -r out/python out/numpy
+diff -r expected out
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# Converts and masks ../test_1/small.g.vcf in one process with the Python API, no command line.
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import gvcf_to_maple_haploid as gv
+import mask_maple
+
+# masking regions made in memory, 1-based and inclusive, used for every maple header
+mask = mask_maple.make_mask({'chrA': ([1000, 100000, 200000], [50000, 100500, 230000])}, contig='chrA')
+
+os.makedirs('out', exist_ok=True)
+counts = {}
+with open('../test_1/small.g.vcf', 'r') as fin:
+    records = gv.vcf_to_maple(fin, 'small', 20, 99, 'AND', merge_n=True, mask=mask, counts=counts)
+    gv.write_maple_records(records, 'out/small.maple')
+
+with open('out/counts.txt', 'w') as fout:
+    for key, value in sorted(counts.items()):
+        fout.write(f"{key}\t{value}\n")
+
+# the command line tool, called in the same process
+sys.exit(gv.main(['-i', '../test_1/small.g.vcf', '--sample_name', 'small', '-DP', '20', '-GQ', '99', '-o', 'AND', '-n', '-m', 'mask.bed', '--mask_contig', 'chrA', '-d', 'out/cli']))
@@ -0,0 +1,6 @@
+#!/bin/bash
+set -beu -o pipefail
+
+rm -rf out
+python3 api_test.py
+diff -r expected out
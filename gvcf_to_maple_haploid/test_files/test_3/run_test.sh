@@ -0,0 +1,10 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the numpy engine writes the maple files of the python engine
+mkdir -p out
+cp ../test_1/small.g.vcf odd.g.vcf out/
+(cd out && python3 ../../../gvcf_to_maple_haploid.py -i small.g.vcf -DP 20 -GQ 99 -o AND -e numpy)
+(cd out && python3 ../../../gvcf_to_maple_haploid.py -i odd.g.vcf -DP 15 -GQ 40 -o AND -e numpy 2> odd.stderr)
+rm out/small.g.vcf out/odd.g.vcf
+diff -r expected out
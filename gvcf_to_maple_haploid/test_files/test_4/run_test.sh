@@ -0,0 +1,16 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# one maple file for each combination, from a single pass over the g.vcf
+rm -rf out
+mkdir -p out
+cp ../test_1/small.g.vcf out/
+(cd out && python3 ../../../gvcf_to_maple_haploid.py -i small.g.vcf -s 20:99:AND,10:50:OR,5:0 --sweep_summary sweep.tsv)
+
+# the numpy engine writes the same maple files
+(cd out && python3 ../../../gvcf_to_maple_haploid.py -i small.g.vcf -s 20:99:AND,10:50:OR,5:0 -e numpy -d numpy)
+rm out/small.g.vcf
+diff -r expected out
+
+# the same maple file as a run with the criteria of the combination
+cmp expected/small_DP20_GQ99_AND.maple ../test_1/expected/small.maple
@@ -0,0 +1,31 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the converter and mask_maple.py in pipes, from stdin to stdout
+rm -rf out
+mkdir -p out
+gzip -c ../test_1/small.g.vcf | python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small > out/small.maple
+python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small -e numpy -n < ../test_1/small.g.vcf > out/small_numpy.maple 2> out/small_numpy.stderr
+gzip -c ../test_1/small.g.vcf | python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small \
+    | python3 ../../../mask_maple/mask_maple.py -i - -m mask.bed -c chrA > out/small_masked.maple
+gzip -c ../test_1/small.g.vcf | python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small --binary \
+    | python3 ../../../mask_maple/mask_maple.py -i - -m mask.bed -c chrA -e numpy > out/small_masked_binary_in.maple
+
+# a gzipped g.vcf whose first bytes come alone down the pipe: the bytes taken from stdin to check its type are
+# read again
+(gzip -c ../test_1/small.g.vcf | head -c 1; sleep 0.2; gzip -c ../test_1/small.g.vcf | tail -c +2) \
+    | python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small > out/split.maple
+cmp out/small.maple out/split.maple
+rm out/split.maple
+
+# a named output file, as given, and the maple file from stdin into a file
+python3 ../../gvcf_to_maple_haploid.py -i ../test_1/small.g.vcf --output out/named.bin --binary --sample_name sample
+python3 ../../gvcf_to_maple_haploid.py -i - --sample_name small --output out/from_stdin.maple < ../test_1/small.g.vcf
+python3 ../../../maple_binary/maple_binary.py -i out/named.bin -o - > out/named.maple
+
+# stdin needs a sample name
+! python3 ../../gvcf_to_maple_haploid.py -i - < ../test_1/small.g.vcf 2> out/usage.stderr
+tail -n 1 out/usage.stderr > out/no_sample_name.stderr
+rm out/usage.stderr
+
+diff -r expected out
@@ -0,0 +1,18 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# masking while converting with a .bed file named by the g.vcf chromosomes (CHROM), without -c or -C
+rm -rf out
+mkdir -p out
+python3 ../../gvcf_to_maple_haploid.py -i ../test_1/small.g.vcf -d out -m chrom.bed 2> out/python.stderr
+python3 ../../gvcf_to_maple_haploid.py -i ../test_1/small.g.vcf --output out/numpy.maple -e numpy -m chrom.bed 2> out/numpy.stderr
+cmp out/small.maple out/numpy.maple
+rm out/numpy.maple
+
+# the same as masking the converted maple file with the chromosome of each header given in a contig map
+python3 ../../gvcf_to_maple_haploid.py -i ../test_1/small.g.vcf --output out/unmasked.maple
+python3 ../../../mask_maple/mask_maple.py -i out/unmasked.maple -m chrom.bed -C contig.map -o out/contig_map.maple
+cmp out/small.maple out/contig_map.maple
+! cmp -s out/small.maple out/unmasked.maple
+rm out/unmasked.maple out/contig_map.maple
+diff -r expected out
@@ -0,0 +1,48 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# small.g.vcf.gz is ../test_1/small.g.vcf in BGZF blocks of 2000 bytes, indexed by small.g.vcf.gz.tbi and by
+# small.csi (min_shift 12, depth 6); -r and -R convert what a run over only the g.vcf lines overlapping the
+# regions converts, the regions crossing block boundaries
+mkdir -p out/tbi out/csi out/slice
+cp small.g.vcf.gz small.g.vcf.gz.tbi out/tbi/
+cp small.g.vcf.gz out/csi/
+cp small.csi out/csi/small.g.vcf.gz.csi
+
+# the header lines and the g.vcf lines overlapping the regions of a .bed file
+slice() {
+    gzip -dc small.g.vcf.gz | awk -F '\t' '
+        NR == FNR { n++; contig[n] = $1; start[n] = (NF >= 3) ? $2 + 1 : 1; stop[n] = (NF >= 3) ? $3 : 1e12; next }
+        /^#/ { print; next }
+        {
+            end = $2 + length($4) - 1
+            if (match($8, /(^|;)END=[0-9]+/)) { end = substr($8, RSTART, RLENGTH); sub(/.*END=/, "", end) }
+            for (i = 1; i <= n; i++) if (($1 == contig[i]) && ($2 <= stop[i]) && (end + 0 >= start[i])) { print; next }
+        }' "$1" -
+}
+
+for regions in region regions; do
+    slice $regions.bed > out/slice/small.g.vcf
+    (cd out/slice && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf --output $regions.maple)
+done
+for index in tbi csi; do
+    (cd out/$index && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -r CP043531.1:9500-11700 \
+        --output region.maple)
+    (cd out/$index && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -R ../../regions.bed \
+        --output regions.maple)
+    (cd out/$index && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -R ../../regions.bed -e numpy \
+        --output regions_numpy.maple)
+    cmp out/slice/region.maple out/$index/region.maple
+    cmp out/slice/regions.maple out/$index/regions.maple
+    cmp out/$index/regions.maple out/$index/regions_numpy.maple
+done
+
+# the regions of every chromosome convert the whole file
+for index in tbi csi; do
+    (cd out/$index && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -r CP043531.1,CP043532.1 \
+        -r CP043534.1 --output all.maple)
+    cmp ../test_1/expected/small.maple out/$index/all.maple
+done
+
+rm out/slice/small.g.vcf out/tbi/small.g.vcf.gz* out/csi/small.g.vcf.gz*
+diff -r expected out
@@ -0,0 +1,24 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# BGZF blocks inflated by 4 threads give the maple files of 1 thread, with lines spanning the 2000 byte blocks
+# of ../test_7/small.g.vcf.gz
+mkdir -p out/t1 out/t4
+cp ../test_7/small.g.vcf.gz ../test_7/small.g.vcf.gz.tbi out/t4/
+cp ../test_7/small.g.vcf.gz out/t1/
+for engine in python numpy; do
+    (cd out/t1 && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -t 1 -e $engine \
+        --output $engine.maple)
+    (cd out/t4 && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -t 4 -e $engine \
+        --output $engine.maple)
+    cmp out/t1/$engine.maple out/t4/$engine.maple
+    cmp ../test_1/expected/small.maple out/t4/$engine.maple
+done
+
+# and the regions read through the index
+(cd out/t4 && python3 ../../../../gvcf_to_maple_haploid.py -i small.g.vcf.gz -t 4 -R ../../../test_7/regions.bed \
+    --output regions.maple)
+cmp ../test_7/expected/tbi/regions.maple out/t4/regions.maple
+
+rm out/t1/small.g.vcf.gz out/t4/small.g.vcf.gz*
+diff -r expected out
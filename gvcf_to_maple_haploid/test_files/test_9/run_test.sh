@@ -0,0 +1,19 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# a batch with an unreadable sample reports it, converts the other samples and exits with code 1, with 1 and
+# with 2 worker processes
+head -c 3000 ../test_7/small.g.vcf.gz > truncated.g.vcf.gz
+for jobs in 1 2; do
+    mkdir -p out/j$jobs
+    status=0
+    python3 ../../gvcf_to_maple_haploid.py -b batch.list -j $jobs -d out/j$jobs 2> batch.stderr || status=$?
+    test "$status" = 1
+    test "$(grep -c '^FAILED' batch.stderr)" = 1
+    grep -q '^FAILED truncated.g.vcf.gz: ' batch.stderr
+    grep -qx 'Converted 2 of 3 g.vcf files, 1 failed' batch.stderr
+done
+diff -r out/j1 out/j2
+
+rm truncated.g.vcf.gz batch.stderr
+diff -r expected out
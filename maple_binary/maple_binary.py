@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# Program maple_binary.py
+# v 1.0
+#
+# Reads and writes maple files in a compact binary format, and converts maple files between
+# the text and binary formats.  The binary format holds the same records as the text format,
+# every number is stored as an unsigned 32 bit integer so nothing is parsed when it is read,
+# and the records of each sample can be memory mapped as arrays.
+#
+# binary maple file format, all integers are little endian:
+#
+# file header, 16 bytes
+#   8 bytes   magic b'MAPLEBIN'
+#   uint32    format version, 1
+#   uint32    reserved, 0
+#
+# followed by one block for each '>' header of the text file
+#   uint32    length of the header text in bytes, 0xFFFFFFFF for the records before the first header
+#   uint32    number of records, count
+#   bytes     the header text (utf-8, without the '>'), zero padded to a multiple of 4 bytes
+#   uint8     count record types, the ASCII code of the first column '-','n','A','C','G','T' ...,
+#             zero padded to a multiple of 4 bytes
+#   uint32    count positions, the second column
+#   uint32    count lengths, the third column of an 'n' or '-' run, 0 for a base
+#
+# Every block starts on a multiple of 4 bytes, so the positions and lengths of a memory mapped
+# file are aligned arrays.
+#
+
+import sys
+import os
+import mmap
+import array
+import struct
+import argparse
+
+# maple_io.py opens the files, '-' for stdin and stdout
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+import maple_io
+
+try:
+    import numpy as np
+except ImportError:     # numpy is only needed for read_maple_blocks()
+    np = None
+
+MAGIC = b'MAPLEBIN'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sII')
+BLOCK_HEADER = struct.Struct('<II')
+NO_HEADER = 0xFFFFFFFF
+MAX_VALUE = 0xFFFFFFFF
+
+
+class MapleFormatError(Exception):
+
+    #  Raised when a binary maple file is damaged, or a record cannot be stored in the binary
+    #  format (a position or length outside of 0 to 4294967295, a type of more than one character).
+    pass
+
+#
+#END of class MapleFormatError(Exception):
+#
+
+
+def is_maple_binary(maple_file_path):
+
+    #  Checks the start of a file for the binary maple magic.
+    #
+    #  Arguments:
+    #      maple_file_path (str): Path to the maple file (text or binary).
+    #
+    #  Returns:
+    #     bool: True if the file is a binary maple file.
+
+    return maple_io.read_start(maple_file_path, len(MAGIC)) == MAGIC
+
+#
+#END of def is_maple_binary(maple_file_path):
+#
+
+
+def binary_filename(maple_file_text):
+
+    #  Returns the name of the binary maple file for a text maple file, '.maple' becomes '.mapleb'.
+
+    if maple_file_text.endswith('.maple'):
+        return maple_file_text + 'b'
+    if maple_file_text.endswith('.mapleb'):
+        return maple_file_text
+    return maple_file_text + '.mapleb'
+
+#
+#END of def binary_filename(maple_file_text):
+#
+
+
+def text_filename(maple_file_text):
+
+    #  Returns the name of the text maple file for a binary maple file, '.mapleb' becomes '.maple'.
+
+    if maple_file_text.endswith('.mapleb'):
+        return maple_file_text[:-1]
+    if maple_file_text.endswith('.maple'):
+        return maple_file_text
+    return maple_file_text + '.maple'
+
+#
+#END of def text_filename(maple_file_text):
+#
+
+
+def padding(size):
+
+    #  Returns the zero bytes padding size bytes to a multiple of 4.
+
+    return b'\0' * (-size % 4)
+
+#
+#END of def padding(size):
+#
+
+
+def little_endian(values):
+
+    #  Returns an array('I') of uint32 values as little endian bytes.
+
+    if sys.byteorder == 'big':
+        values = array.array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+#
+#END of def little_endian(values):
+#
+
+
+def write_maple_header(fout):
+
+    #  Writes the file header of a binary maple file.
+
+    fout.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+#
+#END of def write_maple_header(fout):
+#
+
+
+def write_maple_block(fout, header_text, types, positions, lengths):
+
+    #  Writes the records of one sample to a binary maple file.
+    #
+    #  Arguments:
+    #      fout (file): the binary maple file open for binary writing, after write_maple_header().
+    #      header_text (str): the header without the '>', None for records before the first header.
+    #      types (bytes): the record types, one ASCII code per record.
+    #      positions: the record positions, array('I') or a numpy '<u4' array.
+    #      lengths: the run lengths, 0 for a base, array('I') or a numpy '<u4' array.
+
+    count = len(types)
+    if header_text is None:
+        name = b''
+        fout.write(BLOCK_HEADER.pack(NO_HEADER, count))
+    else:
+        name = header_text.encode()
+        fout.write(BLOCK_HEADER.pack(len(name), count))
+        fout.write(name + padding(len(name)))
+    fout.write(bytes(types) + padding(count))
+    if isinstance(positions, array.array):
+        fout.write(little_endian(positions))
+        fout.write(little_endian(lengths))
+    else:
+        fout.write(positions.astype('<u4', copy=False).tobytes())
+        fout.write(lengths.astype('<u4', copy=False).tobytes())
+
+#
+#END of def write_maple_block(fout, header_text, types, positions, lengths):
+#
+
+
+def write_maple_binary(fout, records):
+
+    #  Writes maple records to a binary maple file, the records of a sample are collected
+    #  until the next header and written as one block.
+    #
+    #  Arguments:
+    #      fout (file): the binary maple file open for binary writing.
+    #      records (iterator of tuple): (base, position, length, ...) maple records, base is '>'
+    #                                   for a header (position is then the header text).
+    #
+    #  Returns:
+    #     int: the number of records written, headers included.
+    #
+    #  Raises:
+    #     MapleFormatError: a record cannot be stored in the binary format.
+
+    write_maple_header(fout)
+    header_text = None
+    types = bytearray()
+    positions = array.array('I')
+    lengths = array.array('I')
+    record_count = 0
+
+    for record in records:
+        record_count += 1
+        if record[0] == '>':
+            if types or (header_text is not None):
+                write_maple_block(fout, header_text, types, positions, lengths)
+            header_text = record[1]
+            types = bytearray()
+            positions = array.array('I')
+            lengths = array.array('I')
+            continue
+
+        base, position, length = record[0], record[1], record[2]
+        if (len(base) != 1) or not (0 <= position <= MAX_VALUE) or not (0 <= length <= MAX_VALUE):
+            raise MapleFormatError(f"Error: maple record cannot be written in binary format - {record[:3]}")
+        types.append(ord(base))
+        positions.append(position)
+        lengths.append(length if (base == 'n') or (base == '-') else 0)
+
+    if types or (header_text is not None):
+        write_maple_block(fout, header_text, types, positions, lengths)
+    return record_count
+
+#
+#END of def write_maple_binary(fout, records):
+#
+
+
+def read_block_header(fin):
+
+    #  Reads the header of the next block of a binary maple file.
+    #
+    #  Returns:
+    #     tuple: (header_text or None, count), None at the end of the file.
+
+    data = fin.read(BLOCK_HEADER.size)
+    if not data:
+        return None
+    if len(data) < BLOCK_HEADER.size:
+        raise MapleFormatError("Error: binary maple file is truncated")
+    name_size, count = BLOCK_HEADER.unpack(data)
+    if name_size == NO_HEADER:
+        return None, count
+    name = fin.read(name_size + len(padding(name_size)))
+    if len(name) < name_size:
+        raise MapleFormatError("Error: binary maple file is truncated")
+    return name[:name_size].decode(), count
+
+#
+#END of def read_block_header(fin):
+#
+
+
+def check_file_header(data):
+
+    #  Checks the file header of a binary maple file.
+
+    if len(data) < FILE_HEADER.size:
+        raise MapleFormatError("Error: not a binary maple file, the file is too short")
+    magic, version, reserved = FILE_HEADER.unpack(data[:FILE_HEADER.size])
+    if magic != MAGIC:
+        raise MapleFormatError("Error: not a binary maple file")
+    if version != VERSION:
+        raise MapleFormatError(f"Error: binary maple file version {version} is not supported")
+
+#
+#END of def check_file_header(data):
+#
+
+
+def read_maple_binary(fin):
+
+    #  Reads the records of a binary maple file, one block at a time.
+    #
+    #  Arguments:
+    #      fin (file): the binary maple file open for binary reading.
+    #
+    #  Yields:
+    #     tuple: (base, position, length) as read from a text maple file; base is '>' for a
+    #            header (position is then the header text), length is 0 for a base.
+    #
+    #  Raises:
+    #     MapleFormatError: the file is not a binary maple file or is damaged.
+
+    check_file_header(fin.read(FILE_HEADER.size))
+    while True:
+        block = read_block_header(fin)
+        if block is None:
+            return
+        header_text, count = block
+        if header_text is not None:
+            yield ('>', header_text, 0)
+
+        types = fin.read(count + len(padding(count)))[:count]
+        positions = array.array('I')
+        lengths = array.array('I')
+        positions.frombytes(fin.read(4 * count))
+        lengths.frombytes(fin.read(4 * count))
+        if (len(types) < count) or (len(positions) < count) or (len(lengths) < count):
+            raise MapleFormatError("Error: binary maple file is truncated")
+        if sys.byteorder == 'big':
+            positions.byteswap()
+            lengths.byteswap()
+
+        for base, position, length in zip(types.decode('latin-1'), positions, lengths):
+            yield (base, position, length)
+
+#
+#END of def read_maple_binary(fin):
+#
+
+
+def read_maple_blocks(maple_file_path):
+
+    #  Memory maps a binary maple file and yields the records of each sample as numpy arrays,
+    #  the arrays are views of the file and nothing is copied or parsed.
+    #
+    #  Arguments:
+    #      maple_file_path (str): Path to the binary maple file.
+    #
+    #  Yields:
+    #     tuple: (header_text or None, types, positions, lengths) - types a uint8 array of the
+    #            ASCII codes of the record types, positions and lengths '<u4' arrays.
+    #
+    #  Raises:
+    #     MapleFormatError: the file is not a binary maple file or is damaged.
+
+    with open(maple_file_path, 'rb') as fin:
+        if os.fstat(fin.fileno()).st_size <= FILE_HEADER.size:
+            check_file_header(fin.read())
+            return
+        data = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    check_file_header(data[:FILE_HEADER.size])
+
+    offset = FILE_HEADER.size
+    while offset < len(buf):
+        if offset + BLOCK_HEADER.size > len(buf):
+            raise MapleFormatError("Error: binary maple file is truncated")
+        name_size, count = BLOCK_HEADER.unpack_from(data, offset)
+        offset += BLOCK_HEADER.size
+        header_text = None
+        if name_size != NO_HEADER:
+            header_text = data[offset:offset+name_size].decode()
+            offset += name_size + len(padding(name_size))
+        types_at = offset
+        positions_at = types_at + count + len(padding(count))
+        offset = positions_at + 8 * count
+        if offset > len(buf):
+            raise MapleFormatError("Error: binary maple file is truncated")
+        yield (header_text, buf[types_at:types_at+count],
+               buf[positions_at:positions_at+4*count].view('<u4'), buf[positions_at+4*count:offset].view('<u4'))
+
+#
+#END of def read_maple_blocks(maple_file_path):
+#
+
+
+def read_maple_text(fin):
+
+    #  Reads the records of a text maple file.
+    #
+    #  Arguments:
+    #      fin (file): the text maple file.
+    #
+    #  Yields:
+    #     tuple: (base, position, length), base is '>' for a header (position is then the
+    #            header text), length is 0 for a base.
+
+    for aline in fin:
+        if aline.startswith('>'):
+            yield ('>', aline[1:].rstrip('\n'), 0)
+            continue
+        columns = aline.strip().split('\t')
+        if len(columns) < 2:
+            raise MapleFormatError(f"Error in format of contents of maple file, no tabs? - {aline.strip()}")
+        if (columns[0] == 'n') or (columns[0] == '-'):
+            yield (columns[0], int(columns[1]), int(columns[2]))
+        else:
+            yield (columns[0], int(columns[1]), 0)
+
+#
+#END of def read_maple_text(fin):
+#
+
+
+def convert_maple_file(maple_file_text, output_file_text=None):
+
+    #  Converts a text maple file to binary, or a binary maple file to text.
+    #
+    #  Arguments:
+    #      maple_file_text (str): Path to the input maple file, the format is read from the file;
+    #                             '-' for stdin.
+    #      output_file_text (str): Path to the output maple file, default the input filename
+    #                              with '.maple' changed to '.mapleb', or '.mapleb' to '.maple';
+    #                              '-' for stdout, the default for stdin.
+    #
+    #  Returns:
+    #     tuple: (output_file_text, number of records written)
+
+    if (maple_file_text == maple_io.STDIO) and not output_file_text:
+        output_file_text = maple_io.STDIO
+    if is_maple_binary(maple_file_text):
+        output_file_text = output_file_text or text_filename(maple_file_text)
+        record_count = 0
+        with maple_io.input_file(maple_file_text, 'rb') as fin, maple_io.output_file(output_file_text) as fout:
+            for record in read_maple_binary(fin):
+                fout.write(maple_io.format_maple_record(record))
+                record_count += 1
+    else:
+        output_file_text = output_file_text or binary_filename(maple_file_text)
+        with maple_io.input_file(maple_file_text, 'r') as fin, maple_io.output_file(output_file_text, 'wb') as fout:
+            record_count = write_maple_binary(fout, read_maple_text(fin))
+    return output_file_text, record_count
+
+#
+#END of def convert_maple_file(maple_file_text, output_file_text=None):
+#
+
+
+def process_arguments_binary(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: input_file and output_file.
+
+    parser = argparse.ArgumentParser(description='''Converts a maple file between the text and binary maple formats.
+     Reads:
+      a text .maple file or a binary .mapleb file
+     Returns:
+      the same maple records in the other format, .maple becomes .mapleb and .mapleb becomes .maple'''
+    ,formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-i','--input_file',help='The name of the input maple file, text or binary; - for stdin.',required=True)
+    parser.add_argument('-o','--output_file',help='The name of the output maple file, - for stdout; default the input name with the other extension\n(stdout for stdin).')
+    return parser.parse_args(argv)
+
+#
+#END of def process_arguments_binary(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_binary().
+    #
+    #  Returns:
+    #     int: exit code, 1 if the maple file cannot be read.
+
+    args = process_arguments_binary(argv)
+    try:
+        convert_maple_file(args.input_file, args.output_file)
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}")
+        return 1
+    except (MapleFormatError, ValueError, IndexError, IOError) as e:
+        print(f"Error reading the file - {e}")
+        return 1
+    return 0
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
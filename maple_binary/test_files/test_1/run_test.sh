@@ -0,0 +1,12 @@
+#!/bin/bash
+set -beu -o pipefail
+
+mkdir -p out
+python3 ../../maple_binary.py -i sample.maple -o out/sample.mapleb
+cmp expected/sample.mapleb out/sample.mapleb
+python3 ../../maple_binary.py -i out/sample.mapleb -o out/sample.maple
+cmp sample.maple out/sample.maple
+
+# a binary maple file from a pipe whose first read returns less than the magic
+(head -c 3 out/sample.mapleb; sleep 0.2; tail -c +4 out/sample.mapleb) | python3 ../../maple_binary.py -i - -o - \
+    | cmp - sample.maple
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# Program maple_io.py
+# v 1.0
+#
+# The file handling shared by the tools: '-' for stdin or stdout, output files written
+# atomically so a reader never sees a partial file, the start of a file or of stdin read to
+# check its type, and maple records written as lines of text.
+#
+
+import io
+import os
+import sys
+import uuid
+import contextlib
+
+# The file name of stdin or stdout, for the tools to sit in a pipe
+STDIO = '-'
+
+# The bytes read_start() had to take from stdin, given back first by input_file('-')
+stdin_start = b''
+
+
+def format_maple_record(record):
+
+    #  Returns a maple record as a line of text, the line as read for a record carrying it,
+    #  e.g. from mask_maple.read_maple_records().
+    #
+    #  Arguments:
+    #      record (tuple): (base, position, length), or (base, position, length, line as read).
+    #
+    #  Returns:
+    #     str: the maple line, including the newline.
+
+    if len(record) > 3:
+        return record[3]
+    if record[0] == '>':
+        return f">{record[1]}\n"
+    if (record[0] == 'n') or (record[0] == '-'):
+        return f"{record[0]}\t{record[1]}\t{record[2]}\n"
+    return f"{record[0]}\t{record[1]}\n"
+
+#
+#END of def format_maple_record(record):
+#
+
+
+@contextlib.contextmanager
+def atomic_output(file_path, mode='w'):
+
+    #  Opens a temporary file next to file_path for writing, the temporary file is renamed
+    #  to file_path only when the with block completes.  A reader never sees a partial file,
+    #  and on an error the temporary file is removed.
+    #
+    #  Arguments:
+    #      file_path (str): the final name of the output file.
+    #      mode (str): 'w' for text or 'wb' for binary output.
+    #
+    #  Yields:
+    #     file: the open temporary file.
+
+    directory, filename = os.path.split(file_path)
+    temp_path = os.path.join(directory, f".{filename}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(temp_path, mode.replace('w', 'x')) as file:
+            yield file
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+#
+#END of def atomic_output(file_path, mode='w'):
+#
+
+
+class PrefixedInput(io.RawIOBase):
+
+    #  A stream reading the bytes already taken from a stream, then the rest of the stream: stdin
+    #  with its start given back, see read_start() and input_file().
+
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.prefix:
+            return self.stream.readinto(buffer)
+        count = min(len(buffer), len(self.prefix))
+        buffer[:count] = self.prefix[:count]
+        self.prefix = self.prefix[count:]
+        return count
+
+#
+#END of class PrefixedInput(io.RawIOBase):
+#
+
+
+def read_start(file_path, size):
+
+    #  Returns the first size bytes of a file, or of stdin for '-' (STDIO) without taking them
+    #  from stdin, so the file type can be checked before the file is read.  Fewer bytes only
+    #  at the end of the file: peek() on a pipe can return less than it was asked for, stdin is
+    #  then read up to size bytes, kept in stdin_start for input_file() to give back first.
+
+    global stdin_start
+    if file_path == STDIO:
+        if not stdin_start:
+            start = sys.stdin.buffer.peek(size)[:size]
+            if len(start) == size:
+                return start
+        if len(stdin_start) < size:
+            stdin_start += sys.stdin.buffer.read(size - len(stdin_start))
+        return stdin_start[:size]
+    with open(file_path, 'rb') as file:
+        return file.read(size)
+
+#
+#END of def read_start(file_path, size):
+#
+
+
+@contextlib.contextmanager
+def input_file(file_path, mode='r'):
+
+    #  Opens a file for reading, '-' (STDIO) is stdin, which is not closed, read after the bytes
+    #  read_start() took from it.
+    #
+    #  Arguments:
+    #      file_path (str): Path to the file, or '-'.
+    #      mode (str): 'r' for text or 'rb' for binary input.
+    #
+    #  Yields:
+    #     file: the open file.
+
+    global stdin_start
+    if file_path == STDIO:
+        if not stdin_start:
+            yield sys.stdin.buffer if 'b' in mode else sys.stdin
+            return
+        stdin = io.BufferedReader(PrefixedInput(stdin_start, sys.stdin.buffer))
+        stdin_start = b''
+        if 'b' in mode:
+            yield stdin
+        else:
+            yield io.TextIOWrapper(stdin, encoding=sys.stdin.encoding, errors=sys.stdin.errors, newline='\n')
+        return
+    with open(file_path, mode) as file:
+        yield file
+
+#
+#END of def input_file(file_path, mode='r'):
+#
+
+
+@contextlib.contextmanager
+def output_file(file_path, mode='w'):
+
+    #  Opens a file for writing with atomic_output(), '-' (STDIO) is stdout, written as it goes
+    #  and flushed at the end of the with block.
+    #
+    #  Arguments:
+    #      file_path (str): the final name of the output file, or '-'.
+    #      mode (str): 'w' for text or 'wb' for binary output.
+    #
+    #  Yields:
+    #     file: the open file.
+
+    if file_path != STDIO:
+        with atomic_output(file_path, mode) as file:
+            yield file
+        return
+    sys.stdout.flush()
+    file = sys.stdout.buffer if 'b' in mode else sys.stdout
+    yield file
+    file.flush()
+
+#
+#END of def output_file(file_path, mode='w'):
+#
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# Program maple_manifest.py
+# v 1.0
+#
+# Manifests of the outputs written by gvcf_to_maple_haploid.py and mask_maple.py (--manifest), so a
+# re-run redoes only the outputs whose input, parameters or tool version changed, and a check of
+# the outputs recorded in a manifest.
+#
+# manifest file format, JSON:
+#
+#   manifest_version  1
+#   outputs           one entry per output file, by the path of the output file:
+#                       tool             the script that wrote it, 'gvcf_to_maple_haploid' or 'mask_maple'
+#                       version          the VERSION of the script
+#                       input            the path of the input file
+#                       input_sha256     the SHA-256 of the input file
+#                       input_size       the size and modification time of the input file when it was
+#                       input_mtime_ns   hashed, the file is hashed again only when either changes
+#                       parameters       everything else the output depends on, e.g. the DP and GQ
+#                                        criteria, and the SHA-256 of the .bed file
+#                       output_size      the size and modification time of the output file as written,
+#                       output_mtime_ns  null when no output file was written (a g.vcf without data lines)
+#                       output_sha256    the SHA-256 of the output file, only in the manifest of a shard
+#   shard             only in the manifest of a shard (--shard), see maple_shard.py
+#
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+
+# maple_io.py writes the manifest atomically
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+import maple_io
+
+MANIFEST_VERSION = 1
+
+# Size of the blocks of a file hashed at once
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_hash(file_path):
+
+    #  Returns the SHA-256 of the content of a file, as hex text.
+
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as fin:
+        for block in iter(lambda: fin.read(HASH_BLOCK_SIZE), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+#
+#END of def file_hash(file_path):
+#
+
+
+def file_state(file_path, entry=None):
+
+    #  Returns the hash, size and modification time of an input file.  The hash recorded in
+    #  entry is used again when the size and modification time are those recorded.
+    #
+    #  Arguments:
+    #      file_path (str): Path to the file.
+    #      entry (dict): the manifest entry of an output of the file, or None.
+    #
+    #  Returns:
+    #     dict: 'input_sha256', 'input_size' and 'input_mtime_ns', None if the file does not exist.
+
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    state = {'input_size': stat.st_size, 'input_mtime_ns': stat.st_mtime_ns}
+    if entry and (entry.get('input_size'), entry.get('input_mtime_ns')) == (stat.st_size, stat.st_mtime_ns):
+        state['input_sha256'] = entry.get('input_sha256')
+    else:
+        state['input_sha256'] = file_hash(file_path)
+    return state
+
+#
+#END of def file_state(file_path, entry=None):
+#
+
+
+def canonical(parameters):
+
+    #  Returns parameters as they are read back from the manifest, tuples become lists.
+
+    return json.loads(json.dumps(parameters, sort_keys=True))
+
+#
+#END of def canonical(parameters):
+#
+
+
+def read_manifest(manifest_file_text):
+
+    #  Reads a manifest, an empty one when the file does not exist yet.
+    #
+    #  Raises:
+    #     ValueError: the file is not a manifest.
+
+    if not os.path.exists(manifest_file_text):
+        return {'manifest_version': MANIFEST_VERSION, 'outputs': {}}
+    with open(manifest_file_text, 'r') as fin:
+        manifest = json.load(fin)
+    if (not isinstance(manifest, dict)) or (manifest.get('manifest_version') != MANIFEST_VERSION):
+        raise ValueError(f"{manifest_file_text} is not a manifest of version {MANIFEST_VERSION}")
+    manifest.setdefault('outputs', {})
+    return manifest
+
+#
+#END of def read_manifest(manifest_file_text):
+#
+
+
+def write_manifest(manifest_file_text, manifest):
+
+    #  Writes a manifest atomically, a reader never sees a partial manifest.
+
+    with maple_io.atomic_output(manifest_file_text) as fout:
+        json.dump(manifest, fout, indent=1, sort_keys=True)
+        fout.write('\n')
+
+#
+#END of def write_manifest(manifest_file_text, manifest):
+#
+
+
+def output_status(entry, output_file_text):
+
+    #  Checks the input and output files of a manifest entry, without the tool and parameters.
+    #
+    #  Arguments:
+    #      entry (dict): the manifest entry.
+    #      output_file_text (str): Path to the output file.
+    #
+    #  Returns:
+    #     str: None if both are as recorded, otherwise 'input missing', 'input changed',
+    #          'output missing' or 'output changed'.
+
+    state = file_state(entry['input'], entry)
+    if state is None:
+        return 'input missing'
+    if state['input_sha256'] != entry.get('input_sha256'):
+        return 'input changed'
+    if entry.get('output_size') is None:
+        return None
+    try:
+        stat = os.stat(output_file_text)
+    except OSError:
+        return 'output missing'
+    if (stat.st_size, stat.st_mtime_ns) != (entry['output_size'], entry['output_mtime_ns']):
+        return 'output changed'
+    return None
+
+#
+#END of def output_status(entry, output_file_text):
+#
+
+
+def plan_outputs(manifest, outputs, tool, version, parameters):
+
+    #  Finds the outputs to write again: those not in the manifest, written by another version of the
+    #  tool or with other parameters, or whose input or output file changed since.
+    #
+    #  Arguments:
+    #      manifest (dict): from read_manifest().
+    #      outputs (list): (input file, output file) of every output of the run.
+    #      tool (str): the name of the script.
+    #      version (str): the VERSION of the script.
+    #      parameters (dict): everything else the outputs depend on, see record_output().
+    #
+    #  Returns:
+    #     tuple: (to do, up to date) - lists of (input file, output file, reason), the reason
+    #            is 'new', 'input missing', 'input changed', 'tool version changed',
+    #            'parameters changed', 'output missing' or 'output changed'; None when up to date.
+
+    parameters = canonical(parameters)
+    todo, up_to_date = [], []
+    for input_file_text, output_file_text in outputs:
+        entry = manifest['outputs'].get(os.path.normpath(output_file_text))
+        if entry is None:
+            reason = 'new'
+        elif (entry.get('tool'), entry.get('version')) != (tool, version):
+            reason = 'tool version changed'
+        elif entry.get('parameters') != parameters:
+            reason = 'parameters changed'
+        elif os.path.normpath(entry['input']) != os.path.normpath(input_file_text):
+            reason = 'input changed'
+        else:
+            reason = output_status(entry, output_file_text)
+        if reason:
+            todo.append((input_file_text, output_file_text, reason))
+        else:
+            up_to_date.append((input_file_text, output_file_text, None))
+    return todo, up_to_date
+
+#
+#END of def plan_outputs(manifest, outputs, tool, version, parameters):
+#
+
+
+def format_plan(todo, up_to_date):
+
+    #  Returns the outputs to write again as text for --dry_run: one line per output, the reason,
+    #  input and output tab separated, and a count of the outputs up to date.
+
+    lines = [f"{reason}\t{input_file_text}\t{output_file_text}" for input_file_text, output_file_text, reason in todo]
+    lines.append(f"{len(todo)} to do, {len(up_to_date)} up to date")
+    return "\n".join(lines) + "\n"
+
+#
+#END of def format_plan(todo, up_to_date):
+#
+
+
+def record_output(manifest, output_file_text, tool, version, input_file_text, input_state, parameters,
+                  written=True, output_hash=False):
+
+    #  Records an output written from input_state, the input as it was before the output was written.
+    #
+    #  Arguments:
+    #      manifest (dict): from read_manifest().
+    #      output_file_text (str): Path to the output file, as planned by plan_outputs().
+    #      tool, version (str): the script that wrote the output, and its VERSION.
+    #      input_file_text (str): Path to the input file.
+    #      input_state (dict): from file_state().
+    #      parameters (dict): everything else the output depends on, e.g. the DP and GQ criteria
+    #                         and the hash of the .bed file, plain JSON values.
+    #      written (bool): False when the input gave no output file (a g.vcf without data lines).
+    #      output_hash (bool): record the SHA-256 of the output file too, so the output can be checked
+    #                          after it is copied from another node, see maple_shard.py.
+
+    entry = {'tool': tool, 'version': version, 'input': input_file_text, 'parameters': canonical(parameters),
+             'output_size': None, 'output_mtime_ns': None}
+    entry.update(input_state)
+    if written:
+        stat = os.stat(output_file_text)
+        entry['output_size'] = stat.st_size
+        entry['output_mtime_ns'] = stat.st_mtime_ns
+        if output_hash:
+            entry['output_sha256'] = file_hash(output_file_text)
+    manifest['outputs'][os.path.normpath(output_file_text)] = entry
+
+#
+#END of def record_output(manifest, output_file_text, tool, version, input_file_text, input_state, parameters,
+#                         written=True, output_hash=False):
+#
+
+
+def check_manifest(manifest, show_all=False):
+
+    #  Checks every output recorded in a manifest against its input and output files.
+    #
+    #  Arguments:
+    #      manifest (dict): from read_manifest().
+    #      show_all (bool): list the outputs that are up to date too.
+    #
+    #  Returns:
+    #     tuple: (text, number of outputs not up to date) - one line per output, the status ('ok' or
+    #            a reason of output_status()), tool, input and output tab separated.
+
+    lines = []
+    stale = 0
+    for output_file_text, entry in sorted(manifest['outputs'].items()):
+        status = output_status(entry, output_file_text)
+        if status:
+            stale += 1
+        if status or show_all:
+            lines.append(f"{status or 'ok'}\t{entry.get('tool')}\t{entry['input']}\t{output_file_text}")
+    lines.append(f"{len(manifest['outputs'])} outputs, {stale} not up to date")
+    return "\n".join(lines) + "\n", stale
+
+#
+#END of def check_manifest(manifest, show_all=False):
+#
+
+
+def process_arguments_manifest(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: manifest_files, show_all.
+
+    parser = argparse.ArgumentParser(description='''Checks the outputs recorded in manifests written with --manifest
+     by gvcf_to_maple_haploid.py and mask_maple.py.
+     Reads:
+      manifest files
+     Returns:
+      each output whose input file changed or whose output file is missing or changed since it was written;
+      exit code 1 if any''', formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('manifest_files',nargs='+',help='Manifest files written with --manifest.')
+    parser.add_argument('-a','--all',dest='show_all',action='store_true',help='List the outputs that are up to date too.')
+    return parser.parse_args(argv)
+
+#
+#END of def process_arguments_manifest(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_manifest().
+    #
+    #  Returns:
+    #     int: exit code, 1 if an output is not up to date or a manifest cannot be read.
+
+    args = process_arguments_manifest(argv)
+    exit_code = 0
+    for manifest_file_text in args.manifest_files:
+        try:
+            manifest = read_manifest(manifest_file_text)
+        except (ValueError, IOError) as e:
+            print(f"Error reading the file - {e}")
+            exit_code = 1
+            continue
+        text, stale = check_manifest(manifest, args.show_all)
+        if len(args.manifest_files) > 1:
+            text = "".join(f"{manifest_file_text}\t{line}\n" for line in text.splitlines())
+        sys.stdout.write(text)
+        if stale:
+            exit_code = 1
+    return exit_code
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
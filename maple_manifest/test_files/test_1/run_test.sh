@@ -0,0 +1,33 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the manifests hold file times, they are kept out of out/
+rm -rf out manifests
+mkdir -p out/vcf out/maples out/masked manifests
+cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/vcf/a.g.vcf
+cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/vcf/b.g.vcf
+printf "out/vcf/a.g.vcf\nout/vcf/b.g.vcf\n" > out/vcf.list
+
+# converted once, the second run skips both files
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert.json 2> out/convert_1.stderr
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert.json 2> out/convert_2.stderr
+
+# other parameters, a changed g.vcf file and a missing maple file are listed, nothing is converted
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert.json -D 5 --dry_run > out/dry_run_parameters.txt
+sed -i '$d' out/vcf/b.g.vcf
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert.json --dry_run > out/dry_run_input.txt
+python3 ../../maple_manifest.py manifests/convert.json > out/check_1.txt || echo "exit $?" >> out/check_1.txt
+
+# only b is converted again
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert.json 2> out/convert_3.stderr
+python3 ../../maple_manifest.py -a manifests/convert.json > out/check_2.txt
+
+# masking, the second run skips both files
+printf "out/maples/a.maple\nout/maples/b.maple\n" > out/maple.list
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked --manifest manifests/mask.json 2> out/mask_1.stderr
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked --manifest manifests/mask.json -j 2 2> out/mask_2.stderr
+rm out/masked/a.maple
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked --manifest manifests/mask.json --dry_run > out/dry_run_mask.txt
+
+rm -rf manifests out/vcf
+diff -r expected out
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# Program maple_metrics.py
+# v 1.0
+#
+# Run metrics of gvcf_to_maple_haploid.py and mask_maple.py (--metrics_json and --profile), and a
+# summary of the metrics of many runs.
+#
+# metrics file format, JSON:
+#
+#   tool       the script that wrote the file, 'gvcf_to_maple_haploid' or 'mask_maple'
+#   arguments  its command line arguments
+#   seconds    the time of the whole run
+#   files      one entry per input file:
+#                input, output     the file names
+#                error             the error message, null if the file was written
+#                seconds           the time of the file
+#                phases            seconds in each phase, the phases of the converter are decompress,
+#                                  parse, filter and write, those of mask_maple.py parse (or read, or
+#                                  scan with -e mmap), mask and write
+#                counts            the converter: the g.vcf lines of each kind and the calls passing
+#                                  or failing the DP and GQ criteria, see gvcf_to_maple_haploid.py
+#                mask              records kept, dropped and trimmed by masking, and bases_masked
+#                merge_n           the converter with -n: 'n' records before and after merging
+#                records_written   the converter: the number of maple records written
+#                sweep             the converter with -s: the maple file, records and counts of each combination
+#   totals     the sums over files, as summed by sum_metrics()
+#
+
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import contextlib
+
+
+def timed(records, seconds, phase):
+
+    #  Passes on the items of an iterator and adds the time spent producing them to seconds[phase].
+    #  The time of a stage of a pipeline of generators includes the time of the stages it reads
+    #  from, see exclusive_phases().
+    #
+    #  Arguments:
+    #      records (iterator): the items to pass on.
+    #      seconds (dict): the time of each phase.
+    #      phase (str): the name of the phase.
+    #
+    #  Yields:
+    #     the items of records.
+
+    clock = time.perf_counter
+    spent = 0.0
+    try:
+        start = clock()
+        for record in records:
+            spent += clock() - start
+            yield record
+            start = clock()
+        spent += clock() - start
+    finally:
+        seconds[phase] = seconds.get(phase, 0.0) + spent
+
+#
+#END of def timed(records, seconds, phase):
+#
+
+
+def exclusive_phases(seconds, phases, total):
+
+    #  Returns the time of each phase of a pipeline on its own, from the times measured by timed().
+    #
+    #  Arguments:
+    #      seconds (dict): the time of each phase including the phases before it.
+    #      phases (list): the phase names in pipeline order, the last phase is the rest of total.
+    #      total (float): the time of the whole pipeline.
+    #
+    #  Returns:
+    #     dict: the seconds of each phase.
+
+    exclusive = {}
+    before = 0.0
+    for phase in phases[:-1]:
+        exclusive[phase] = round(max(seconds.get(phase, 0.0) - before, 0.0), 6)
+        before = max(seconds.get(phase, 0.0), before)
+    exclusive[phases[-1]] = round(max(total - before, 0.0), 6)
+    return exclusive
+
+#
+#END of def exclusive_phases(seconds, phases, total):
+#
+
+
+def add_counts(totals, counts):
+
+    #  Adds the numbers of counts into totals, nested dicts are added key by key.
+
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            add_counts(totals.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[key] = totals.get(key, 0) + value
+
+#
+#END of def add_counts(totals, counts):
+#
+
+
+def sum_metrics(files):
+
+    #  Sums the metrics of many files.
+    #
+    #  Arguments:
+    #      files (list): the metrics of each file, as in the 'files' of a metrics file.
+    #
+    #  Returns:
+    #     dict: 'files' and 'failed' the number of files, and the sum of every number of the files.
+
+    totals = {'files': len(files), 'failed': sum(1 for metrics in files if metrics.get('error'))}
+    for metrics in files:
+        add_counts(totals, metrics)
+    for key in ('seconds', 'phases'):
+        if key in totals:
+            totals[key] = round_seconds(totals[key])
+    return totals
+
+#
+#END of def sum_metrics(files):
+#
+
+
+def round_seconds(seconds):
+
+    #  Rounds a time, or each time of a dict, to microseconds.
+
+    if isinstance(seconds, dict):
+        return {key: round(value, 6) for key, value in seconds.items()}
+    return round(seconds, 6)
+
+#
+#END of def round_seconds(seconds):
+#
+
+
+def write_metrics_json(metrics_file_text, tool, files, seconds, arguments=None):
+
+    #  Writes the metrics of a run, see the format at the top of this file.
+    #
+    #  Arguments:
+    #      metrics_file_text (str): Path to the metrics file.
+    #      tool (str): the name of the script.
+    #      files (list): the metrics of each input file.
+    #      seconds (float): the time of the whole run.
+    #      arguments (list): the arguments of the run, default sys.argv[1:].
+
+    if arguments is None:
+        arguments = sys.argv[1:]
+    metrics = {'tool': tool, 'arguments': list(arguments), 'seconds': round(seconds, 6),
+               'files': files, 'totals': sum_metrics(files)}
+    with open(metrics_file_text, 'w') as fout:
+        json.dump(metrics, fout, indent=1)
+        fout.write('\n')
+
+#
+#END of def write_metrics_json(metrics_file_text, tool, files, seconds, arguments=None):
+#
+
+
+def summary_line(metrics):
+
+    #  Returns the metrics of one file as a line of text for -v.
+
+    numbers = dict(metrics.get('counts', {}))
+    numbers.update(metrics.get('mask', {}))
+    text = f"{metrics.get('input')}: {metrics.get('seconds', 0):.3f}s"
+    if 'records_written' in metrics:
+        text += f", {metrics['records_written']} records written"
+    if numbers:
+        text += ", " + ", ".join(f"{key} {value}" for key, value in numbers.items())
+    if metrics.get('error'):
+        text += f", FAILED: {metrics['error']}"
+    return text
+
+#
+#END of def summary_line(metrics):
+#
+
+
+@contextlib.contextmanager
+def profiled(profile_file_text):
+
+    #  Profiles the with block with cProfile and writes the stats to profile_file_text, to be read
+    #  with pstats or summarized with maple_metrics.py -p.  Nothing is profiled when
+    #  profile_file_text is None.  Only the calling process is profiled, not worker processes.
+    #
+    #  Arguments:
+    #      profile_file_text (str): Path to the stats file, or None.
+
+    if profile_file_text is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_file_text)
+
+#
+#END of def profiled(profile_file_text):
+#
+
+
+def read_metrics_files(metrics_file_texts):
+
+    #  Reads metrics files and sums their totals by tool.
+    #
+    #  Arguments:
+    #      metrics_file_texts (list): Paths to metrics files written by --metrics_json.
+    #
+    #  Returns:
+    #     tuple: (dict of the summed totals of each tool, list of (seconds, tool, input) of every file)
+
+    totals = {}
+    file_seconds = []
+    for metrics_file_text in metrics_file_texts:
+        with open(metrics_file_text, 'r') as fin:
+            metrics = json.load(fin)
+        tool = metrics.get('tool', 'unknown')
+        tool_totals = totals.setdefault(tool, {'runs': 0})
+        tool_totals['runs'] += 1
+        add_counts(tool_totals, sum_metrics(metrics.get('files', [])))
+        file_seconds.extend((file_metrics.get('seconds', 0), tool, file_metrics.get('input'))
+                            for file_metrics in metrics.get('files', []))
+    return totals, file_seconds
+
+#
+#END of def read_metrics_files(metrics_file_texts):
+#
+
+
+def format_summary(totals, file_seconds, slowest=10, counts_only=False):
+
+    #  Returns the summed metrics of each tool as text.
+    #
+    #  Arguments:
+    #      totals, file_seconds: from read_metrics_files().
+    #      slowest (int): the number of slowest files listed.
+    #      counts_only (bool): leave out the times, e.g. to compare the counts of two sets of runs.
+    #
+    #  Returns:
+    #     str: the summary.
+
+    lines = []
+    for tool, tool_totals in sorted(totals.items()):
+        lines.append(f"{tool}: {tool_totals['runs']} runs, {tool_totals.get('files', 0)} files, "
+                     f"{tool_totals.get('failed', 0)} failed")
+        if 'records_written' in tool_totals:
+            lines.append(f"  records_written\t{tool_totals['records_written']}")
+        for section in ('counts', 'mask', 'merge_n'):
+            if tool_totals.get(section):
+                lines.append(f"  {section}")
+                lines.extend(f"    {key}\t{value}" for key, value in sorted(tool_totals[section].items()))
+        if counts_only:
+            continue
+        seconds = tool_totals.get('seconds', 0)
+        lines.append(f"  seconds\t{seconds:.3f}")
+        for phase, phase_seconds in tool_totals.get('phases', {}).items():
+            share = 100 * phase_seconds / seconds if seconds else 0
+            lines.append(f"    {phase}\t{phase_seconds:.3f}\t{share:.1f}%")
+
+    if (not counts_only) and slowest and file_seconds:
+        lines.append("slowest files")
+        for seconds, tool, input_text in sorted(file_seconds, key=lambda item: -item[0])[:slowest]:
+            lines.append(f"  {seconds:.3f}\t{tool}\t{input_text}")
+    return "\n".join(lines) + "\n"
+
+#
+#END of def format_summary(totals, file_seconds, slowest=10, counts_only=False):
+#
+
+
+def process_arguments_metrics():
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: metrics_files, profile_files, slowest, top, counts_only.
+
+    parser = argparse.ArgumentParser(description='''Summarizes the metrics of many runs of gvcf_to_maple_haploid.py and mask_maple.py.
+     Reads:
+      metrics files written with --metrics_json, and/or profile stats written with --profile
+     Returns:
+      the summed counts, mask statistics and phase times of each tool, the slowest files,
+      and the functions with the most time over all profiles'''
+    ,formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('metrics_files',nargs='*',help='Metrics files written with --metrics_json.')
+    parser.add_argument('-p','--profile',action='append',default=[],help='A profile stats file written with --profile (repeatable).')
+    parser.add_argument('-s','--slowest',type=int,default=10,help='The number of slowest files listed; default 10.')
+    parser.add_argument('-t','--top',type=int,default=25,help='The number of functions listed from the profiles; default 25.')
+    parser.add_argument('-c','--counts_only',action='store_true',help='Leave out every time, e.g. to compare the counts of two sets of runs.')
+    args = parser.parse_args()
+    if not (args.metrics_files or args.profile):
+        parser.error("give metrics files and/or -p profile files")
+    return args
+
+#
+#END of def process_arguments_metrics():
+#
+
+
+if __name__ == "__main__":
+
+    args = process_arguments_metrics()
+    try:
+        if args.metrics_files:
+            totals, file_seconds = read_metrics_files(args.metrics_files)
+            sys.stdout.write(format_summary(totals, file_seconds, args.slowest, args.counts_only))
+        if args.profile:
+            stats = pstats.Stats(*args.profile)
+            stats.sort_stats('cumulative').print_stats(args.top)
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}")
+        sys.exit(1)
+    except (ValueError, IOError, TypeError) as e:
+        print(f"Error reading the file - {e}")
+        sys.exit(1)
@@ -0,0 +1,16 @@
+#!/bin/bash
+set -beu -o pipefail
+
+G=../../../gvcf_to_maple_haploid
+mkdir -p out/runs
+
+# the summary of metrics files written earlier
+python3 ../../maple_metrics.py -s 3 runs/convert_small.json runs/mask_small.json > out/summary.txt
+
+# the counts of new runs, with both masking engines
+python3 $G/gvcf_to_maple_haploid.py -i $G/test_files/test_1/small.g.vcf -d out/runs -m mask.bed --mask_contig chrA -n --metrics_json out/runs/convert.json 2> /dev/null
+python3 ../../../mask_maple/mask_maple.py -i $G/test_files/test_1/expected/small.maple -o out/runs/python.maple -m mask.bed -c chrA --metrics_json out/runs/python.json
+python3 ../../../mask_maple/mask_maple.py -i $G/test_files/test_1/expected/small.maple -o out/runs/numpy.maple -m mask.bed -c chrA -e numpy --metrics_json out/runs/numpy.json
+python3 ../../maple_metrics.py -c out/runs/convert.json out/runs/python.json out/runs/numpy.json > out/counts.txt
+rm -r out/runs
+diff -r expected out
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# Program maple_normalize.py
+# v 1.0
+#
+# Normalizes the inputs of mask_maple.py: a .bed file of masking regions is sorted by chromosome
+# and start and its overlapping or adjacent regions merged, and the records of each sample of a
+# maple file are sorted by position.  The masking algorithm of mask_maple.py reads the regions
+# and the records of each sample in one forward pass, so an 'n' run across two overlapping regions,
+# or a record earlier than the one before it, is masked wrongly without these.
+#
+# Files larger than memory are sorted with an external merge sort: runs of at most buffer_records
+# records are sorted in memory and written to temporary files, then merged.  A one pass check,
+# without sorting, finds the files already normalized, which are used as they are.  A normalized
+# .bed file is cached next to the .bed file (or in cache_dir) under the SHA-256 of its content,
+# fasTAN.bed gives fasTAN.<first 16 hex digits>.normalized.bed, reused by later runs.
+#
+
+import os
+import sys
+import heapq
+import pickle
+import hashlib
+import argparse
+import itertools
+import tempfile
+
+# maple_io.py opens the maple files, maple_binary.py reads and writes them, text or binary
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_binary'))
+import maple_io
+import maple_binary
+
+# The number of records sorted in memory at once, each run of a larger file is written to a temporary file
+SORT_BUFFER_RECORDS = 1000000
+
+# The number of runs merged at once; more runs are merged in several passes
+MERGE_RUNS = 64
+
+# The number of records pickled at once in a run
+RUN_BATCH_RECORDS = 4096
+
+
+def write_run(records, temp_dir=None):
+
+    #  Writes a sorted run of records to a temporary file, removed when closed.
+    #
+    #  Returns:
+    #     file: the temporary file, at its start.
+
+    frun = tempfile.TemporaryFile(dir=temp_dir)
+    for first in range(0, len(records), RUN_BATCH_RECORDS):
+        pickle.dump(records[first:first + RUN_BATCH_RECORDS], frun, pickle.HIGHEST_PROTOCOL)
+    frun.seek(0)
+    return frun
+
+#
+#END of def write_run(records, temp_dir=None):
+#
+
+
+def read_run(frun):
+
+    #  Yields the records of a run written by write_run().
+
+    while True:
+        try:
+            batch = pickle.load(frun)
+        except EOFError:
+            return
+        yield from batch
+
+#
+#END of def read_run(frun):
+#
+
+
+def external_sort(records, key, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+
+    #  Sorts records, holding at most buffer_records of them in memory: runs are sorted in memory
+    #  and written to temporary files, then merged.  The sort is stable.  Records fitting in one
+    #  run are sorted in memory only, records already sorted cost one comparison each.
+    #
+    #  Arguments:
+    #      records (iterator): the records, any objects that pickle.
+    #      key (function): the sort key of a record.
+    #      buffer_records (int): the number of records sorted in memory at once.
+    #      temp_dir (str): the directory of the temporary files, default the system one.
+    #
+    #  Yields:
+    #     the records, sorted.
+
+    runs = []
+    try:
+        records = iter(records)
+        while True:
+            run = list(itertools.islice(records, buffer_records))
+            run.sort(key=key)
+            if (not runs) and (len(run) < buffer_records):
+                yield from run
+                return
+            if run:
+                runs.append(write_run(run, temp_dir))
+            if len(run) < buffer_records:
+                break
+        del run
+
+        # the runs are merged MERGE_RUNS at a time until one merge is left
+        while len(runs) > MERGE_RUNS:
+            merging, runs = runs[:MERGE_RUNS], runs[MERGE_RUNS:]
+            frun = tempfile.TemporaryFile(dir=temp_dir)
+            merged = heapq.merge(*(read_run(fmerging) for fmerging in merging), key=key)
+            for batch in iter(lambda: list(itertools.islice(merged, RUN_BATCH_RECORDS)), []):
+                pickle.dump(batch, frun, pickle.HIGHEST_PROTOCOL)
+            frun.seek(0)
+            for fmerging in merging:
+                fmerging.close()
+            runs.append(frun)
+        yield from heapq.merge(*(read_run(frun) for frun in runs), key=key)
+    finally:
+        for frun in runs:
+            frun.close()
+
+#
+#END of def external_sort(records, key, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+#
+
+
+def read_bed_regions(fbedin):
+
+    #  Reads the regions of a .bed file; blank, '#', 'track' and 'browser' lines are skipped, a
+    #  line without three tab separated columns is reported and skipped.
+    #
+    #  Arguments:
+    #      fbedin (file): the open .bed file.
+    #
+    #  Yields:
+    #     tuple: (chromosome, start, end) of each region, the .bed start (zero-based) and end
+    #            (half-open).
+
+    for region in fbedin:
+        if (not region.strip()) or region.startswith(('#', 'track', 'browser')):
+            continue
+        positions = region.strip().split('\t')  # split the line into columns
+        if len(positions) >= 3:
+            yield (positions[0], int(positions[1]), int(positions[2]))
+        else:
+            print(f"Error in format of contents of mask file, no tabs? - {region.strip()}")
+
+#
+#END of def read_bed_regions(fbedin):
+#
+
+
+def merge_regions(regions):
+
+    #  Merges the overlapping or adjacent regions of each chromosome, a region starting at or
+    #  before the end of the region before.
+    #
+    #  Arguments:
+    #      regions (iterator of tuple): (chromosome, start, end) .bed regions, each chromosome
+    #                                   together and sorted by start.
+    #
+    #  Yields:
+    #     tuple: (chromosome, start, end), not overlapping.
+
+    current = None
+    for chromosome, start, end in regions:
+        if current and (chromosome == current[0]) and (start <= current[2]):
+            if end > current[2]:
+                current = (chromosome, current[1], end)
+            continue
+        if current:
+            yield current
+        current = (chromosome, start, end)
+    if current:
+        yield current
+
+#
+#END of def merge_regions(regions):
+#
+
+
+def check_bed(bed_file_text):
+
+    #  Checks in one pass, without sorting, that a .bed file is normalized: the regions of each
+    #  chromosome together, sorted by start, and each region starting after the end of the one
+    #  before.
+    #
+    #  Returns:
+    #     tuple: (True if normalized, the SHA-256 of the file).
+
+    sha256 = hashlib.sha256()
+    seen = set()
+    last = None
+    normalized = True
+    with open(bed_file_text, 'rb') as fbedin:
+        for line in fbedin:
+            sha256.update(line)
+            if not normalized:
+                continue
+            if (not line.strip()) or line.startswith((b'#', b'track', b'browser')):
+                continue
+            columns = line.strip().split(b'\t')
+            if len(columns) < 3:
+                continue
+            chromosome, start, end = columns[0], int(columns[1]), int(columns[2])
+            if last and (chromosome == last[0]):
+                normalized = start > last[2]
+            elif chromosome in seen:
+                normalized = False
+            seen.add(chromosome)
+            last = (chromosome, start, end)
+    return normalized, sha256.hexdigest()
+
+#
+#END of def check_bed(bed_file_text):
+#
+
+
+def normalize_bed(bed_file_text, bed_fileout, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None, comment=None):
+
+    #  Writes a .bed file sorted by chromosome and start, with its overlapping or adjacent regions
+    #  merged, atomically; three columns, the names and scores of the regions are left out.
+    #
+    #  Arguments:
+    #      bed_file_text (str): Path to the .bed file.
+    #      bed_fileout (str): Path to the normalized .bed file.
+    #      buffer_records, temp_dir: see external_sort().
+    #      comment (str): a '#' line written first, None for none.
+    #
+    #  Returns:
+    #     tuple: (the regions read, the regions written).
+
+    counts = [0, 0]
+
+    def counted(regions, position):
+        for region in regions:
+            counts[position] += 1
+            yield region
+
+    with open(bed_file_text, 'r') as fbedin, maple_io.atomic_output(bed_fileout) as fout:
+        if comment:
+            fout.write(f"# {comment}\n")
+        regions = external_sort(counted(read_bed_regions(fbedin), 0), None, buffer_records, temp_dir)
+        for chromosome, start, end in counted(merge_regions(regions), 1):
+            fout.write(f"{chromosome}\t{start}\t{end}\n")
+    return tuple(counts)
+
+#
+#END of def normalize_bed(bed_file_text, bed_fileout, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None, comment=None):
+#
+
+
+def normalized_bed_filename(bed_file_text, sha256, cache_dir=None):
+
+    #  Returns the path of the cached normalized .bed file of a .bed file with the given SHA-256.
+
+    name = os.path.basename(bed_file_text)
+    if name.endswith('.bed'):
+        name = name[:-len('.bed')]
+    return os.path.join(cache_dir or os.path.dirname(bed_file_text), f"{name}.{sha256[:16]}.normalized.bed")
+
+#
+#END of def normalized_bed_filename(bed_file_text, sha256, cache_dir=None):
+#
+
+
+def normalized_bed(bed_file_text, cache_dir=None, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+
+    #  Returns a normalized .bed file of the same masking regions: the .bed file itself when it
+    #  is normalized already, otherwise its cached normalized file, written when not cached yet.
+    #
+    #  Arguments:
+    #      bed_file_text (str): Path to the .bed file.
+    #      cache_dir (str): the directory of the normalized .bed files, default that of the .bed file.
+    #      buffer_records, temp_dir: see external_sort().
+    #
+    #  Returns:
+    #     tuple: (path to the normalized .bed file, 'clean', 'cached' or 'normalized').
+
+    is_normalized, sha256 = check_bed(bed_file_text)
+    if is_normalized:
+        return bed_file_text, 'clean'
+    bed_fileout = normalized_bed_filename(bed_file_text, sha256, cache_dir)
+    if os.path.isfile(bed_fileout):
+        return bed_fileout, 'cached'
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    normalize_bed(bed_file_text, bed_fileout, buffer_records, temp_dir,
+                  f"normalized by maple_normalize.py from {os.path.basename(bed_file_text)} sha256 {sha256}")
+    return bed_fileout, 'normalized'
+
+#
+#END of def normalized_bed(bed_file_text, cache_dir=None, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+#
+
+
+def read_maple_file(fin, is_binary):
+
+    #  Yields the (base, position, length) records of an open maple file, text or binary.
+
+    return maple_binary.read_maple_binary(fin) if is_binary else maple_binary.read_maple_text(fin)
+
+#
+#END of def read_maple_file(fin, is_binary):
+#
+
+
+def maple_is_sorted(maple_file_path):
+
+    #  Checks in one pass, without sorting, that the records of each sample of a maple file, text
+    #  or binary, are sorted by position.
+    #
+    #  Raises:
+    #     IOError, maple_binary.MapleFormatError: the maple file cannot be read.
+
+    is_binary = maple_binary.is_maple_binary(maple_file_path)
+    with open(maple_file_path, 'rb' if is_binary else 'r') as fin:
+        last = -1
+        for record in read_maple_file(fin, is_binary):
+            if record[0] == '>':
+                last = -1
+            elif record[1] < last:
+                return False
+            else:
+                last = record[1]
+    return True
+
+#
+#END of def maple_is_sorted(maple_file_path):
+#
+
+
+def sort_maple_records(records, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+
+    #  Sorts the records of each sample by position, stable, with external_sort(); the headers
+    #  stay where they are.
+    #
+    #  Arguments:
+    #      records (iterator of tuple): (base, position, length, ...) maple records, base is '>' for
+    #                                   a header.
+    #      buffer_records, temp_dir: see external_sort().
+    #
+    #  Yields:
+    #     tuple: the records, sorted within each sample.
+
+    headers = itertools.count()
+    samples = itertools.groupby(records, key=lambda record: next(headers) if record[0] == '>' else None)
+    for header, sample_records in samples:
+        if header is None:
+            yield from external_sort(sample_records, lambda record: record[1], buffer_records, temp_dir)
+        else:
+            yield from sample_records
+
+#
+#END of def sort_maple_records(records, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+#
+
+
+def normalize_maple(maple_file_path, maple_fileout, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+
+    #  Writes a maple file with the records of each sample sorted by position, atomically, in the
+    #  format, text or binary, of the maple file.
+    #
+    #  Arguments:
+    #      maple_file_path (str): Path to the maple file, '-' for stdin.
+    #      maple_fileout (str): Path to the sorted maple file, '-' for stdout.
+    #      buffer_records, temp_dir: see external_sort().
+    #
+    #  Returns:
+    #     int: the number of records written, headers included.
+    #
+    #  Raises:
+    #     IOError, maple_binary.MapleFormatError: the maple file cannot be read or written.
+
+    is_binary = maple_binary.is_maple_binary(maple_file_path)
+    with maple_io.input_file(maple_file_path, 'rb' if is_binary else 'r') as fin, \
+            maple_io.output_file(maple_fileout, 'wb' if is_binary else 'w') as fout:
+        records = sort_maple_records(read_maple_file(fin, is_binary), buffer_records, temp_dir)
+        if is_binary:
+            return maple_binary.write_maple_binary(fout, records)
+        record_count = 0
+        for record in records:
+            fout.write(maple_io.format_maple_record(record))
+            record_count += 1
+        return record_count
+
+#
+#END of def normalize_maple(maple_file_path, maple_fileout, buffer_records=SORT_BUFFER_RECORDS, temp_dir=None):
+#
+
+
+def process_arguments_normalize(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: mask_file, input_file, output_file, check, cache_dir, buffer, temp_dir.
+
+    parser = argparse.ArgumentParser(description='''Normalizes the inputs of mask_maple.py.
+     Reads:
+      a .bed file of masking regions (-m), or a maple file (-i)
+     Returns:
+      the .bed file sorted by chromosome and start, its overlapping or adjacent regions merged; by default
+        cached next to the .bed file, the path is printed
+      the maple file with the records of each sample sorted by position
+     with --check, only whether the file is normalized: exit code 0 if it is, 1 if not''',
+      formatter_class=argparse.RawTextHelpFormatter)
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument('-m','--mask_file',help='A .bed file of masking regions.')
+    input_group.add_argument('-i','--input_file',help='A maple file, text or binary; - for stdin.')
+    parser.add_argument('-o','--output_file',help='The normalized file; - for stdout.  Needed with -i; with -m default the cached\nnormalized .bed file, or the .bed file itself when normalized already.')
+    parser.add_argument('--check',action='store_true',help='Only check whether the file is normalized, in one pass without sorting.')
+    parser.add_argument('--cache_dir',help='With -m, the directory of the cached normalized .bed files; default that of the .bed file.')
+    parser.add_argument('-S','--buffer',type=int,default=SORT_BUFFER_RECORDS,help=f'The number of records sorted in memory at once, larger files are sorted in runs\nmerged from temporary files; default {SORT_BUFFER_RECORDS}.')
+    parser.add_argument('-T','--temp_dir',help='The directory of the temporary files; default the system one.')
+    args = parser.parse_args(argv)
+
+    if args.buffer < 1:
+        parser.error("-S/--buffer must be at least 1")
+    if args.check and args.output_file:
+        parser.error("--check writes no file, -o cannot be given")
+    if args.input_file and not (args.output_file or args.check):
+        parser.error("-i/--input_file needs -o/--output_file")
+    if args.check and (args.input_file == maple_io.STDIO):
+        parser.error("--check needs a file, not stdin")
+    return args
+
+#
+#END of def process_arguments_normalize(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_normalize().
+    #
+    #  Returns:
+    #     int: exit code, 1 if the file cannot be read, or with --check is not normalized.
+
+    args = process_arguments_normalize(argv)
+    messages = sys.stderr if args.output_file == maple_io.STDIO else sys.stdout
+    try:
+        if args.check:
+            if args.mask_file:
+                is_normalized = check_bed(args.mask_file)[0]
+            else:
+                is_normalized = maple_is_sorted(args.input_file)
+            print(f"{args.mask_file or args.input_file}\t{'normalized' if is_normalized else 'not normalized'}")
+            return 0 if is_normalized else 1
+
+        if args.input_file:
+            normalize_maple(args.input_file, args.output_file, args.buffer, args.temp_dir)
+        elif args.output_file:
+            regions_in, regions_out = normalize_bed(args.mask_file, args.output_file, args.buffer, args.temp_dir)
+            print(f"{args.mask_file}: {regions_in} regions merged into {regions_out}", file=sys.stderr)
+        else:
+            bed_fileout, status = normalized_bed(args.mask_file, args.cache_dir, args.buffer, args.temp_dir)
+            print(f"{bed_fileout}\t{status}")
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}", file=messages)
+        return 1
+    except (IOError, ValueError, maple_binary.MapleFormatError) as e:
+        print(f"Error reading the file - {e}", file=messages)
+        return 1
+    return 0
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
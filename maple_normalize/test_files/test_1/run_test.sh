@@ -0,0 +1,71 @@
+#!/bin/bash
+set -beu -o pipefail
+
+rm -rf out cache
+mkdir -p out cache
+cp messy.bed clean.bed out/
+
+# the one pass checks
+python3 ../../maple_normalize.py -m clean.bed --check > out/check.txt
+if python3 ../../maple_normalize.py -m messy.bed --check >> out/check.txt; then
+    echo "messy.bed was found normalized"
+    exit 1
+fi
+if python3 ../../maple_normalize.py -i unsorted.maple --check >> out/check.txt; then
+    echo "unsorted.maple was found sorted"
+    exit 1
+fi
+
+# the .bed regions sorted and merged, in memory and in runs of 2 regions merged from temporary files
+python3 ../../maple_normalize.py -m messy.bed -o out/messy_memory.bed 2> out/messy_memory.stderr
+python3 ../../maple_normalize.py -m messy.bed -o out/messy_runs.bed -S 2 -T cache 2> /dev/null
+cmp out/messy_memory.bed out/messy_runs.bed
+cmp clean.bed out/messy_memory.bed
+
+# more runs than are merged at once
+python3 -c "
+import random
+random.seed(7)
+for i in range(500):
+    start = random.randrange(100000)
+    print(f'chr{random.randrange(3)}\t{start}\t{start + random.randrange(1, 300)}')
+" > out/many.bed
+python3 ../../maple_normalize.py -m out/many.bed -o out/many_memory.bed 2> /dev/null
+python3 ../../maple_normalize.py -m out/many.bed -o out/many_runs.bed -S 3 2> /dev/null
+cmp out/many_memory.bed out/many_runs.bed
+python3 ../../maple_normalize.py -m out/many_runs.bed --check > /dev/null
+rm out/many.bed out/many_memory.bed out/many_runs.bed
+
+# the normalized .bed file cached next to the .bed file, or in --cache_dir, a clean .bed file used as it is
+python3 ../../maple_normalize.py -m out/messy.bed > out/cache.txt
+python3 ../../maple_normalize.py -m out/messy.bed >> out/cache.txt
+python3 ../../maple_normalize.py -m out/clean.bed >> out/cache.txt
+python3 ../../maple_normalize.py -m out/messy.bed --cache_dir out/cache >> out/cache.txt
+
+# the records of each sample sorted, text and binary, in memory and in runs
+python3 ../../maple_normalize.py -i unsorted.maple -o out/sorted.maple
+python3 ../../maple_normalize.py -i unsorted.maple -o - -S 2 | cmp - out/sorted.maple
+python3 ../../../maple_binary/maple_binary.py -i unsorted.maple -o out/unsorted.mapleb
+python3 ../../maple_normalize.py -i out/unsorted.mapleb -o out/sorted.mapleb -S 2
+python3 ../../../maple_binary/maple_binary.py -i out/sorted.mapleb -o - | cmp - out/sorted.maple
+rm out/unsorted.mapleb out/sorted.mapleb
+
+# mask_maple.py --normalize masks the unsorted maple file with the messy .bed file as the sorted one with
+# the clean .bed file, with every engine
+python3 ../../../mask_maple/mask_maple.py -i out/sorted.maple -m clean.bed -c chrA -o out/masked.maple
+for engine in python numpy mmap; do
+    python3 ../../../mask_maple/mask_maple.py -i unsorted.maple -m out/messy.bed -c chrA -o out/masked_$engine.maple \
+        -e $engine --normalize --normalize_dir cache 2> /dev/null
+    cmp out/masked.maple out/masked_$engine.maple
+    rm out/masked_$engine.maple
+done
+python3 ../../../mask_maple/mask_maple.py -i - -m out/messy.bed -c chrA --normalize --normalize_dir cache < unsorted.maple 2> /dev/null \
+    | cmp - out/masked.maple
+printf "unsorted.maple\nout/sorted.maple\n" > out/maple.list
+mkdir -p out/masked
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m out/messy.bed -c chrA -d out/masked -j 2 --normalize \
+    --normalize_dir cache 2> out/mask_list.stderr
+cmp out/masked/unsorted.maple out/masked/sorted.maple
+
+rm -rf cache out/cache out/messy_runs.bed out/maple.list
+diff -r expected out
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# Program maple_qc.py
+# v 1.0
+#
+# QC summaries of the maple files written by gvcf_to_maple_haploid.py and mask_maple.py (--qc),
+# counted while the maple file is written, and a cohort table of many summaries, made without
+# reading any maple file, e.g. to drop the samples too incomplete for tree building.
+#
+# QC summary file format, JSON, SRR21943188.qc.json next to SRR21943188.maple:
+#
+#   qc_version        1
+#   tool              the script that wrote the maple file, 'gvcf_to_maple_haploid' or 'mask_maple'
+#   sample            the sample name
+#   input, output     the input file and the maple file
+#   contigs           one object per '>' header of the maple file, in the order of the file ('' for
+#                     records before the first header):
+#                       records         the maple records written, headers not included
+#                       n_bases         the total length of the 'n' runs written
+#                       snps            the single base records written
+#                       masked_records  the records removed by the mask (-m of gvcf_to_maple_haploid.py,
+#                       masked_bases    or mask_maple.py), and the positions removed
+#
+
+import os
+import sys
+import json
+import glob
+import argparse
+
+# maple_io.py writes the summaries and the table atomically
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+import maple_io
+
+QC_VERSION = 1
+
+# The counters of each contig, in the order of the table columns
+COUNTERS = ('records', 'n_bases', 'snps', 'masked_records', 'masked_bases')
+
+# The contig of the row of the totals of a sample in the cohort table
+TOTAL_CONTIG = '*'
+
+
+def qc_filename(maple_file_text):
+
+    #  Returns the name of the QC summary of a maple file, '.maple' or '.mapleb' becomes '.qc.json'.
+
+    for extension in ('.mapleb', '.maple'):
+        if maple_file_text.endswith(extension):
+            return maple_file_text[:-len(extension)] + '.qc.json'
+    return maple_file_text + '.qc.json'
+
+#
+#END of def qc_filename(maple_file_text):
+#
+
+
+def qc_sample_name(maple_file_text):
+
+    #  Returns the sample name of a maple file: the file name without the directory and the
+    #  .maple or .mapleb extension.
+
+    name = os.path.basename(maple_file_text)
+    for extension in ('.mapleb', '.maple'):
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+#
+#END of def qc_sample_name(maple_file_text):
+#
+
+
+def count_records(records, contigs):
+
+    #  Passes on maple records, counting the records, 'n' bases and SNPs of each header.
+    #
+    #  Arguments:
+    #      records (iterator of tuple): (base, position, length, ...) maple records, base is '>'
+    #                                   for a header (position is then the header text).
+    #      contigs (dict): the counters of each header, {header_text: {counter: value}}, filled.
+    #
+    #  Yields:
+    #     tuple: the records, unchanged.
+
+    counts = None
+    for record in records:
+        base = record[0]
+        if base == '>':
+            counts = contigs.setdefault(record[1], dict.fromkeys(COUNTERS, 0))
+        else:
+            if counts is None:
+                counts = contigs.setdefault('', dict.fromkeys(COUNTERS, 0))
+            counts['records'] += 1
+            if base == 'n':
+                counts['n_bases'] += record[2]
+            elif base != '-':
+                counts['snps'] += 1
+        yield record
+
+#
+#END of def count_records(records, contigs):
+#
+
+
+def count_blocks(blocks, contigs):
+
+    #  Passes on blocks of maple records, counting the records, 'n' bases and SNPs of each header
+    #  a block at once, for the numpy engine.
+    #
+    #  Arguments:
+    #      blocks (iterator of tuple): (header_text or None, types, positions, lengths), types a uint8
+    #                                  array of the ASCII codes of the record types; a header None
+    #                                  continues the header of the block before.
+    #      contigs (dict): see count_records().
+    #
+    #  Yields:
+    #     tuple: the blocks, unchanged.
+
+    counts = None
+    for block in blocks:
+        header_text, types, positions, lengths = block
+        if header_text is not None:
+            counts = contigs.setdefault(header_text, dict.fromkeys(COUNTERS, 0))
+        elif counts is None:
+            counts = contigs.setdefault('', dict.fromkeys(COUNTERS, 0))
+        is_n = types == ord('n')
+        counts['records'] += int(types.size)
+        counts['n_bases'] += int(lengths[is_n].sum())
+        counts['snps'] += int(types.size - is_n.sum() - (types == ord('-')).sum())
+        yield block
+
+#
+#END of def count_blocks(blocks, contigs):
+#
+
+
+def add_masked(contigs, header_stats):
+
+    #  Adds the records and bases removed by the mask of each header, from the header_stats of
+    #  mask_maple.mask_maple_records(), to the counters of count_records().
+
+    for header_text, stats in header_stats.items():
+        counts = contigs.setdefault(header_text, dict.fromkeys(COUNTERS, 0))
+        counts['masked_records'] += stats['dropped']
+        counts['masked_bases'] += stats['bases_masked']
+
+#
+#END of def add_masked(contigs, header_stats):
+#
+
+
+def write_summary(qc_file_text, tool, sample, input_file_text, maple_fileout, contigs):
+
+    #  Writes the QC summary of a maple file atomically, see the head of this file.
+    #
+    #  Arguments:
+    #      qc_file_text (str): Path to the QC summary, from qc_filename().
+    #      tool (str): the script that wrote the maple file.
+    #      sample (str): the sample name.
+    #      input_file_text, maple_fileout (str): the input file and the maple file.
+    #      contigs (dict): from count_records() or count_blocks(), and add_masked().
+
+    summary = {'qc_version': QC_VERSION, 'tool': tool, 'sample': sample, 'input': input_file_text,
+               'output': maple_fileout, 'contigs': contigs}
+    with maple_io.atomic_output(qc_file_text) as fout:
+        json.dump(summary, fout, indent=1)
+        fout.write('\n')
+
+#
+#END of def write_summary(qc_file_text, tool, sample, input_file_text, maple_fileout, contigs):
+#
+
+
+def read_summary(qc_file_text):
+
+    #  Reads a QC summary.
+    #
+    #  Raises:
+    #     ValueError: the file is not a QC summary.
+
+    with open(qc_file_text, 'r') as fin:
+        try:
+            summary = json.load(fin)
+        except ValueError as e:
+            raise ValueError(f"{qc_file_text} is not a QC summary - {e}")
+    if (not isinstance(summary, dict)) or (summary.get('qc_version') != QC_VERSION):
+        raise ValueError(f"{qc_file_text} is not a QC summary of version {QC_VERSION}")
+    return summary
+
+#
+#END of def read_summary(qc_file_text):
+#
+
+
+def cohort_rows(summary, totals_only=False):
+
+    #  Returns the rows of one sample of the cohort table: one for each contig, then the totals
+    #  of the sample (contig '*').
+    #
+    #  Returns:
+    #     list: [sample, contig, counter values...] of each row.
+
+    totals = dict.fromkeys(COUNTERS, 0)
+    rows = []
+    for contig, counts in summary['contigs'].items():
+        values = [counts.get(counter, 0) for counter in COUNTERS]
+        for counter, value in zip(COUNTERS, values):
+            totals[counter] += value
+        if not totals_only:
+            rows.append([summary['sample'], contig] + values)
+    rows.append([summary['sample'], TOTAL_CONTIG] + [totals[counter] for counter in COUNTERS])
+    return rows
+
+#
+#END of def cohort_rows(summary, totals_only=False):
+#
+
+
+def list_summary_files(summary_texts, batch_text=None):
+
+    #  Returns the QC summary files given on the command line, and those of a list file (one per
+    #  line, blank lines and lines starting with '#' ignored) or quoted glob pattern.
+
+    summary_files = list(summary_texts)
+    if batch_text:
+        if os.path.isfile(batch_text):
+            with open(batch_text, 'r') as flistin:
+                summary_files += [line.strip() for line in flistin if line.strip() and not line.startswith('#')]
+        else:
+            summary_files += sorted(glob.glob(batch_text))
+    return summary_files
+
+#
+#END of def list_summary_files(summary_texts, batch_text=None):
+#
+
+
+def process_arguments_qc(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: summary_files, batch, output_file, totals_only.
+
+    parser = argparse.ArgumentParser(description='''Merges the QC summaries written with --qc by gvcf_to_maple_haploid.py
+     and mask_maple.py into one cohort table, without reading any maple file.
+     Reads:
+      QC summary files (.qc.json)
+     Returns:
+      a tab separated table, one row for each sample and contig and one for the totals of each
+      sample (contig *): sample, contig, records, n_bases, snps, masked_records, masked_bases''',
+      formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('summary_files',nargs='*',help='QC summary files written with --qc.')
+    parser.add_argument('-b','--batch',help='A file containing a list of QC summary files, or a quoted glob pattern, e.g. \'maples/*.qc.json\'.')
+    parser.add_argument('-o','--output_file',help='The cohort table; default stdout.')
+    parser.add_argument('-t','--totals_only',action='store_true',help='Only the row of the totals of each sample.')
+    args = parser.parse_args(argv)
+    if not (args.summary_files or args.batch):
+        parser.error("give QC summary files, or -b/--batch")
+    return args
+
+#
+#END of def process_arguments_qc(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_qc().
+    #
+    #  Returns:
+    #     int: exit code, 1 if a summary cannot be read; the others are still in the table.
+
+    args = process_arguments_qc(argv)
+    exit_code = 0
+    lines = ["\t".join(('sample', 'contig') + COUNTERS) + "\n"]
+    for qc_file_text in list_summary_files(args.summary_files, args.batch):
+        try:
+            summary = read_summary(qc_file_text)
+        except FileNotFoundError as e:
+            print(f"Error: The file was not found - {e}", file=sys.stderr)
+            exit_code = 1
+            continue
+        except (ValueError, IOError) as e:
+            print(f"Error reading the file - {e}", file=sys.stderr)
+            exit_code = 1
+            continue
+        lines += ["\t".join(str(value) for value in row) + "\n" for row in cohort_rows(summary, args.totals_only)]
+
+    with maple_io.output_file(args.output_file or maple_io.STDIO) as fout:
+        fout.writelines(lines)
+    return exit_code
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+#!/bin/bash
+set -beu -o pipefail
+
+rm -rf out
+mkdir -p out/vcf out/maples out/numpy out/masked
+for sample in a b; do
+    cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/vcf/$sample.g.vcf
+done
+
+# QC summaries written with the maple files, a masked at conversion, b unmasked
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/a.g.vcf -d out/maples -m mask.bed --mask_contig chrA --qc
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/b.g.vcf -d out/maples --qc
+
+# the numpy engine counts the same
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/a.g.vcf -d out/numpy -m mask.bed --mask_contig chrA -e numpy --qc
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/b.g.vcf -d out/numpy -e numpy --qc
+for sample in a b; do
+    sed 's/out\/numpy/out\/maples/' out/numpy/$sample.qc.json | cmp - out/maples/$sample.qc.json
+done
+
+# the unmasked maple file masked afterwards, with -e numpy falling back to python
+printf "out/maples/b.maple\n" > out/maple.list
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked -e numpy --qc
+
+# the cohort tables, without reading the maple files
+python3 ../../maple_qc.py out/maples/a.qc.json out/maples/b.qc.json out/masked/b.qc.json > out/cohort.tsv
+python3 ../../maple_qc.py -b 'out/maples/*.qc.json' -t -o out/cohort_totals.tsv
+
+# a file that is not a QC summary is reported, the others are still in the table
+if python3 ../../maple_qc.py out/maples/a.qc.json out/maples/a.maple > out/cohort_error.tsv 2> out/cohort_error.stderr; then
+    echo "a maple file was read as a QC summary"
+    exit 1
+fi
+
+rm -rf out/vcf
+diff -r expected out
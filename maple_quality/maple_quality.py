@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# Program maple_quality.py
+# v 1.0
+#
+# Reads and writes quality files, the sidecar gvcf_to_maple_haploid.py writes next to a maple file
+# with --quality: every call of the g.vcf that can appear in the maple file, with its DP and GQ,
+# so the maple file can be made again with other DP and GQ criteria without the g.vcf (give the
+# quality file to gvcf_to_maple_haploid.py in place of the g.vcf).  The calls of a chromosome are
+# stored as arrays, so nothing is parsed when they are read and a file can be memory mapped.
+#
+# quality file format, all integers are little endian:
+#
+# file header, 16 bytes
+#   8 bytes   magic b'MAPLEQUA'
+#   uint32    format version, 1
+#   uint32    reserved, 0
+#
+# followed by blocks of calls
+#   uint32    length of the header text in bytes, 0xFFFFFFFF when the calls continue the
+#             chromosome of the block before
+#   uint32    number of calls, count
+#   bytes     the header text (utf-8, without the '>'), zero padded to a multiple of 4 bytes
+#   uint32    count starts, the POS of the call
+#   uint32    count ends, the END of a reference block, the POS of a single site
+#   uint16    count DP, zero padded to a multiple of 4 bytes
+#   uint8     count GQ, zero padded to a multiple of 4 bytes
+#   uint8     count alleles, the ASCII code of the called alternate base, 0 for a reference call
+#             (a reference block or a reference site), zero padded to a multiple of 4 bytes
+#
+# A DP above 65535 is stored as 65535 and a GQ above 255 as 255: a call passes or fails the same
+# for any -DP up to 65535 and -GQ up to 255.
+#
+
+import sys
+import os
+import mmap
+import array
+import struct
+import argparse
+
+# maple_binary.py has the binary format helpers, the quality format follows the binary maple format
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_binary'))
+import maple_binary
+
+try:
+    import numpy as np
+except ImportError:     # numpy is only needed for read_quality_blocks()
+    np = None
+
+MAGIC = b'MAPLEQUA'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sII')
+BLOCK_HEADER = struct.Struct('<II')
+NO_HEADER = 0xFFFFFFFF
+MAX_VALUE = 0xFFFFFFFF
+MAX_DP = 0xFFFF
+MAX_GQ = 0xFF
+
+# The calls written at most in one block, so a long chromosome is never held in memory
+QUALITY_BLOCK_SIZE = 1 << 16
+
+
+def is_quality_file(file_path):
+
+    #  Checks the start of a file for the quality file magic.
+
+    with open(file_path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+#
+#END of def is_quality_file(file_path):
+#
+
+
+def quality_filename(maple_file_text):
+
+    #  Returns the name of the quality file of a maple file, '.maple' or '.mapleb' becomes '.mapleq'.
+
+    for extension in ('.mapleb', '.maple'):
+        if maple_file_text.endswith(extension):
+            return maple_file_text[:-len(extension)] + '.mapleq'
+    return maple_file_text + '.mapleq'
+
+#
+#END of def quality_filename(maple_file_text):
+#
+
+
+def maple_filename(quality_file_text):
+
+    #  Returns the name of the maple file made from a quality file, '.mapleq' becomes '.maple'.
+
+    if quality_file_text.endswith('.mapleq'):
+        return quality_file_text[:-1]
+    return quality_file_text + '.maple'
+
+#
+#END of def maple_filename(quality_file_text):
+#
+
+
+def little_endian(values):
+
+    #  Returns an array of unsigned integers as little endian bytes.
+
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+#
+#END of def little_endian(values):
+#
+
+
+def write_quality_header(fout):
+
+    #  Writes the file header of a quality file.
+
+    fout.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+#
+#END of def write_quality_header(fout):
+#
+
+
+def write_quality_block(fout, header_text, alleles, starts, ends, DP, GQ):
+
+    #  Writes a block of calls to a quality file.
+    #
+    #  Arguments:
+    #      fout (file): the quality file open for binary writing, after write_quality_header().
+    #      header_text (str): the header without the '>', None for calls continuing the block before.
+    #      alleles (bytes): the called alternate bases, one ASCII code per call, 0 for a reference call.
+    #      starts, ends: the first and last position of each call, array('I') or numpy arrays.
+    #      DP, GQ: the DP and GQ of each call, array('H') and bytes, or numpy arrays (saturated
+    #              to 65535 and 255 here).
+
+    count = len(alleles)
+    if header_text is None:
+        fout.write(BLOCK_HEADER.pack(NO_HEADER, count))
+    else:
+        name = header_text.encode()
+        fout.write(BLOCK_HEADER.pack(len(name), count))
+        fout.write(name + maple_binary.padding(len(name)))
+    if isinstance(starts, array.array):
+        fout.write(little_endian(starts))
+        fout.write(little_endian(ends))
+        fout.write(little_endian(DP) + maple_binary.padding(2 * count))
+        fout.write(bytes(GQ) + maple_binary.padding(count))
+        fout.write(bytes(alleles) + maple_binary.padding(count))
+    else:
+        fout.write(starts.astype('<u4').tobytes())
+        fout.write(ends.astype('<u4').tobytes())
+        fout.write(np.minimum(DP, MAX_DP).astype('<u2').tobytes() + maple_binary.padding(2 * count))
+        fout.write(np.minimum(GQ, MAX_GQ).astype(np.uint8).tobytes() + maple_binary.padding(count))
+        fout.write(np.asarray(alleles, dtype=np.uint8).tobytes() + maple_binary.padding(count))
+
+#
+#END of def write_quality_block(fout, header_text, alleles, starts, ends, DP, GQ):
+#
+
+
+def write_quality_calls(fout, calls, block_size=QUALITY_BLOCK_SIZE):
+
+    #  Writes calls to a quality file as they are passed on, the calls are collected until the next
+    #  header, or block_size calls, and written as one block.
+    #
+    #  Arguments:
+    #      fout (file): the quality file open for binary writing, after write_quality_header().
+    #      calls (iterator of tuple): the calls of gvcf_to_maple_haploid.parse_vcf(): ('>', header_text, 0)
+    #                                 or (allele, position, length, DP, GQ), allele '' for a reference call.
+    #      block_size (int): the calls written at most in one block.
+    #
+    #  Yields:
+    #     tuple: the calls.
+    #
+    #  Raises:
+    #     maple_binary.MapleFormatError: a call cannot be stored in the quality format.
+
+    header_text = None
+    alleles, starts, ends, DP, GQ = bytearray(), array.array('I'), array.array('I'), array.array('H'), bytearray()
+    for call in calls:
+        if call[0] == '>':
+            if alleles or (header_text is not None):
+                write_quality_block(fout, header_text, alleles, starts, ends, DP, GQ)
+            header_text = call[1]
+            alleles, starts, ends, DP, GQ = bytearray(), array.array('I'), array.array('I'), array.array('H'), bytearray()
+            yield call
+            continue
+
+        allele, position, length, call_DP, call_GQ = call
+        end = position + length - 1
+        if (len(allele) > 1) or not (0 <= position <= end <= MAX_VALUE) or (call_DP < 0) or (call_GQ < 0):
+            raise maple_binary.MapleFormatError(f"Error: call cannot be written to a quality file - {call}")
+        alleles.append(ord(allele) if allele else 0)
+        starts.append(position)
+        ends.append(end)
+        DP.append(min(call_DP, MAX_DP))
+        GQ.append(min(call_GQ, MAX_GQ))
+        if len(alleles) >= block_size:
+            write_quality_block(fout, header_text, alleles, starts, ends, DP, GQ)
+            header_text = None
+            alleles, starts, ends, DP, GQ = bytearray(), array.array('I'), array.array('I'), array.array('H'), bytearray()
+        yield call
+
+    if alleles or (header_text is not None):
+        write_quality_block(fout, header_text, alleles, starts, ends, DP, GQ)
+
+#
+#END of def write_quality_calls(fout, calls, block_size=QUALITY_BLOCK_SIZE):
+#
+
+
+def check_file_header(data):
+
+    #  Checks the file header of a quality file.
+
+    if len(data) < FILE_HEADER.size:
+        raise maple_binary.MapleFormatError("Error: not a quality file, the file is too short")
+    magic, version, reserved = FILE_HEADER.unpack(data[:FILE_HEADER.size])
+    if magic != MAGIC:
+        raise maple_binary.MapleFormatError("Error: not a quality file")
+    if version != VERSION:
+        raise maple_binary.MapleFormatError(f"Error: quality file version {version} is not supported")
+
+#
+#END of def check_file_header(data):
+#
+
+
+def block_size(count):
+
+    #  Returns the bytes of the arrays of a block of count calls.
+
+    return 8 * count + 2 * count + len(maple_binary.padding(2 * count)) + 2 * (count + len(maple_binary.padding(count)))
+
+#
+#END of def block_size(count):
+#
+
+
+def read_quality_calls(fin):
+
+    #  Reads the calls of a quality file, one block at a time.
+    #
+    #  Arguments:
+    #      fin (file): the quality file open for binary reading.
+    #
+    #  Yields:
+    #     tuple: the calls as gvcf_to_maple_haploid.parse_vcf() yields them: ('>', header_text, 0)
+    #            or (allele, position, length, DP, GQ), allele '' for a reference call.
+    #
+    #  Raises:
+    #     maple_binary.MapleFormatError: the file is not a quality file or is damaged.
+
+    check_file_header(fin.read(FILE_HEADER.size))
+    while True:
+        data = fin.read(BLOCK_HEADER.size)
+        if not data:
+            return
+        if len(data) < BLOCK_HEADER.size:
+            raise maple_binary.MapleFormatError("Error: quality file is truncated")
+        name_size, count = BLOCK_HEADER.unpack(data)
+        if name_size != NO_HEADER:
+            name = fin.read(name_size + len(maple_binary.padding(name_size)))
+            if len(name) < name_size:
+                raise maple_binary.MapleFormatError("Error: quality file is truncated")
+            yield ('>', name[:name_size].decode(), 0)
+
+        data = fin.read(block_size(count))
+        if len(data) < block_size(count):
+            raise maple_binary.MapleFormatError("Error: quality file is truncated")
+        starts, ends, DP = array.array('I'), array.array('I'), array.array('H')
+        starts.frombytes(data[:4*count])
+        ends.frombytes(data[4*count:8*count])
+        DP.frombytes(data[8*count:10*count])
+        if sys.byteorder == 'big':
+            starts.byteswap()
+            ends.byteswap()
+            DP.byteswap()
+        GQ_at = 10 * count + len(maple_binary.padding(2 * count))
+        GQ = data[GQ_at:GQ_at+count]
+        alleles_at = GQ_at + count + len(maple_binary.padding(count))
+        alleles = data[alleles_at:alleles_at+count]
+
+        for allele, start, end, call_DP, call_GQ in zip(alleles, starts, ends, DP, GQ):
+            yield (chr(allele) if allele else '', start, end - start + 1, call_DP, call_GQ)
+
+#
+#END of def read_quality_calls(fin):
+#
+
+
+def read_quality_blocks(quality_file_path):
+
+    #  Memory maps a quality file and yields each block of calls as numpy arrays, the arrays are
+    #  views of the file and nothing is copied or parsed.
+    #
+    #  Arguments:
+    #      quality_file_path (str): Path to the quality file.
+    #
+    #  Yields:
+    #     tuple: (header_text or None, alleles, starts, ends, DP, GQ) - header_text None for calls
+    #            continuing the block before, alleles and GQ uint8 arrays, starts and ends '<u4',
+    #            DP '<u2' arrays.
+    #
+    #  Raises:
+    #     maple_binary.MapleFormatError: the file is not a quality file or is damaged.
+
+    with open(quality_file_path, 'rb') as fin:
+        if os.fstat(fin.fileno()).st_size <= FILE_HEADER.size:
+            check_file_header(fin.read())
+            return
+        data = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    check_file_header(data[:FILE_HEADER.size])
+
+    offset = FILE_HEADER.size
+    while offset < len(buf):
+        if offset + BLOCK_HEADER.size > len(buf):
+            raise maple_binary.MapleFormatError("Error: quality file is truncated")
+        name_size, count = BLOCK_HEADER.unpack_from(data, offset)
+        offset += BLOCK_HEADER.size
+        header_text = None
+        if name_size != NO_HEADER:
+            header_text = data[offset:offset+name_size].decode()
+            offset += name_size + len(maple_binary.padding(name_size))
+        arrays_at = offset
+        offset += block_size(count)
+        if offset > len(buf):
+            raise maple_binary.MapleFormatError("Error: quality file is truncated")
+        GQ_at = arrays_at + 10 * count + len(maple_binary.padding(2 * count))
+        alleles_at = GQ_at + count + len(maple_binary.padding(count))
+        yield (header_text, buf[alleles_at:alleles_at+count],
+               buf[arrays_at:arrays_at+4*count].view('<u4'), buf[arrays_at+4*count:arrays_at+8*count].view('<u4'),
+               buf[arrays_at+8*count:arrays_at+10*count].view('<u2'), buf[GQ_at:GQ_at+count])
+
+#
+#END of def read_quality_blocks(quality_file_path):
+#
+
+
+def format_quality_call(call):
+
+    #  Returns a call as a line of text: a '>' header, or the start, end, allele ('.' for a
+    #  reference call), DP and GQ tab separated.
+
+    if call[0] == '>':
+        return f">{call[1]}\n"
+    allele, position, length, DP, GQ = call
+    return f"{position}\t{position + length - 1}\t{allele or '.'}\t{DP}\t{GQ}\n"
+
+#
+#END of def format_quality_call(call):
+#
+
+
+def process_arguments_quality():
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: input_file and output_file.
+
+    parser = argparse.ArgumentParser(description='''Lists the calls of a quality file written by gvcf_to_maple_haploid.py --quality.
+     Reads:
+      a .mapleq quality file
+     Returns:
+      a '>' line for each header, then a line for each call: start, end, called allele ('.' for a
+      reference call), DP and GQ, tab separated'''
+    ,formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-i','--input_file',help='The name of the quality file.',required=True)
+    parser.add_argument('-o','--output_file',help='The name of the text file; default stdout.')
+    return parser.parse_args()
+
+#
+#END of def process_arguments_quality():
+#
+
+
+if __name__ == "__main__":
+
+    args = process_arguments_quality()
+    try:
+        with open(args.input_file, 'rb') as fin:
+            fout = open(args.output_file, 'w') if args.output_file else sys.stdout
+            try:
+                for call in read_quality_calls(fin):
+                    fout.write(format_quality_call(call))
+            finally:
+                if args.output_file:
+                    fout.close()
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}")
+        sys.exit(1)
+    except (maple_binary.MapleFormatError, ValueError, IOError) as e:
+        print(f"Error reading the file - {e}")
+        sys.exit(1)
@@ -0,0 +1,20 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the quality file written with the maple file, listed as text
+rm -rf out
+mkdir -p out
+cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/
+(cd out && python3 ../../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i small.g.vcf -q)
+python3 ../../maple_quality.py -i out/small.mapleq -o out/small.txt
+cmp expected/small.mapleq out/small.mapleq
+cmp expected/small.txt out/small.txt
+
+# the maple file made again from the quality file with other criteria, with both engines, is the
+# maple file of the g.vcf with these criteria
+(cd out && python3 ../../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i small.g.vcf -DP 10 -GQ 50 -o OR -d vcf)
+(cd out && python3 ../../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i small.mapleq -DP 10 -GQ 50 -o OR -d python)
+(cd out && python3 ../../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i small.mapleq -DP 10 -GQ 50 -o OR -d numpy -e numpy)
+cmp out/vcf/small.maple out/python/small.maple
+cmp out/vcf/small.maple out/numpy/small.maple
+rm out/small.g.vcf
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# Program maple_shard.py
+# v 1.0
+#
+# Shards of a batch of gvcf_to_maple_haploid.py (-b) or mask_maple.py (-l) run on several nodes
+# (--shard I/N), and a check that the shards together wrote every output of the batch, with the
+# outputs joined into one maple file.
+#
+# Each input file goes to the shard given by the SHA-256 of its sample name, the file name without
+# the directory and the .g.vcf.gz, .g.vcf, .mapleq, .mapleb or .maple extension: every node reading
+# the same list picks the same files without talking to the others, and a sample stays in the same
+# shard when its maple file is masked.
+#
+# The manifest of a shard (--manifest) records, besides the outputs written (maple_manifest.py):
+#
+#   shard             index       I, from 1 to count
+#                     count       N, the number of shards
+#                     inputs      the number of input files of the whole batch
+#                     inputs_sha256  the SHA-256 of the sorted sample names of the whole batch
+#                     tool, version, parameters  as recorded for each output
+#                     outputs     [position in the batch list, output file] of each input file of the shard
+#                     directory   the working directory of the shard, the output files given relative to the
+#                                 working directory are read from it
+#
+
+import os
+import sys
+import hashlib
+import argparse
+
+# maple_manifest.py reads the manifests of the shards, maple_io.py and maple_binary.py
+# write the joined maple file
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_manifest'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_binary'))
+import maple_manifest
+import maple_io
+import maple_binary
+
+# The extensions left out of a sample name, longest first
+SAMPLE_EXTENSIONS = ('.g.vcf.gz', '.g.vcf', '.vcf.gz', '.vcf', '.mapleq', '.mapleb', '.maple')
+
+# Size of the blocks of a maple file copied at once
+COPY_BLOCK_SIZE = 1 << 20
+
+
+def parse_shard(shard_text):
+
+    #  Reads a shard given as I/N, the I-th of N shards.
+    #
+    #  Returns:
+    #     tuple: (index, count), index from 1 to count.
+    #
+    #  Raises:
+    #     ValueError: the text is not I/N with 1 <= I <= N.
+
+    index_text, slash, count_text = shard_text.partition('/')
+    try:
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"shard '{shard_text}' is not I/N, e.g. 2/8")
+    if not (1 <= index <= count):
+        raise ValueError(f"shard '{shard_text}' needs 1 <= I <= N")
+    return index, count
+
+#
+#END of def parse_shard(shard_text):
+#
+
+
+def sample_name(file_text):
+
+    #  Returns the sample name of an input file: the file name without the directory and the
+    #  .g.vcf.gz, .g.vcf, .mapleq, .mapleb or .maple extension.
+
+    name = os.path.basename(file_text.strip())
+    for extension in SAMPLE_EXTENSIONS:
+        if name.endswith(extension) and len(name) > len(extension):
+            return name[:-len(extension)]
+    return name
+
+#
+#END of def sample_name(file_text):
+#
+
+
+def shard_index(name, count):
+
+    #  Returns the shard, from 1 to count, of a sample name.  A hash rather than the position
+    #  in the list, so the shard of a sample does not change when other samples are added.
+
+    return int(hashlib.sha256(name.encode('utf-8')).hexdigest()[:16], 16) % count + 1
+
+#
+#END of def shard_index(name, count):
+#
+
+
+def in_shard(file_text, shard):
+
+    #  Returns True if the input file belongs to the shard (index, count) from parse_shard().
+
+    index, count = shard
+    return shard_index(sample_name(file_text), count) == index
+
+#
+#END of def in_shard(file_text, shard):
+#
+
+
+def select_shard(file_texts, shard):
+
+    #  Returns the input files of the shard (index, count), in the order given.
+
+    return [file_text for file_text in file_texts if in_shard(file_text, shard)]
+
+#
+#END of def select_shard(file_texts, shard):
+#
+
+
+def shard_record(outputs, shard, tool, version, parameters):
+
+    #  Returns the shard record of a manifest, see the head of this file.
+    #
+    #  Arguments:
+    #      outputs (list): (input file, output file) of every input file of the whole batch, in the
+    #                      order of the batch list.
+    #      shard (tuple): (index, count) from parse_shard().
+    #      tool, version (str): the script writing the outputs, and its VERSION.
+    #      parameters (dict): everything else the outputs depend on, see maple_manifest.record_output().
+
+    index, count = shard
+    names = "\n".join(sorted(sample_name(input_file_text) for input_file_text, output_file_text in outputs))
+    return {'index': index, 'count': count, 'inputs': len(outputs),
+            'inputs_sha256': hashlib.sha256(names.encode('utf-8')).hexdigest(),
+            'tool': tool, 'version': version, 'parameters': maple_manifest.canonical(parameters),
+            'directory': os.getcwd(),
+            'outputs': [[position, os.path.normpath(output_file_text)]
+                        for position, (input_file_text, output_file_text) in enumerate(outputs)
+                        if in_shard(input_file_text, shard)]}
+
+#
+#END of def shard_record(outputs, shard, tool, version, parameters):
+#
+
+
+def output_path(shard, output_file_text):
+
+    #  Returns the path of an output file of a shard from the current directory: a path relative
+    #  to the working directory of the shard is joined to it, so a shard is checked from any
+    #  directory.  A manifest written without the directory keeps the path as it is.
+
+    return os.path.join(shard.get('directory', ''), output_file_text)
+
+#
+#END of def output_path(shard, output_file_text):
+#
+
+
+def output_check(shard, entry, output_file_text):
+
+    #  Checks one output of a shard against its manifest entry.
+    #
+    #  Arguments:
+    #      shard (dict): the shard record of the manifest.
+    #      entry (dict): the manifest entry of the output, None if not recorded.
+    #      output_file_text (str): Path to the output file.
+    #
+    #  Returns:
+    #     str: None if the output is complete, otherwise 'not recorded' (the shard did not write
+    #          it, e.g. the input failed), 'other parameters' (written by another version of the
+    #          tool or with other parameters), 'output missing' or 'output changed' (another size
+    #          or SHA-256 than written, e.g. a partial copy).
+
+    if entry is None:
+        return 'not recorded'
+    if ((entry.get('tool'), entry.get('version'), entry.get('parameters'))
+            != (shard['tool'], shard['version'], shard['parameters'])):
+        return 'other parameters'
+    if entry.get('output_size') is None:
+        return None
+    try:
+        size = os.path.getsize(output_file_text)
+    except OSError:
+        return 'output missing'
+    if size != entry['output_size']:
+        return 'output changed'
+    if entry.get('output_sha256') and (maple_manifest.file_hash(output_file_text) != entry['output_sha256']):
+        return 'output changed'
+    return None
+
+#
+#END of def output_check(shard, entry, output_file_text):
+#
+
+
+def verify_shards(manifests):
+
+    #  Checks that the shards of a batch together wrote every output of the batch: each shard
+    #  1 to N once, of the same batch list, tool and parameters, and every output of each shard
+    #  complete, see output_check().
+    #
+    #  Arguments:
+    #      manifests (list): (manifest file, manifest from maple_manifest.read_manifest()) of each shard.
+    #
+    #  Returns:
+    #     tuple: (text, number of problems, outputs) - text one line per problem, the status, shard
+    #            and file tab separated; outputs the (output file, manifest entry) of every input of
+    #            the batch, in the order of the batch list, the output file resolved against the
+    #            working directory of its shard, see output_path().
+
+    lines = []
+    problems = 0
+    shards = {}
+    first = None
+    for manifest_file_text, manifest in manifests:
+        shard = manifest.get('shard')
+        status = None
+        if shard is None:
+            status = 'not a shard manifest'
+        elif first is None:
+            first = shard
+        if shard and (first is not shard):
+            batch = ('count', 'inputs', 'inputs_sha256', 'tool', 'version', 'parameters')
+            if [shard.get(key) for key in batch] != [first.get(key) for key in batch]:
+                status = 'other batch'
+            elif shard['index'] in shards:
+                status = 'duplicate shard'
+        if status:
+            problems += 1
+            lines.append(f"{status}\t{shard['index'] if shard else '.'}\t{manifest_file_text}")
+        else:
+            shards[shard['index']] = manifest
+
+    outputs = {}
+    if first is not None:
+        for index in range(1, first['count'] + 1):
+            if index not in shards:
+                problems += 1
+                lines.append(f"missing shard\t{index}\t{index}/{first['count']}")
+                continue
+            manifest = shards[index]
+            for position, output_file_text in manifest['shard']['outputs']:
+                entry = manifest['outputs'].get(output_file_text)
+                output_file_path = output_path(manifest['shard'], output_file_text)
+                status = output_check(manifest['shard'], entry, output_file_path)
+                if status:
+                    problems += 1
+                    lines.append(f"{status}\t{index}\t{output_file_text}")
+                outputs[position] = (output_file_path, entry)
+        if (not problems) and (sorted(outputs) != list(range(first['inputs']))):
+            problems += 1
+            lines.append(f"missing inputs\t.\t{first['inputs'] - len(outputs)} of {first['inputs']} inputs in no shard")
+
+    lines.append(f"{len(shards)} shards, {len(outputs)} outputs, {problems} problems")
+    return "\n".join(lines) + "\n", problems, [outputs[position] for position in sorted(outputs)]
+
+#
+#END of def verify_shards(manifests):
+#
+
+
+def join_maple_files(outputs, maple_fileout):
+
+    #  Writes the maple files of a batch, text or binary, one after the other into one text maple
+    #  file, atomically.  Text files are copied as they are, binary files are written as text.
+    #
+    #  Arguments:
+    #      outputs (list): (output file, manifest entry) from verify_shards(); an entry without an
+    #                      output file (a g.vcf without data lines) is left out.
+    #      maple_fileout (str): Path to the joined maple file.
+    #
+    #  Returns:
+    #     int: the number of maple files joined.
+
+    joined = 0
+    with maple_io.atomic_output(maple_fileout, 'wb') as fout:
+        for output_file_text, entry in outputs:
+            if entry.get('output_size') is None:
+                continue
+            with open(output_file_text, 'rb') as fin:
+                if maple_binary.is_maple_binary(output_file_text):
+                    for record in maple_binary.read_maple_binary(fin):
+                        fout.write(maple_io.format_maple_record(record).encode('utf-8'))
+                else:
+                    for block in iter(lambda: fin.read(COPY_BLOCK_SIZE), b''):
+                        fout.write(block)
+            joined += 1
+    return joined
+
+#
+#END of def join_maple_files(outputs, maple_fileout):
+#
+
+
+def process_arguments_shard(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: manifest_files, output_file.
+
+    parser = argparse.ArgumentParser(description='''Checks the shards of a batch written with --shard I/N and --manifest
+     by gvcf_to_maple_haploid.py -b or mask_maple.py -l.
+     Reads:
+      the manifest of every shard
+     Returns:
+      each shard missing and each output missing, changed or not written; exit code 1 if any
+      with -o, the maple files of the batch joined into one maple file''', formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('manifest_files',nargs='+',help='The manifests of the shards, one for each shard.')
+    parser.add_argument('-o','--output_file',help='Join the maple files of the batch, in the order of the batch list, into this text maple file;\nwritten only when every shard is complete.')
+    return parser.parse_args(argv)
+
+#
+#END of def process_arguments_shard(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_shard().
+    #
+    #  Returns:
+    #     int: exit code, 1 if a shard or output is missing or incomplete or a manifest cannot be read.
+
+    args = process_arguments_shard(argv)
+    manifests = []
+    try:
+        for manifest_file_text in args.manifest_files:
+            if not os.path.isfile(manifest_file_text):     # read_manifest() starts a new one
+                raise FileNotFoundError(manifest_file_text)
+            manifests.append((manifest_file_text, maple_manifest.read_manifest(manifest_file_text)))
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}")
+        return 1
+    except (ValueError, IOError) as e:
+        print(f"Error reading the file - {e}")
+        return 1
+
+    text, problems, outputs = verify_shards(manifests)
+    sys.stdout.write(text)
+    if problems:
+        return 1
+
+    if args.output_file:
+        try:
+            joined = join_maple_files(outputs, args.output_file)
+        except FileNotFoundError as e:
+            print(f"Error: The file was not found - {e}")
+            return 1
+        except (IOError, maple_binary.MapleFormatError) as e:
+            print(f"Error reading the file - {e}")
+            return 1
+        print(f"Joined {joined} maple files into {args.output_file}", file=sys.stderr)
+    return 0
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the manifests hold file times, they are kept out of out/
+rm -rf out manifests
+mkdir -p out/vcf out/maples out/masked manifests
+for sample in a b c d; do
+    cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/vcf/$sample.g.vcf
+done
+printf "out/vcf/a.g.vcf\nout/vcf/b.g.vcf\nout/vcf/c.g.vcf\nout/vcf/d.g.vcf\n" > out/vcf.list
+
+# two shards converted by two processes at once, checked and joined
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert_1.json --shard 1/2 2> out/convert_1.stderr &
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -b out/vcf.list -d out/maples --manifest manifests/convert_2.json --shard 2/2 2> out/convert_2.stderr &
+wait
+python3 ../../maple_shard.py manifests/convert_1.json manifests/convert_2.json -o out/all.maple > out/verify_convert.txt 2> out/join_convert.stderr
+
+# the shards checked and joined from another directory, the outputs read from the directory of the shards
+(cd manifests && python3 ../../../maple_shard.py convert_1.json convert_2.json -o all.maple > verify.txt 2> /dev/null)
+cmp out/verify_convert.txt manifests/verify.txt
+cmp out/all.maple manifests/all.maple
+
+# the maple files masked in two shards into binary maple files, joined as text
+printf "out/maples/a.maple\nout/maples/b.maple\nout/maples/c.maple\nout/maples/d.maple\n" > out/maple.list
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked --binary --manifest manifests/mask_1.json --shard 1/2 2> out/mask_1.stderr &
+python3 ../../../mask_maple/mask_maple.py -l out/maple.list -m mask.bed -c chrA -d out/masked --binary --manifest manifests/mask_2.json --shard 2/2 2> out/mask_2.stderr &
+wait
+python3 ../../maple_shard.py manifests/mask_1.json manifests/mask_2.json -o out/all_masked.maple > out/verify_mask.txt 2> out/join_mask.stderr
+
+# a missing shard and a damaged maple file are found, nothing is joined
+! python3 ../../maple_shard.py manifests/convert_1.json -o out/missing.maple > out/verify_missing.txt
+sed -i '$d' out/maples/d.maple
+! python3 ../../maple_shard.py manifests/convert_1.json manifests/convert_2.json -o out/damaged.maple > out/verify_damaged.txt
+
+rm -rf manifests out/vcf
+diff -r expected out
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# Program maple_worker.py
+# v 1.0
+#
+# A long running worker for gvcf_to_maple_haploid.py and mask_maple.py: the worker listens on a
+# local Unix socket and runs convert and mask jobs, each the command line of one input file, in a
+# pool of worker processes started once.  The scripts are imported, and the masking regions of
+# each .bed file read, once per worker process rather than once per sample, so a small sample
+# costs its own work only.  A client (submit) sends jobs and waits for the status and metrics of
+# each.
+#
+# Requests and replies are JSON objects, one per line:
+#
+#   {"op": "job", "id": 1, "tool": "convert", "args": [...], "cwd": "/data"}
+#       a job, tool 'convert' (gvcf_to_maple_haploid.py) or 'mask' (mask_maple.py), args its command
+#       line, run in the directory cwd; the reply, when the job is done, in any order:
+#       {"id": 1, "tool": "convert", "status": "ok" or "failed", "error": null or the message,
+#        "output": the file written, "pid": the worker process, "wait_seconds": the time queued,
+#        "metrics": the metrics of the file, see maple_metrics.py}
+#   {"op": "status"}  the replies {"status": "ok", "pid", "workers", "uptime_seconds", "jobs",
+#                     "pending", "failed"}
+#   {"op": "stop"}    stops the worker once the jobs sent are done
+#
+
+import io
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import socket
+import argparse
+import threading
+import contextlib
+import socketserver
+import multiprocessing
+
+# the scripts run by the jobs, maple_io.py for '-', maple_metrics.py writes the metrics of the jobs of a client
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gvcf_to_maple_haploid'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mask_maple'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_metrics'))
+import gvcf_to_maple_haploid
+import mask_maple
+import maple_io
+import maple_metrics
+
+# The tools of the jobs, and the script each runs
+TOOLS = {'convert': 'gvcf_to_maple_haploid', 'mask': 'mask_maple'}
+
+# The number of jobs queued or running at once, for each worker process; more jobs wait to be read
+QUEUE_PER_WORKER = 4
+
+# The masks loaded by a worker process, see mask_maple.load_mask()
+worker_mask_cache = {}
+
+
+def parse_job(tool, job_args):
+
+    #  Reads the command line of a job with the argument parser of its script; the masking regions
+    #  of -m come from the masks already loaded by the worker process.
+    #
+    #  Arguments:
+    #      tool (str): 'convert' or 'mask'.
+    #      job_args (list): the command line arguments of the script.
+    #
+    #  Returns:
+    #     argparse.Namespace: the arguments.
+    #
+    #  Raises:
+    #     ValueError: the arguments are not those of one input file, the message of the parser.
+
+    messages = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(messages):
+            if tool == 'convert':
+                args = gvcf_to_maple_haploid.process_arguments_vcf(job_args, worker_mask_cache)
+            else:
+                args = mask_maple.process_arguments_mask(job_args)
+    except SystemExit:
+        lines = messages.getvalue().strip().splitlines()
+        raise ValueError(lines[-1] if lines else f"cannot read the arguments of the {tool} job")
+
+    if tool == 'convert':
+        if not args.input_file or args.manifest or args.shard or args.sweep_summary:
+            raise ValueError("a convert job converts one file: -i, without --manifest, --shard or --sweep_summary")
+        stdio = maple_io.STDIO in (args.input_file, args.output)
+    else:
+        if not args.input_file or args.manifest or args.shard:
+            raise ValueError("a mask job masks one file: -i and -o, without --manifest or --shard")
+        stdio = maple_io.STDIO in (args.input_file, args.output_file)
+    if stdio:
+        raise ValueError(f"a {tool} job cannot read stdin or write stdout")
+    if args.metrics_json or args.profile or args.verbose:
+        raise ValueError("the metrics of a job are in its reply, not with --metrics_json, --profile or -v")
+    return args
+
+#
+#END of def parse_job(tool, job_args):
+#
+
+
+def run_job(job):
+
+    #  Runs one job in a worker process, errors are returned rather than raised so that one bad
+    #  job does not stop the worker.
+    #
+    #  Arguments:
+    #      job (dict): the job request, see the head of this file, with 'received' the time it was read.
+    #
+    #  Returns:
+    #     dict: the reply, see the head of this file.
+
+    reply = {'id': job.get('id'), 'tool': job.get('tool'), 'status': 'failed', 'error': None, 'output': None,
+             'pid': os.getpid(), 'wait_seconds': round(max(time.time() - job.get('received', time.time()), 0.0), 6),
+             'metrics': None}
+    tool = job.get('tool')
+    try:
+        if tool not in TOOLS:
+            raise ValueError(f"unknown tool '{tool}', not one of {', '.join(TOOLS)}")
+        os.chdir(job.get('cwd') or '/')     # a worker process runs one job at a time
+        args = parse_job(tool, [str(arg) for arg in job.get('args', [])])
+        if tool == 'convert':
+            gvcf_to_maple_haploid.init_convert_worker(gvcf_to_maple_haploid.convert_options(args), True)
+            vcf_file_path, maple_fileout, error, metrics = gvcf_to_maple_haploid.convert_batch_file(args.input_file)
+        else:
+            mask = mask_maple.load_mask(mask_maple.mask_bed_file(args), args.contig, args.contig_map, worker_mask_cache)
+            mask_maple.init_mask_worker(mask, None, args.engine, args.binary, True, args.qc, args.normalize)
+            maple_file_path, error, metrics = mask_maple.mask_output_file((args.input_file, args.output_file))
+            maple_fileout = None if error else args.output_file
+    except FileNotFoundError as e:
+        reply['error'] = f"Error: The file was not found - {e}"
+    except IOError as e:
+        reply['error'] = f"Error reading the file - {e}"
+    except ValueError as e:
+        reply['error'] = str(e)
+    else:
+        reply.update({'status': 'failed' if error else 'ok', 'error': error, 'output': maple_fileout,
+                      'metrics': metrics})
+    return reply
+
+#
+#END of def run_job(job):
+#
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    #  The Unix socket server of the worker: a thread for each client, the jobs run in the pool
+    #  of worker processes.
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool, workers):
+        super().__init__(socket_path, WorkerHandler)
+        self.pool = pool
+        self.workers = workers
+        self.slots = threading.BoundedSemaphore(workers * QUEUE_PER_WORKER)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counts = {'jobs': 0, 'pending': 0, 'failed': 0}
+
+    def status(self):
+        with self.lock:
+            return dict(self.counts, status='ok', pid=os.getpid(), workers=self.workers,
+                        uptime_seconds=round(time.time() - self.started, 3))
+
+#
+#END of class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+#
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+
+    #  Reads the requests of one client, a line each, and replies to each job as it is done.  The
+    #  jobs of a client run concurrently; a client sending more jobs than the queue holds waits.
+
+    def handle(self):
+        server = self.server
+        write_lock = threading.Lock()
+        pending = []
+
+        def reply(message):
+            with write_lock:
+                try:
+                    self.wfile.write((json.dumps(message) + "\n").encode('utf-8'))
+                    self.wfile.flush()
+                except OSError:     # the client is gone, its jobs still run
+                    pass
+
+        def job_done(result):
+            with server.lock:
+                server.counts['pending'] -= 1
+                if result['status'] != 'ok':
+                    server.counts['failed'] += 1
+            server.slots.release()
+            reply(result)
+
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+            except (ValueError, AttributeError):
+                reply({'status': 'failed', 'error': "the request is not a JSON object"})
+                continue
+            if op == 'job':
+                server.slots.acquire()
+                with server.lock:
+                    server.counts['jobs'] += 1
+                    server.counts['pending'] += 1
+                job = dict(request, received=time.time())
+                failed = {'id': job.get('id'), 'tool': job.get('tool'), 'status': 'failed', 'metrics': None}
+                try:
+                    pending.append(server.pool.apply_async(
+                        run_job, (job,), callback=job_done,
+                        error_callback=lambda e, failed=failed: job_done(dict(failed, error=f"An error occurred: {e!r}"))))
+                except ValueError:      # the pool is closed, the worker is stopping
+                    job_done(dict(failed, error="the worker is stopping"))
+            elif op == 'status':
+                reply(server.status())
+            elif op == 'stop':
+                reply({'status': 'stopping'})
+                threading.Thread(target=server.shutdown).start()
+            else:
+                reply({'status': 'failed', 'error': f"unknown op '{op}'"})
+
+        for result in pending:
+            result.wait()
+
+#
+#END of class WorkerHandler(socketserver.StreamRequestHandler):
+#
+
+
+def serve(socket_path, workers):
+
+    #  Runs the worker until it is stopped (the stop request, SIGTERM or SIGINT); the jobs sent
+    #  are done before it returns.
+    #
+    #  Arguments:
+    #      socket_path (str): Path to the Unix socket, replaced if a stopped worker left it.
+    #      workers (int): the number of worker processes running jobs at once.
+    #
+    #  Raises:
+    #     OSError: the socket cannot be made, e.g. a worker is listening on it already.
+
+    if os.path.exists(socket_path):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            if sock.connect_ex(socket_path) == 0:
+                raise OSError(f"a worker is already listening on {socket_path}")
+        os.remove(socket_path)
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        server = WorkerServer(socket_path, pool, workers)
+    except OSError:
+        pool.terminate()
+        raise
+    os.chmod(socket_path, 0o600)
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signal_number, lambda number, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Listening on {socket_path} with {workers} worker processes", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+        pool.close()
+        pool.join()
+    status = server.status()
+    print(f"Stopped, {status['jobs']} jobs run, {status['failed']} failed", file=sys.stderr)
+
+#
+#END of def serve(socket_path, workers):
+#
+
+
+def send_requests(socket_path, requests):
+
+    #  Sends requests to the worker and reads the replies, while the requests are still being
+    #  sent so that neither side waits on the other.
+    #
+    #  Arguments:
+    #      socket_path (str): Path to the Unix socket of the worker.
+    #      requests (list): the requests, see the head of this file.
+    #
+    #  Yields:
+    #     dict: each reply, as it comes.
+    #
+    #  Raises:
+    #     OSError: no worker is listening on the socket.
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+
+        def send():
+            try:
+                for request in requests:
+                    sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:         # the worker stopped, reading the replies ends
+                pass
+
+        sender = threading.Thread(target=send, daemon=True)
+        sender.start()
+        with sock.makefile('rb') as fin:
+            for line in fin:
+                yield json.loads(line)
+        sender.join()
+
+#
+#END of def send_requests(socket_path, requests):
+#
+
+
+def submit_jobs(socket_path, jobs, cwd=None):
+
+    #  Sends jobs to the worker and waits for them.
+    #
+    #  Arguments:
+    #      socket_path (str): Path to the Unix socket of the worker.
+    #      jobs (list): (tool, command line arguments) of each job.
+    #      cwd (str): the directory the paths of the jobs are relative to, default the current one.
+    #
+    #  Returns:
+    #     list: the reply to each job, in the order of jobs.
+
+    cwd = cwd or os.getcwd()
+    requests = [{'op': 'job', 'id': position, 'tool': tool, 'args': list(job_args), 'cwd': cwd}
+                for position, (tool, job_args) in enumerate(jobs)]
+    replies = [None] * len(jobs)
+    for reply in send_requests(socket_path, requests):
+        if isinstance(reply.get('id'), int) and (0 <= reply['id'] < len(jobs)):
+            replies[reply['id']] = reply
+    return [reply or {'id': position, 'tool': tool, 'status': 'failed', 'error': "no reply from the worker",
+                      'metrics': None}
+            for position, ((tool, job_args), reply) in enumerate(zip(jobs, replies))]
+
+#
+#END of def submit_jobs(socket_path, jobs, cwd=None):
+#
+
+
+def read_jobs(jobs_file_text):
+
+    #  Reads a file of jobs, one per line: the tool, convert or mask, then its command line
+    #  arguments as in a shell; blank lines and lines starting with '#' are ignored.
+    #
+    #  Returns:
+    #     list: (tool, command line arguments) of each job.
+
+    jobs = []
+    with open(jobs_file_text, 'r') as fin:
+        for line in fin:
+            if line.strip() and not line.startswith('#'):
+                words = shlex.split(line)
+                jobs.append((words[0], words[1:]))
+    return jobs
+
+#
+#END of def read_jobs(jobs_file_text):
+#
+
+
+def format_reply(reply, job_args):
+
+    #  Returns the reply to a job as a line of text: the status, tool, input file and output file,
+    #  the seconds of the job or the error, tab separated.
+
+    metrics = reply.get('metrics') or {}
+    input_file_text = metrics.get('input')
+    if input_file_text is None:
+        input_file_text = next((job_args[position + 1] for position, arg in enumerate(job_args[:-1])
+                                if arg in ('-i', '--input_file')), '.')
+    status = 'ok' if reply.get('status') == 'ok' else 'FAILED'
+    detail = reply['error'] if reply.get('error') else f"{metrics.get('seconds', 0):.3f}s"
+    return f"{status}\t{reply.get('tool')}\t{input_file_text}\t{reply.get('output') or '.'}\t{detail}"
+
+#
+#END of def format_reply(reply, job_args):
+#
+
+
+def process_arguments_worker(argv=None):
+
+    #  Reads the command line arguments.
+    #
+    #  Returns:
+    #     argparse.Namespace: command, socket, and workers for serve, jobs_file, metrics_json and job
+    #                         for submit.
+
+    parser = argparse.ArgumentParser(description='''A long running worker running gvcf_to_maple_haploid.py (convert) and
+     mask_maple.py (mask) jobs sent over a local Unix socket, and its client.
+      serve: run the worker
+      submit: send jobs and wait for them; prints, for each job, the status, tool, input file, output
+              file and seconds or error, tab separated; exit code 1 if any job failed
+      status: print the status of the worker, as JSON
+      stop: stop the worker once the jobs sent are done''', formatter_class=argparse.RawTextHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='Run the worker.')
+    serve_parser.add_argument('-j','--jobs',dest='workers',type=int,default=1,help='The number of worker processes running jobs at once; default 1.')
+    submit_parser = commands.add_parser('submit', help='Send jobs and wait for them.',
+                                        formatter_class=argparse.RawTextHelpFormatter)
+    submit_parser.add_argument('-f','--jobs_file',help='A file of jobs, one per line: convert or mask, then the command line of\ngvcf_to_maple_haploid.py -i or mask_maple.py -i, e.g. convert -i SRR21943188.g.vcf.gz -d maples')
+    submit_parser.add_argument('--metrics_json',help='Write the metrics of the jobs to this JSON file, see maple_metrics.py.')
+    submit_parser.add_argument('job',nargs=argparse.REMAINDER,help='One job, convert or mask then its command line.')
+    status_parser = commands.add_parser('status', help='Print the status of the worker.')
+    stop_parser = commands.add_parser('stop', help='Stop the worker.')
+    for command_parser in (serve_parser, submit_parser, status_parser, stop_parser):
+        command_parser.add_argument('-s','--socket',required=True,help='The Unix socket of the worker, e.g. /tmp/maple_worker.sock.')
+    args = parser.parse_args(argv)
+
+    if (args.command == 'serve') and (args.workers < 1):
+        serve_parser.error("-j/--jobs must be at least 1")
+    if args.command == 'submit':
+        if not (args.jobs_file or args.job):
+            submit_parser.error("give a job, or -f/--jobs_file")
+        if args.job and (args.job[0] not in TOOLS):
+            submit_parser.error(f"a job starts with its tool, one of {', '.join(TOOLS)}")
+    return args
+
+#
+#END of def process_arguments_worker(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool, see process_arguments_worker().
+    #
+    #  Returns:
+    #     int: exit code, 1 if a job failed or the worker cannot be reached.
+
+    args = process_arguments_worker(argv)
+    try:
+        if args.command == 'serve':
+            serve(args.socket, args.workers)
+            return 0
+
+        if args.command in ('status', 'stop'):
+            for reply in send_requests(args.socket, [{'op': args.command}]):
+                print(json.dumps(reply))
+            return 0
+
+        start = time.perf_counter()
+        jobs = read_jobs(args.jobs_file) if args.jobs_file else []
+        if args.job:
+            jobs.append((args.job[0], args.job[1:]))
+        replies = submit_jobs(args.socket, jobs)
+    except FileNotFoundError as e:
+        print(f"Error: The file was not found - {e}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error reading the file - {e}", file=sys.stderr)
+        return 1
+
+    for (tool, job_args), reply in zip(jobs, replies):
+        print(format_reply(reply, job_args))
+    if args.metrics_json:
+        maple_metrics.write_metrics_json(args.metrics_json, 'maple_worker',
+                                         [reply['metrics'] for reply in replies if reply.get('metrics')],
+                                         time.perf_counter() - start, argv)
+    return 1 if any(reply.get('status') != 'ok' for reply in replies) else 0
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+#!/bin/bash
+set -beu -o pipefail
+
+# the worker socket and the maple files written by the scripts themselves are kept out of out/
+rm -rf out direct worker.sock
+mkdir -p out/vcf out/maples out/masked direct
+for sample in a b c; do
+    cp ../../../gvcf_to_maple_haploid/test_files/test_1/small.g.vcf out/vcf/$sample.g.vcf
+done
+
+python3 ../../maple_worker.py serve -s worker.sock -j 2 2> out/serve.stderr &
+worker=$!
+trap 'kill $worker 2> /dev/null || true' EXIT
+for attempt in $(seq 50); do
+    [ -S worker.sock ] && break
+    sleep 0.1
+done
+
+# jobs from a file run concurrently, the seconds of each job left out
+cat > out/jobs.txt <<JOBS
+convert -i out/vcf/a.g.vcf -d out/maples -m mask.bed --mask_contig chrA --qc
+convert -i out/vcf/b.g.vcf -d out/maples -e numpy -n
+convert -i out/vcf/c.g.vcf -d out/maples --binary
+convert -i out/vcf/missing.g.vcf -d out/maples
+convert -b 'out/vcf/*.g.vcf' -d out/maples
+mask -i out/maples/b.maple -m missing.bed -o out/masked/b.maple
+JOBS
+if python3 ../../maple_worker.py submit -s worker.sock -f out/jobs.txt > out/submit.txt; then
+    echo "failed jobs were reported as done"
+    exit 1
+fi
+sed -i 's/\t[0-9.]*s$//' out/submit.txt
+
+# one job from the command line, run from another directory, masking a maple file of the jobs above
+(cd out && python3 ../../../maple_worker.py submit -s ../worker.sock mask -i maples/c.mapleb -m ../mask.bed -c chrA -o masked/c.maple) \
+    | sed 's/\t[0-9.]*s$//' > out/submit_one.txt
+
+python3 ../../maple_worker.py status -s worker.sock | sed 's/"pid": [0-9]*/"pid": 0/; s/"uptime_seconds": [0-9.]*/"uptime_seconds": 0/' > out/status.txt
+python3 ../../maple_worker.py stop -s worker.sock > out/stop.txt
+wait $worker
+trap - EXIT
+
+# the same maple files as the scripts write themselves
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/a.g.vcf -d direct -m mask.bed --mask_contig chrA --qc > /dev/null
+python3 ../../../gvcf_to_maple_haploid/gvcf_to_maple_haploid.py -i out/vcf/b.g.vcf -d direct -e numpy -n > /dev/null 2>&1
+cmp direct/a.maple out/maples/a.maple
+cmp direct/b.maple out/maples/b.maple
+rm -rf direct
+
+rm -rf out/vcf
+diff -r expected out
@@ -64,11 +64,1437 @@
 #    S----------E    Do not print, mask this position                                                  
 #        *
 
+import io
 import sys
 import os
+import mmap
+import time
 import argparse
+import multiprocessing
 
-def process_arguments_mask():
+# maple_io.py opens the files, maple_binary.py reads and writes binary maple files, maple_metrics.py is used for --metrics_json and --profile,
+# maple_manifest.py for --manifest, maple_shard.py for --shard, maple_qc.py for --qc, maple_normalize.py for
+# --normalize
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_io'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_binary'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_metrics'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_manifest'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_shard'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_qc'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'maple_normalize'))
+import maple_io
+import maple_binary
+import maple_metrics
+import maple_manifest
+import maple_shard
+import maple_qc
+import maple_normalize
+
+try:
+    import numpy as np
+except ImportError:     # numpy is only needed for -e numpy
+    np = None
+
+# Size of the chunks of a text maple file masked at once by the numpy engine
+MASK_CHUNK_SIZE = 1 << 22
+
+# The first step, in bytes, of the search for the records near a masking region by the mmap engine
+MMAP_STEP = 64
+
+# The version of the masked maple files written, recorded in manifests (--manifest); to be changed with
+# any change to the masked maple files written, so that every masked file of an earlier version is written again
+VERSION = "3.0"
+
+# The maple headers of the process that matched no .bed chromosome, warned about once each, see mask_contig()
+unmatched_headers = set()
+
+
+def read_mask_index(fbedin):
+
+    #  Reads the masking regions of a .bed file into an index by chromosome (the first column).
+    #
+    #  Arguments:
+    #      fbedin (file): the open .bed file.
+    #
+    #  Returns:
+    #     dict: for each chromosome, (starts, ends) lists of the masking regions sorted by position.
+    #           The .bed start is zero-based, so 1 is added to it; the .bed end is half-open, so it
+    #           is the last masked position.
+
+    mask_index = {}
+    for region in fbedin:
+        if (not region.strip()) or region.startswith(('#', 'track', 'browser')):
+            continue
+        positions = region.strip().split('\t')  # split the line into columns
+        if len(positions) >= 3:
+            mask_index.setdefault(positions[0], []).append((int(positions[1])+1, int(positions[2])))
+        else:
+            print(f"Error in format of contents of mask file, no tabs? - {region.strip()}")
+
+    for chromosome, regions in mask_index.items():
+        regions.sort()
+        mask_index[chromosome] = ([region[0] for region in regions], [region[1] for region in regions])
+    return mask_index
+
+#
+#END of def read_mask_index(fbedin):
+#
+
+
+def read_contig_map(contig_map_text):
+
+    #  Reads a file mapping maple headers to .bed chromosomes, two tab separated columns:
+    #  a maple header (without the '>') or a chromosome number, and the .bed chromosome.
+    #  The chromosome number is the number after the last '_' of a header written by
+    #  gvcf_to_maple_haploid.py, e.g. 2 for '>SRR28075668_2'.
+    #
+    #  Arguments:
+    #      contig_map_text (str): Path to the contig map file.
+    #
+    #  Returns:
+    #     dict: .bed chromosome for each header or chromosome number.
+
+    contig_map = {}
+    with open(contig_map_text, 'r') as fmapin:
+        for line in fmapin:
+            columns = line.strip().split('\t')
+            if (len(columns) >= 2) and not line.startswith('#'):
+                contig_map[columns[0]] = columns[1]
+    return contig_map
+
+#
+#END of def read_contig_map(contig_map_text):
+#
+
+
+def make_mask(mask_index, contig=None, contig_map=None):
+
+    #  Makes the masking regions used by mask_maple_records() from an index of regions, e.g. to
+    #  mask with regions that are not read from a .bed file.  The mask can be shared by any
+    #  number of maple files, and of processes.
+    #
+    #  Arguments:
+    #      mask_index (dict): for each chromosome, (starts, ends) lists of the masking regions sorted
+    #                         by start, 1-based and inclusive, as from read_mask_index().
+    #      contig (str): chromosome of mask_index to use for every maple header, None to pick by header.
+    #      contig_map (dict): chromosome of mask_index for each maple header or chromosome number,
+    #                         see read_contig_map(), or None.
+    #
+    #  Returns:
+    #     dict: 'index', 'contig' and 'contig_map'.  A copy of the mask can add 'chromosomes', the
+    #           chromosome of mask_index of each maple header, e.g. the g.vcf CHROM of each header
+    #           of gvcf_to_maple_haploid.py, tried first, see mask_contig().
+
+    return {'index': mask_index, 'contig': contig, 'contig_map': contig_map or {}}
+
+#
+#END of def make_mask(mask_index, contig=None, contig_map=None):
+#
+
+
+def load_mask(mask_file_text, contig=None, contig_map_text=None, cache=None):
+
+    #  Loads everything needed to mask maple files, once per run.
+    #
+    #  Arguments:
+    #      mask_file_text (str): Path to the .bed file of masking regions.
+    #      contig (str): .bed chromosome to use for every maple header, None to pick by header.
+    #      contig_map_text (str): Path to a contig map file, see read_contig_map(), or None.
+    #      cache (dict): the masks already loaded, e.g. by a long running worker (maple_worker.py),
+    #                    reused while the .bed file and contig map keep their size and modification
+    #                    time; None to always read the files.
+    #
+    #  Returns:
+    #     dict: from make_mask().
+
+    if cache is not None:
+        key = (contig,) + tuple((os.path.abspath(file_text), os.stat(file_text).st_size, os.stat(file_text).st_mtime_ns)
+                                for file_text in (mask_file_text, contig_map_text) if file_text)
+        if key not in cache:
+            cache[key] = load_mask(mask_file_text, contig, contig_map_text)
+        return cache[key]
+
+    with open(mask_file_text, 'r') as fbedin:
+        mask_index = read_mask_index(fbedin)
+    contig_map = read_contig_map(contig_map_text) if contig_map_text else {}
+    return make_mask(mask_index, contig, contig_map)
+
+#
+#END of def load_mask(mask_file_text, contig=None, contig_map_text=None, cache=None):
+#
+
+
+def mask_contig(header_text, mask):
+
+    #  Picks the .bed chromosome used to mask the records following a maple header.
+    #  In order: the chromosome given with -c, the chromosome of the header given with the
+    #  mask (the g.vcf CHROM when converting) if the .bed file has it, the header or its
+    #  chromosome number in the contig map, a chromosome named as the header (up to the first '|', '/' or space),
+    #  or the only chromosome of a single chromosome .bed file for a maple file of at most
+    #  one header (see single_header_mask()).  A header matching no chromosome is warned
+    #  about on stderr, once, and its records are not masked.
+    #
+    #  Arguments:
+    #      header_text (str): the header without the '>', None before the first header.
+    #      mask (dict): from load_mask(), or single_header_mask().
+    #
+    #  Returns:
+    #     str: the .bed chromosome, or None if no masking regions apply.
+
+    if mask['contig']:
+        return mask['contig']
+
+    if header_text is not None:
+        chromosome = mask.get('chromosomes', {}).get(header_text)
+        if chromosome in mask['index']:
+            return chromosome
+        if header_text in mask['contig_map']:
+            return mask['contig_map'][header_text]
+        chromosome_number = header_text.rsplit('_', 1)[-1]
+        if chromosome_number in mask['contig_map']:
+            return mask['contig_map'][chromosome_number]
+        name = header_text.replace('|', ' ').replace('/', ' ').split(' ')[0]
+        if name in mask['index']:
+            return name
+
+    if mask.get('single_header') and (len(mask['index']) == 1):
+        return next(iter(mask['index']))
+    if mask['index'] and (header_text is not None) and (header_text not in unmatched_headers):
+        unmatched_headers.add(header_text)
+        print(f"Warning: maple header '>{header_text}' matches no chromosome of the .bed file, not masked;"
+              f" give the chromosome with -c or a contig map with -C", file=sys.stderr)
+    return None
+
+#
+#END of def mask_contig(header_text, mask):
+#
+
+
+def maple_header_count(maple_file_path, limit=2):
+
+    #  Counts the '>' headers of a maple file, text or binary, up to limit: a text file is
+    #  searched for the headers without being parsed, only the block headers of a binary file
+    #  are read.
+    #
+    #  Returns:
+    #     int: the number of headers, at most limit.
+
+    headers = 0
+    with open(maple_file_path, 'rb') as fin:
+        if maple_binary.is_maple_binary(maple_file_path):
+            maple_binary.check_file_header(fin.read(maple_binary.FILE_HEADER.size))
+            while headers < limit:
+                block = maple_binary.read_block_header(fin)
+                if block is None:
+                    break
+                header_text, count = block
+                headers += header_text is not None
+                fin.seek(count + len(maple_binary.padding(count)) + 8 * count, os.SEEK_CUR)
+            return headers
+        if os.fstat(fin.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0 if data[:1] == b'>' else data.find(b'\n>')
+            while (offset >= 0) and (headers < limit):
+                headers += 1
+                offset = data.find(b'\n>', offset + 1)
+    return headers
+
+#
+#END of def maple_header_count(maple_file_path, limit=2):
+#
+
+
+def single_header_mask(mask, maple_file_path):
+
+    #  Returns the mask for one maple file: a .bed file of a single chromosome, without -c, masks
+    #  a maple file of at most one header with that chromosome, whatever the header.  A maple file
+    #  of several headers, or read from stdin, needs the chromosome of each header, see mask_contig().
+
+    if (not mask['contig']) and (len(mask['index']) == 1) and (maple_file_path != maple_io.STDIO) \
+            and (maple_header_count(maple_file_path) <= 1):
+        return dict(mask, single_header=True)
+    return mask
+
+#
+#END of def single_header_mask(mask, maple_file_path):
+#
+
+
+def read_maple_records(fin):
+
+    #  Reads the records of a .maple file.
+    #
+    #  Arguments:
+    #      fin (file): the open .maple file.
+    #
+    #  Yields:
+    #     tuple: (if_n, location, extension, aline) - if_n is '>' for a header line, otherwise the
+    #            type of base '-','n','A','C','G' or 'T'; location is the sequence position;
+    #            extension is the number of positions of an 'n' or '-' run, 0 for a base;
+    #            aline is the line as read from the file.
+
+    for aline in fin:
+        if aline.startswith('>'):
+            yield ('>', aline[1:].rstrip('\n'), 0, aline)
+            continue
+
+        columns = aline.strip().split('\t') # split the line into columns, may be two or three columns
+        if len(columns) >= 2:
+            if_n = columns[0]                   # if_n is type of base '-','n','A','C','G' or 'T'
+            extension = 0                       # extension is > 0 only if base is 'n' or '-' then 'n' or '-' can span
+            if (if_n == 'n') or (if_n == '-'):  # more than one position '-', 'n' spans can span a masking region
+                extension = int(columns[2])
+            yield (if_n, int(columns[1]), extension, aline)
+        else:
+            print(f"Error in format of contents of maple file, no tabs? - {aline.strip()}")
+
+#
+#END of def read_maple_records(fin):
+#
+
+
+def mask_maple_records(records, mask, mask_stats=None, header_stats=None):
+
+    #  Masks maple records, see the algorithm at the top of this file.  Records outside every
+    #  masking region are yielded unchanged, an 'n' or '-' run overlapping a masking region is
+    #  cut down to 'n' runs of the positions outside of the masking region.  At each header the
+    #  masking regions of its chromosome are picked, see mask_contig(), and searched from the start.
+    #
+    #  For use from Python, e.g. to mask the maple records of a sample with a mask loaded once:
+    #
+    #      mask = load_mask('fasTAN.bed')
+    #      with open('SRR21943188.maple') as fin:
+    #          for record in mask_maple_records(read_maple_records(fin), mask):
+    #              fout.write(maple_io.format_maple_record(record))
+    #
+    #  Arguments:
+    #      records (iterator of tuple): (base, location, extension, ...) maple records sorted by
+    #                                   location, base is '>' for a header.
+    #      mask (dict): masking regions from load_mask() or make_mask().
+    #      mask_stats (dict): counts the records 'kept', 'dropped' and 'trimmed' (cut down to the
+    #                         positions outside of the masking region), and the 'bases_masked',
+    #                         when all records are read.
+    #      header_stats (dict): counts the records 'dropped' and the 'bases_masked' of each header,
+    #                           {header_text: {'dropped': ..., 'bases_masked': ...}}, '' for the
+    #                           records before the first header; for the QC summary, see maple_qc.py.
+    #
+    #  Yields:
+    #     tuple: the masked maple records.
+
+    kept = dropped = trimmed = bases_masked = 0
+    header_text, header_dropped, header_masked = '', 0, 0      # the counts at the last header
+
+    def add_header_stats():
+        if header_text or (dropped, bases_masked) != (header_dropped, header_masked):
+            stats = header_stats.setdefault(header_text, {'dropped': 0, 'bases_masked': 0})
+            stats['dropped'] += dropped - header_dropped
+            stats['bases_masked'] += bases_masked - header_masked
+
+    def first_region(header_text):
+        starts, ends = mask['index'].get(mask_contig(header_text, mask), ([], []))
+        regions = zip(starts, ends)
+        return regions, next(regions, None)
+
+    regions, region = first_region(None)
+    if region:
+        start_pos, end_pos = region
+
+    for record in records:
+
+        # if at the header line, write to output masked file and start again with the regions of its chromosome
+        if record[0] == '>':
+            if header_stats is not None:
+                add_header_stats()
+                header_text, header_dropped, header_masked = record[1], dropped, bases_masked
+            yield record
+            regions, region = first_region(record[1])
+            if region:
+                start_pos, end_pos = region
+            continue
+
+        location = record[1]                # location is the sequence position of the edit
+        extension = record[2]               # extension is > 0 only if base is 'n' or '-'
+
+        # if location in the maple file is > the end_position of the current region, then read next masking region
+        while region and (location > end_pos):
+            region = next(regions, None)
+            if region:
+                start_pos, end_pos = region
+
+        if (extension > 0) and region:
+            #  if (start_pos <= location) and (end_pos < location+extension) and (end_pos >= location):
+            #    S----------E    'n's or '-'s after of masking region are not masked
+            #             *++++
+            if (start_pos <= location) and (end_pos < location+extension) and (end_pos >= location):
+                to_length = location+extension-end_pos-1
+                if to_length > 0:
+                    trimmed += 1
+                    bases_masked += extension - to_length
+                    yield ('n', end_pos+1, to_length)
+                else:
+                    dropped += 1
+                    bases_masked += extension
+
+            #  if (start_pos >= location+extension):
+            #        S----------E   'n's or '-'s prior to masking region are not masked
+            # *++++
+            elif (start_pos >= location+extension):
+                kept += 1
+                yield record
+
+            #  if (start_pos > location) and (start_pos < location+extension) and (end_pos > location+extension):
+            #    S----------E    'n's or '-'s prior to masking region are not masked
+            # *++++
+            elif (start_pos > location) and (start_pos < location+extension) and (end_pos > location+extension):
+                trimmed += 1
+                bases_masked += extension - (start_pos-location)
+                yield ('n', location, start_pos-location)
+
+            #  if (start_pos > location) and (start_pos < location+extension) and (end_pos < location+extension):
+            #    S----------E    'n's or '-'s prior to and after masking region are not masked
+            #  *+++++++++++++++
+            elif (start_pos > location) and (start_pos < location+extension) and (end_pos < location+extension):
+                trimmed += 1
+                bases_masked += extension - (start_pos-location)
+                yield ('n', location, start_pos-location)
+                to_length = location+extension-end_pos-1
+                if to_length > 0:
+                    bases_masked -= to_length
+                    yield ('n', end_pos+1, to_length)
+
+            else:
+                dropped += 1
+                bases_masked += extension
+
+        elif (extension == 0) and region:  # if the extension ==  0
+
+            #  if (end_pos < location)
+            #    S----------E    Do not mask this position
+            #                    *
+            #  if (start_pos > location)
+            #    S----------E    Do not mask this position
+            #  *
+            if (start_pos > location) or (end_pos < location):
+                kept += 1
+                yield record
+            else:
+                dropped += 1
+                bases_masked += 1
+
+        else:
+            kept += 1
+            yield record
+
+    if mask_stats is not None:
+        add_mask_stats(mask_stats, kept, dropped, trimmed, bases_masked)
+    if header_stats is not None:
+        add_header_stats()
+
+#
+#END of def mask_maple_records(records, mask, mask_stats=None, header_stats=None):
+#
+
+
+def add_mask_stats(mask_stats, kept, dropped, trimmed, bases_masked):
+
+    #  Adds record and base counts to the mask statistics, see mask_maple_records().
+
+    for key, value in (('kept', kept), ('dropped', dropped), ('trimmed', trimmed), ('bases_masked', bases_masked)):
+        mask_stats[key] = mask_stats.get(key, 0) + int(value)
+
+#
+#END of def add_mask_stats(mask_stats, kept, dropped, trimmed, bases_masked):
+#
+
+
+def mask_arrays(mask, chromosome):
+
+    #  Returns the masking regions of a chromosome as NumPy arrays, converted once per
+    #  chromosome and kept in the mask.
+    #
+    #  Arguments:
+    #      mask (dict): masking regions from load_mask().
+    #      chromosome (str): the .bed chromosome, from mask_contig().
+    #
+    #  Returns:
+    #     tuple: (starts, ends) int64 arrays sorted by start, empty if no regions apply.  ends is
+    #            None if the ends are not sorted too (a region inside another region), the numpy
+    #            engine cannot mask with these regions.
+
+    arrays = mask.setdefault('arrays', {})
+    if chromosome not in arrays:
+        starts, ends = mask['index'].get(chromosome, ([], []))
+        starts = np.array(starts, dtype=np.int64)
+        ends = np.array(ends, dtype=np.int64)
+        arrays[chromosome] = (starts, None if (np.diff(ends) < 0).any() else ends)
+    return arrays[chromosome]
+
+#
+#END of def mask_arrays(mask, chromosome):
+#
+
+
+def mask_maple_arrays(locations, extensions, region_starts, region_ends, mask_stats=None):
+
+    #  Classifies maple records following one header with the rules of mask_maple_records(), all
+    #  records at once.  The region of each record is the first region ending at or after it, never
+    #  moving back, found with searchsorted() on the region ends.
+    #
+    #  Arguments:
+    #      locations (numpy array): the record positions.
+    #      extensions (numpy array): the run lengths of 'n' and '-' records, 0 for a base.
+    #      region_starts, region_ends (numpy array): the masking regions from mask_arrays(), not empty.
+    #      mask_stats (dict): counts the records and bases masked, see mask_maple_records().
+    #
+    #  Returns:
+    #     tuple: (keep, head, tail, S, E) - keep is True for a record written unchanged; a record
+    #            that is not kept is dropped, or replaced by an 'n' run at its location of length S-L
+    #            when head is True and/or an 'n' run at E+1 up to the end of the record when tail
+    #            is True.  S and E are the start and end of the region of each record.
+
+    L = locations.astype(np.int64)
+    X = extensions.astype(np.int64)
+    cursor = np.maximum.accumulate(np.searchsorted(region_ends, L, side='left'))
+    in_regions = cursor < region_ends.size
+    cursor = np.minimum(cursor, region_ends.size - 1)
+    S = region_starts[cursor]
+    E = region_ends[cursor]
+    LX = L + X
+
+    trim_left = (X > 0) & (S <= L) & (E < LX) & (E >= L)
+    before = (X > 0) & ~trim_left & (S >= LX)
+    inside = (X > 0) & ~trim_left & ~before & (S > L) & (S < LX)
+    trim_right = inside & (E > LX)
+    split = inside & (E < LX)
+    keep = ~in_regions | before | (X < 0) | ((X == 0) & ((S > L) | (E < L)))
+
+    head = ~keep & (trim_right | split)
+    tail = ~keep & (trim_left | split) & (LX - E - 1 > 0)
+
+    if mask_stats is not None:
+        masked = ~keep
+        cut = head | tail
+        bases_masked = (np.where(X > 0, X, 1)[masked].sum() - (S - L)[head].sum() - (LX - E - 1)[tail].sum())
+        add_mask_stats(mask_stats, np.count_nonzero(keep), np.count_nonzero(masked & ~cut),
+                       np.count_nonzero(cut), bases_masked)
+    return keep, head, tail, S, E
+
+#
+#END of def mask_maple_arrays(locations, extensions, region_starts, region_ends, mask_stats=None):
+#
+
+
+def mask_maple_block(header_text, types, positions, lengths, mask, mask_stats=None):
+
+    #  The numpy engine for the records of one sample of a binary maple file, see mask_maple_arrays().
+    #
+    #  Arguments:
+    #      header_text (str): the header without the '>', None for records before the first header.
+    #      types, positions, lengths (numpy array): the records, from maple_binary.read_maple_blocks().
+    #      mask (dict): masking regions from load_mask().
+    #      mask_stats (dict): counts the records and bases masked, see mask_maple_records().
+    #
+    #  Returns:
+    #     tuple: (types, positions, lengths) of the masked records, None if the masking regions
+    #            nest, see mask_arrays().
+
+    region_starts, region_ends = mask_arrays(mask, mask_contig(header_text, mask))
+    if region_ends is None:
+        return None
+    if (types.size == 0) or (region_ends.size == 0):
+        if mask_stats is not None:
+            add_mask_stats(mask_stats, types.size, 0, 0, 0)
+        return types, positions, lengths
+
+    is_run = (types == ord('n')) | (types == ord('-'))
+    extensions = np.where(is_run, lengths, 0)
+    keep, head, tail, S, E = mask_maple_arrays(positions, extensions, region_starts, region_ends, mask_stats)
+
+    # each record becomes 0, 1 or 2 records, in the order: kept record or head, then tail
+    counts = keep.astype(np.int64) + head + tail
+    offsets = np.cumsum(counts) - counts
+    out_types = np.empty(int(counts.sum()), dtype=np.uint8)
+    out_positions = np.empty(out_types.size, dtype=np.int64)
+    out_lengths = np.empty(out_types.size, dtype=np.int64)
+
+    out_types[offsets[keep]] = types[keep]
+    out_positions[offsets[keep]] = positions[keep]
+    out_lengths[offsets[keep]] = lengths[keep]
+    out_types[offsets[head]] = ord('n')
+    out_positions[offsets[head]] = positions[head]
+    out_lengths[offsets[head]] = S[head] - positions[head]
+    at = offsets[tail] + head[tail]
+    out_types[at] = ord('n')
+    out_positions[at] = E[tail] + 1
+    out_lengths[at] = positions[tail].astype(np.int64) + extensions[tail] - E[tail] - 1
+    return out_types, out_positions, out_lengths
+
+#
+#END of def mask_maple_block(header_text, types, positions, lengths, mask, mask_stats=None):
+#
+
+
+def read_maple_numbers(buf, number_starts, line_ends):
+
+    #  Reads the numbers starting at number_starts in the bytes of a maple file, one digit of
+    #  every number at a time.
+    #
+    #  Arguments:
+    #      buf (numpy array): the bytes of the maple file.
+    #      number_starts (numpy array): the first byte of each number.
+    #      line_ends (numpy array): the end of the line of each number.
+    #
+    #  Returns:
+    #     tuple: (values, number_ends), the number ends at the first byte that is not a digit.
+    #            (None, None) for a number of more than 18 digits.
+
+    values = np.zeros(number_starts.size, dtype=np.int64)
+    number_ends = number_starts.copy()
+    reading = number_ends < line_ends
+    for digit_count in range(19):
+        if not reading.any():
+            return values, number_ends
+        digits = buf[np.minimum(number_ends, buf.size - 1)].astype(np.int64) - ord('0')
+        reading &= (digits >= 0) & (digits <= 9)
+        values = np.where(reading, values * 10 + digits, values)
+        number_ends += reading
+        reading &= number_ends < line_ends
+    return None, None
+
+#
+#END of def read_maple_numbers(buf, number_starts, line_ends):
+#
+
+
+def mask_maple_edits(data, mask, mask_stats=None):
+
+    #  The numpy engine: finds the maple lines changed by masking, all records of the file at once.
+    #  The positions and run lengths are parsed into arrays, the masking region of each record is
+    #  found with searchsorted() on the region ends, and every record is classified as kept, dropped,
+    #  trimmed left, trimmed right or split with the same rules as mask_maple_records().
+    #
+    #  Arguments:
+    #      data (bytes): the whole maple file.
+    #      mask (dict): masking regions from load_mask().
+    #      mask_stats (dict): counts the records and bases masked, see mask_maple_records(), only when
+    #                         the edits are returned.
+    #
+    #  Returns:
+    #     list: (begin, end, text) - the bytes data[begin:end] of a changed line, newline included,
+    #           are replaced by text (empty for a dropped record), in order of begin.  None if the
+    #           file holds lines the numpy engine does not parse (blank lines, '\r', extra spaces, ...)
+    #           or the masking regions overlap, then mask_maple_records() is used instead.
+
+    if b'\r' in data:
+        return None
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return []
+
+    # lines: [line_starts, line_ends) without the newline, data up to next_starts with it
+    newlines = np.flatnonzero(buf == 10)
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.concatenate((newlines, [buf.size]))
+    if line_starts[-1] == buf.size:                 # the file ends with a newline
+        line_starts = line_starts[:-1]
+        line_ends = line_ends[:-1]
+    next_starts = np.minimum(line_ends + 1, buf.size)
+
+    is_header = buf[line_starts] == ord('>')
+    records = np.flatnonzero(~is_header)
+    starts = line_starts[records]
+    ends = line_ends[records]
+    if ((ends - starts) < 3).any():
+        return None
+
+    # a record line is: type, tab, position [, tab, run length]
+    kinds = buf[starts]
+    valid = (buf[starts + 1] == 9) & (kinds != 9) & (kinds != 32)
+    locations, first_ends = read_maple_numbers(buf, starts + 2, ends)
+    second_starts = np.minimum(first_ends + 1, ends)
+    extensions, second_ends = read_maple_numbers(buf, second_starts, ends)
+    if (locations is None) or (extensions is None):
+        return None
+    two_columns = first_ends == ends
+    three_columns = ((first_ends < ends) & (buf[np.minimum(first_ends, buf.size - 1)] == 9) &
+                     (second_ends > second_starts) & (second_ends == ends))
+    is_run = (kinds == ord('n')) | (kinds == ord('-'))
+    valid &= (first_ends > starts + 2) & np.where(is_run, three_columns, two_columns | three_columns)
+    if not valid.all():
+        return None
+    extensions = np.where(is_run, extensions, 0)
+
+    # mask the records following each header with the regions of its chromosome
+    headers = np.flatnonzero(is_header)
+    blocks = np.searchsorted(headers, records)
+    bounds = np.searchsorted(blocks, np.arange(headers.size + 2))
+    edits = []
+    block_stats = {}
+    for block in range(headers.size + 1):
+        header_text = None
+        if block > 0:
+            line = headers[block-1]
+            header_text = data[line_starts[line]+1:line_ends[line]].decode()
+        begin, end = bounds[block], bounds[block+1]
+        region_starts, region_ends = mask_arrays(mask, mask_contig(header_text, mask))
+        if region_ends is None:
+            return None
+        if (begin == end) or (region_ends.size == 0):
+            add_mask_stats(block_stats, end - begin, 0, 0, 0)
+            continue
+
+        L = locations[begin:end]
+        LX = L + extensions[begin:end]
+        keep, head, tail, S, E = mask_maple_arrays(L, extensions[begin:end], region_starts, region_ends, block_stats)
+
+        changed = np.flatnonzero(~keep)
+        heads = head[changed].tolist()
+        tails = tail[changed].tolist()
+        lines = records[begin + changed]
+        for line_start, next_start, head, tail, location, start_pos, end_pos, run_end in zip(
+                line_starts[lines].tolist(), next_starts[lines].tolist(), heads, tails,
+                L[changed].tolist(), S[changed].tolist(), E[changed].tolist(), LX[changed].tolist()):
+            text = ""
+            if head:
+                text += f"n\t{location}\t{start_pos-location}\n"
+            if tail:
+                text += f"n\t{end_pos+1}\t{run_end-end_pos-1}\n"
+            edits.append((line_start, next_start, text.encode()))
+
+    if mask_stats is not None:
+        maple_metrics.add_counts(mask_stats, block_stats)
+    return edits
+
+#
+#END of def mask_maple_edits(data, mask, mask_stats=None):
+#
+
+
+def format_maple_block(header_text, types, positions, lengths):
+
+    #  Returns the records of one sample of a binary maple file as text maple lines.
+
+    lines = [] if header_text is None else [f">{header_text}\n"]
+    for base, position, length in zip(types.tobytes().decode('latin-1'), positions.tolist(), lengths.tolist()):
+        if (base == 'n') or (base == '-'):
+            lines.append(f"{base}\t{position}\t{length}\n")
+        else:
+            lines.append(f"{base}\t{position}\n")
+    return "".join(lines)
+
+#
+#END of def format_maple_block(header_text, types, positions, lengths):
+#
+
+
+def read_maple_chunks(fin, chunk_size=MASK_CHUNK_SIZE):
+
+    #  Reads a maple file in chunks of whole lines, every chunk but the first starts at a '>' header,
+    #  so that each chunk holds whole samples.  A chunk is about chunk_size bytes, or one sample
+    #  when a sample is larger.
+    #
+    #  Arguments:
+    #      fin (file): the maple file open for binary reading.
+    #      chunk_size (int): the number of bytes read at a time.
+    #
+    #  Yields:
+    #     bytes: the next chunk.
+
+    pending = bytearray()
+    while True:
+        data = fin.read(chunk_size)
+        if not data:
+            if pending:
+                yield bytes(pending)
+            return
+        searched = max(len(pending) - 1, 0)
+        pending += data
+        cut = pending.rfind(b'\n>', searched)
+        if cut >= 0:
+            yield bytes(pending[:cut+1])
+            del pending[:cut+1]
+
+#
+#END of def read_maple_chunks(fin, chunk_size=MASK_CHUNK_SIZE):
+#
+
+
+def maple_line_at(data, line_start, end):
+
+    #  Reads the maple record line starting at byte line_start of data, for the mmap engine.
+    #
+    #  Returns:
+    #     tuple: (location, extension, line_end) - extension is the run length of an 'n' or '-'
+    #            record, 0 for a base; line_end the byte of its newline, or end.
+
+    line_end = data.find(b'\n', line_start, end)
+    if line_end < 0:
+        line_end = end
+    columns = data[line_start:line_end].split(b'\t')
+    if len(columns) < 2:
+        raise ValueError(f"Error in format of contents of maple file, no tabs? - {data[line_start:line_end].decode()}")
+    extension = int(columns[2]) if columns[0] in (b'n', b'-') else 0
+    return int(columns[1]), extension, line_end
+
+#
+#END of def maple_line_at(data, line_start, end):
+#
+
+
+def find_maple_record(data, begin, end, target):
+
+    #  Searches the record lines in data[begin:end], sorted by location, for the first line with a
+    #  location of at least target: galloping from begin, by steps doubling from MMAP_STEP bytes,
+    #  then a binary search, so the search is short when the line is near begin.  Only the lines
+    #  the search lands on are read.
+    #
+    #  Returns:
+    #     int: the first byte of the line, end if there is none.
+
+    low, high, step = begin, end, MMAP_STEP
+    while low < end:
+        probe = low + step
+        if probe >= end:
+            break
+        line_start = max(data.rfind(b'\n', low, probe) + 1, low)
+        location, extension, line_end = maple_line_at(data, line_start, end)
+        if location >= target:
+            high = line_start
+            break
+        low = line_end + 1
+        step *= 2
+
+    while low < high:
+        line_start = max(data.rfind(b'\n', low, (low + high) // 2) + 1, low)
+        location, extension, line_end = maple_line_at(data, line_start, end)
+        if location >= target:
+            high = line_start
+        else:
+            low = line_end + 1
+    return min(low, end)
+
+#
+#END of def find_maple_record(data, begin, end, target):
+#
+
+
+def maple_mmap_blocks(data, mask):
+
+    #  Splits a text maple file at its '>' headers for the mmap engine, see mask_maple_mmap().
+    #
+    #  Arguments:
+    #      data (mmap or bytes): the whole maple file.
+    #      mask (dict): masking regions from load_mask().
+    #
+    #  Returns:
+    #     list: (header_text, first byte of the records, end byte, region starts, region ends) of
+    #           each sample, header_text None for records before the first header.  None if the
+    #           file holds lines the mmap engine does not handle ('\r', blank lines) or the
+    #           masking regions nest, then mask_maple_records() is used instead.
+
+    if (data.find(b'\r') >= 0) or (data.find(b'\n\n') >= 0) or (data[:1] == b'\n'):
+        return None
+
+    headers = [0] if data[:1] == b'>' else []
+    at = data.find(b'\n>')
+    while at >= 0:
+        headers.append(at + 1)
+        at = data.find(b'\n>', at + 1)
+
+    blocks = []
+    if (not headers) or (headers[0] > 0):
+        blocks.append((None, 0, headers[0] if headers else len(data)))
+    for number, header_start in enumerate(headers):
+        line_end = data.find(b'\n', header_start)
+        if line_end < 0:
+            line_end = len(data)
+        block_end = headers[number+1] if number + 1 < len(headers) else len(data)
+        blocks.append((data[header_start+1:line_end].decode(), min(line_end + 1, len(data)), block_end))
+
+    # the regions must not nest, as for the numpy engine (see mask_arrays())
+    ends_sorted = mask.setdefault('ends_sorted', {})
+    mmap_blocks = []
+    for header_text, records_start, block_end in blocks:
+        chromosome = mask_contig(header_text, mask)
+        starts, ends = mask['index'].get(chromosome, ([], []))
+        if chromosome not in ends_sorted:
+            ends_sorted[chromosome] = all(end_pos <= next_end for end_pos, next_end in zip(ends, ends[1:]))
+        if not ends_sorted[chromosome]:
+            return None
+        mmap_blocks.append((header_text, records_start, block_end, starts, ends))
+    return mmap_blocks
+
+#
+#END of def maple_mmap_blocks(data, mask):
+#
+
+
+def mask_maple_mmap(data, blocks, fout, mask_stats=None, seconds=None):
+
+    #  The mmap engine: masks a memory mapped text maple file, reading only the records near a masking
+    #  region.  For each region the records it can change are found by a binary search on location:
+    #  the records from the first at or after its start to the last at or before its end, and the
+    #  record just before when its run reaches into the region.  Only these records are read and
+    #  masked with mask_maple_records(), every run of lines between them is written as it is, as one
+    #  slice of the file.  The records must be sorted by location and not overlap, as in every maple
+    #  file written by gvcf_to_maple_haploid.py and mask_maple.py; lines between the masking regions
+    #  are copied without being read.
+    #
+    #  Arguments:
+    #      data (mmap or bytes): the whole maple file.
+    #      blocks (list): from maple_mmap_blocks().
+    #      fout (file): the masked maple file, open for binary writing.
+    #      mask_stats (dict): counts the records and bases masked, see mask_maple_records().
+    #      seconds (dict): the time of the 'scan' (binary searches) and 'mask' phases is added.
+
+    clock = time.perf_counter
+    kept = 0
+    copied = 0          # the bytes before copied are written
+
+    def write_masked(first, after, region, next_region):
+        # the lines up to the records of data[first:after] as they are, then the records masked with
+        # the regions they can reach, as mask_maple_records() does
+        nonlocal kept, copied
+        masking = clock()
+        fout.write(view[copied:first])
+        lines = data[first:after].decode().splitlines(keepends=True)
+        region_mask = make_mask({'region': (starts[region:next_region], ends[region:next_region])}, 'region')
+        fout.write("".join(maple_io.format_maple_record(record)
+                           for record in mask_maple_records(read_maple_records(lines), region_mask, mask_stats)).encode())
+        kept -= len(lines)
+        copied = after
+        if seconds is not None:
+            seconds['mask'] += clock() - masking
+
+    with memoryview(data) as view:
+        for header_text, records_start, block_end, starts, ends in blocks:
+            begin = records_start
+            pending = None      # the records to mask, [first, after), and their regions [region, next region)
+            for region, (start_pos, end_pos) in enumerate(zip(starts, ends)):
+                if begin >= block_end:
+                    break
+                scanning = clock()
+                first = find_maple_record(data, begin, block_end, min(start_pos, end_pos + 1))
+                after = find_maple_record(data, first, block_end, end_pos + 1)
+                if first > begin:
+                    previous = max(data.rfind(b'\n', begin, first - 1) + 1, begin)
+                    location, extension, line_end = maple_line_at(data, previous, block_end)
+                    if (extension > 0) and (location + extension > start_pos):
+                        first = previous
+                if seconds is not None:
+                    seconds['scan'] += clock() - scanning
+                if first == after:
+                    continue
+
+                # the records of touching regions are masked together
+                if pending and (pending[1] == first):
+                    pending[1:] = [after, pending[2], region + 1]
+                else:
+                    if pending:
+                        write_masked(*pending)
+                    pending = [first, after, region, region + 1]
+                begin = after
+            if pending:
+                write_masked(*pending)
+        fout.write(view[copied:])
+
+    if mask_stats is not None:
+        lines = sum(data[at:at+MASK_CHUNK_SIZE].count(b'\n') for at in range(0, len(data), MASK_CHUNK_SIZE))
+        lines += (len(data) > 0) and (data[-1:] != b'\n')
+        kept += lines - sum(header_text is not None for header_text, records_start, block_end, starts, ends in blocks)
+        add_mask_stats(mask_stats, kept, 0, 0, 0)
+
+#
+#END of def mask_maple_mmap(data, blocks, fout, mask_stats=None, seconds=None):
+#
+
+
+def write_masked_maple(maple_file_path, maple_fileout, mask, engine='python', binary=False, metrics=None,
+                       qc_file=None, normalize=False):
+
+    #  Masks a maple file of one or many samples into maple_fileout, written atomically.  The
+    #  masking regions are picked again at each '>' header, see mask_maple_records().  The file
+    #  is streamed, only a chunk of whole samples is held in memory at a time, so it can be read
+    #  from stdin and written to stdout in a pipe.
+    #
+    #  Arguments:
+    #      maple_file_path (str): Path to the maple file, text or binary (see maple_binary.py); '-'
+    #                             for stdin, masked by the python engine for a binary file or with
+    #                             -e mmap, which need a file.
+    #      maple_fileout (str): Path to the masked maple file, '-' for stdout.
+    #      mask (dict): masking regions from load_mask().
+    #      engine (str): 'python' to mask record by record with mask_maple_records(), 'numpy' to mask
+    #                    all records of a chunk at once with mask_maple_edits() or mask_maple_block(),
+    #                    'mmap' to read only the records near a masking region of a text maple file
+    #                    written as text, see mask_maple_mmap().
+    #      binary (bool): write a binary maple file.
+    #      metrics (dict): filled with the metrics of the file, see maple_metrics.py: the mask statistics
+    #                      of mask_maple_records(), and the time of the read, mask and write phases of
+    #                      the numpy engine, the scan, mask and write phases of the mmap engine, or the
+    #                      parse (reading included), mask and write phases of the python engine.  Timing
+    #                      each record of the python engine adds a little time.
+    #      qc_file (str): Path to a QC summary of the masked maple file to write, see maple_qc.py; the
+    #                     file is then masked by the python engine, which counts each header.
+    #      normalize (bool): sort the records of each sample by position when they are not sorted,
+    #                        checked in one pass first (always sorted from stdin), and mask them with
+    #                        the python engine, see maple_normalize.sort_maple_records().
+    #
+    #  Raises:
+    #     IOError: if the maple file cannot be read or the masked file cannot be written.
+    #     maple_binary.MapleFormatError: if a binary maple file is damaged.
+
+    if qc_file:
+        engine = 'python'
+    mask = single_header_mask(mask, maple_file_path)
+    is_binary = maple_binary.is_maple_binary(maple_file_path)
+    is_stdin = maple_file_path == maple_io.STDIO
+    sort_records = normalize and (is_stdin or not maple_normalize.maple_is_sorted(maple_file_path))
+    if sort_records:
+        engine = 'python'
+    clock = time.perf_counter
+    start = clock()
+    seconds = {}
+    mask_stats = {} if metrics is not None else None
+
+    # the numpy engine cannot mask with nested regions, see mask_arrays()
+    if (engine == 'numpy') and is_binary and not is_stdin:
+        if all(mask_arrays(mask, mask_contig(header_text, mask))[1] is not None
+               for header_text, types, positions, lengths in maple_binary.read_maple_blocks(maple_file_path)):
+            seconds = {'read': 0.0, 'mask': 0.0}
+            with maple_io.output_file(maple_fileout, 'wb' if binary else 'w') as fout:
+                if binary:
+                    maple_binary.write_maple_header(fout)
+                blocks = maple_metrics.timed(maple_binary.read_maple_blocks(maple_file_path), seconds, 'read')
+                for header_text, types, positions, lengths in blocks:
+                    masking = clock()
+                    masked = mask_maple_block(header_text, types, positions, lengths, mask, mask_stats)
+                    seconds['mask'] += clock() - masking
+                    if binary:
+                        maple_binary.write_maple_block(fout, header_text, *masked)
+                    else:
+                        fout.write(format_maple_block(header_text, *masked))
+            add_file_metrics(metrics, maple_file_path, maple_fileout, clock() - start, seconds, mask_stats)
+            return
+
+    elif (engine == 'numpy') and not (is_binary or binary):
+        seconds = {'read': 0.0, 'mask': 0.0}
+        with maple_io.input_file(maple_file_path, 'rb') as fin, maple_io.output_file(maple_fileout, 'wb') as fout:
+            for chunk in maple_metrics.timed(read_maple_chunks(fin), seconds, 'read'):
+                masking = clock()
+                edits = mask_maple_edits(chunk, mask, mask_stats)
+                if edits is None:       # a chunk the numpy engine does not parse
+                    lines = io.TextIOWrapper(io.BytesIO(chunk))
+                    for record in mask_maple_records(read_maple_records(lines), mask, mask_stats):
+                        fout.write(maple_io.format_maple_record(record).encode())
+                    seconds['mask'] += clock() - masking
+                    continue
+                seconds['mask'] += clock() - masking
+                view = memoryview(chunk)
+                pieces = []
+                copied = 0
+                for begin, end, text in edits:      # the unchanged lines between edits are copied in bulk
+                    pieces.append(view[copied:begin])
+                    pieces.append(text)
+                    copied = end
+                pieces.append(view[copied:])
+                fout.writelines(pieces)
+        add_file_metrics(metrics, maple_file_path, maple_fileout, clock() - start, seconds, mask_stats)
+        return
+
+    elif (engine == 'mmap') and not (is_binary or binary or is_stdin):
+        with open(maple_file_path, 'rb') as fin:
+            data = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(fin.fileno()).st_size else b''
+        try:
+            blocks = maple_mmap_blocks(data, mask)
+            if blocks is not None:
+                seconds = {'scan': 0.0, 'mask': 0.0}
+                with maple_io.output_file(maple_fileout, 'wb') as fout:
+                    mask_maple_mmap(data, blocks, fout, mask_stats, seconds)
+                add_file_metrics(metrics, maple_file_path, maple_fileout, clock() - start, seconds, mask_stats)
+                return
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    # the python engine, the numpy engine for a file it does not parse and the mmap engine for a binary file
+    with maple_io.input_file(maple_file_path, 'rb' if is_binary else 'r') as fin:  # Open the maple file for reading
+        records = maple_binary.read_maple_binary(fin) if is_binary else read_maple_records(fin)
+        if sort_records:
+            records = maple_normalize.sort_maple_records(records)
+        if metrics is not None:
+            records = maple_metrics.timed(records, seconds, 'parse')
+        contigs = {}
+        header_stats = {} if qc_file else None
+        records = mask_maple_records(records, mask, mask_stats, header_stats)
+        if qc_file:
+            records = maple_qc.count_records(records, contigs)
+        if metrics is not None:
+            records = maple_metrics.timed(records, seconds, 'mask')
+
+        # open file for writing masked maples
+        with maple_io.output_file(maple_fileout, 'wb' if binary else 'w') as fout:
+            if binary:
+                maple_binary.write_maple_binary(fout, records)
+            else:
+                for record in records:
+                    fout.write(maple_io.format_maple_record(record))
+    if qc_file:
+        maple_qc.add_masked(contigs, header_stats)
+        maple_qc.write_summary(qc_file, 'mask_maple', maple_qc.qc_sample_name(maple_fileout), maple_file_path,
+                               maple_fileout, contigs)
+    total = clock() - start
+    add_file_metrics(metrics, maple_file_path, maple_fileout, total,
+                     maple_metrics.exclusive_phases(seconds, ['parse', 'mask', 'write'], total), mask_stats)
+
+#
+#END of def write_masked_maple(maple_file_path, maple_fileout, mask, engine='python', binary=False, metrics=None,
+#                              qc_file=None, normalize=False):
+#
+
+
+def add_file_metrics(metrics, maple_file_path, maple_fileout, total, phases, mask_stats):
+
+    #  Fills the metrics of a masked maple file, see write_masked_maple(), nothing is done when
+    #  metrics is None.  The 'write' phase is the rest of the total time when it is not in phases.
+
+    if metrics is None:
+        return
+    phases = dict(phases)
+    if 'write' not in phases:
+        phases['write'] = max(total - sum(phases.values()), 0.0)
+    metrics.update({'input': maple_file_path, 'output': maple_fileout, 'error': None, 'seconds': round(total, 6),
+                    'phases': maple_metrics.round_seconds(phases), 'mask': mask_stats})
+
+#
+#END of def add_file_metrics(metrics, maple_file_path, maple_fileout, total, phases, mask_stats):
+#
+
+
+def mask_maple_file(maple_file_text, mask, output_dir_text, engine='python', binary=False, metrics=None):
+
+    #  Masks one maple file and writes it to the output directory under the same filename, see
+    #  write_masked_maple().  A text file is written, or with binary a binary file, the filename
+    #  extension is changed to .maple or .mapleb when the format changes.
+    #
+    #  Arguments:
+    #      maple_file_text (str): line from the list of maple files, the path to the maple file.
+    #      mask (dict): masking regions from load_mask().
+    #      output_dir_text (str): directory for the masked maple file.
+    #      engine (str): 'python', 'numpy' or 'mmap', see write_masked_maple().
+    #      binary (bool): write a binary maple file.
+    #      metrics (dict): filled with the metrics of the file, see write_masked_maple().
+    #
+    #  Raises:
+    #     IOError: if the maple file cannot be read or the masked file cannot be written.
+    #     maple_binary.MapleFormatError: if a binary maple file is damaged.
+
+    write_masked_maple(maple_file_text.strip(), masked_filename(maple_file_text, output_dir_text, binary), mask,
+                       engine, binary, metrics)
+
+#
+#END of def mask_maple_file(maple_file_text, mask, output_dir_text, engine='python', binary=False, metrics=None):
+#
+
+
+def masked_filename(maple_file_text, output_dir_text, binary=False):
+
+    #  Returns the path of the masked maple file of a maple file of the list: the same filename in the
+    #  output directory, the extension changed to .maple or .mapleb when the format changes.
+    #
+    #  Arguments:
+    #      maple_file_text (str): line from the list of maple files, the path to the maple file.
+    #      output_dir_text (str): directory for the masked maple file.
+    #      binary (bool): a binary maple file is written.
+
+    SRR_file = maple_file_text.split('/')[-1].strip()    # get filename (last of '/') if any
+    try:
+        is_binary = maple_binary.is_maple_binary(maple_file_text.strip())
+    except OSError:         # masking the file reports the error
+        is_binary = False
+    if binary and not is_binary:
+        SRR_file = maple_binary.binary_filename(SRR_file)
+    elif is_binary and not binary:
+        SRR_file = maple_binary.text_filename(SRR_file)
+    return output_dir_text + "/" + SRR_file
+
+#
+#END of def masked_filename(maple_file_text, output_dir_text, binary=False):
+#
+
+
+def init_mask_worker(mask, output_dir_text, engine='python', binary=False, collect_metrics=False, qc=False,
+                     normalize=False):
+
+    #  Keeps the masking regions, output directory and output options in each worker process, so
+    #  the mask is passed to a worker once rather than with every maple file.  With qc a QC summary
+    #  is written next to each masked maple file, with normalize the records of a maple file not
+    #  sorted are sorted, see write_masked_maple().
+
+    global worker_mask
+    global worker_output_dir_text
+    global worker_engine
+    global worker_binary
+    global worker_collect_metrics
+    global worker_qc
+    global worker_normalize
+    worker_mask = mask
+    worker_output_dir_text = output_dir_text
+    worker_engine = engine
+    worker_binary = binary
+    worker_collect_metrics = collect_metrics
+    worker_qc = qc
+    worker_normalize = normalize
+
+#
+#END of def init_mask_worker(mask, output_dir_text, engine='python', binary=False, collect_metrics=False, qc=False,
+#                            normalize=False):
+#
+
+
+def mask_list_file(maple_file_text):
+
+    #  Masks one maple file of the list, errors are returned rather than raised so that one
+    #  bad file does not stop the others.
+    #
+    #  Arguments:
+    #      maple_file_text (str): line from the list of maple files.
+    #
+    #  Returns:
+    #     tuple: (maple_file_text, error message or None, metrics of the file or None)
+
+    maple_fileout = masked_filename(maple_file_text, worker_output_dir_text, worker_binary)
+    maple_file_path, error, metrics = mask_output_file((maple_file_text.strip(), maple_fileout))
+    return maple_file_text, error, metrics
+
+#
+#END of def mask_list_file(maple_file_text):
+#
+
+
+def mask_output_file(task):
+
+    #  Masks one maple file into the given masked maple file, with the mask and options of the
+    #  worker process, errors are returned rather than raised.
+    #
+    #  Arguments:
+    #      task (tuple): (path to the maple file, path to the masked maple file)
+    #
+    #  Returns:
+    #     tuple: (path to the maple file, error message or None, metrics of the file or None)
+
+    maple_file_path, maple_fileout = task
+    metrics = {'input': maple_file_path} if worker_collect_metrics else None
+    error = None
+    try:
+        write_masked_maple(maple_file_path, maple_fileout, worker_mask, worker_engine, worker_binary, metrics,
+                           maple_qc.qc_filename(maple_fileout) if worker_qc else None, worker_normalize)
+    except FileNotFoundError as e:
+        error = f"Error: The file was not found - {e}"
+    except (IOError, maple_binary.MapleFormatError) as e:
+        error = f"Error reading the file - {e}"
+    except Exception as e:
+        error = f"Error in format of contents of maple file - {e!r}"
+
+    if metrics is not None:
+        metrics['error'] = error
+    return maple_file_path, error, metrics
+
+#
+#END of def mask_output_file(task):
+#
+
+
+def mask_files(tasks, mask, jobs=1, engine='python', binary=False, collect_metrics=False, qc=False, normalize=False):
+
+    #  Masks maple files in jobs worker processes, see mask_output_file().
+    #
+    #  Arguments:
+    #      tasks (list): (path to the maple file, path to the masked maple file) of each file.
+    #      mask (dict): masking regions from load_mask().
+    #      jobs (int): number of worker processes.
+    #      engine (str): 'python', 'numpy' or 'mmap', see write_masked_maple().
+    #      binary (bool): write binary maple files.
+    #      collect_metrics (bool): collect the metrics of each file.
+    #      qc (bool): write a QC summary next to each masked maple file, see maple_qc.py.
+    #      normalize (bool): sort the records of the maple files not sorted, see write_masked_maple().
+    #
+    #  Yields:
+    #     tuple: the result of each file from mask_output_file(), in the order of tasks.
+
+    if jobs <= 1:
+        init_mask_worker(mask, None, engine, binary, collect_metrics, qc, normalize)
+        for task in tasks:
+            yield mask_output_file(task)
+        return
+
+    with multiprocessing.Pool(jobs, initializer=init_mask_worker,
+                              initargs=(mask, None, engine, binary, collect_metrics, qc, normalize)) as pool:
+        yield from pool.imap(mask_output_file, tasks, chunksize=4)
+
+#
+#END of def mask_files(tasks, mask, jobs=1, engine='python', binary=False, collect_metrics=False, qc=False, normalize=False):
+#
+
+
+def mask_maple_list(maple_file_texts, mask, output_dir_text, jobs=1, engine='python', binary=False,
+                    file_metrics=None, shard=None, qc=False, normalize=False):
+
+    #  Masks every maple file of the list.  With jobs > 1 the files are masked concurrently in
+    #  jobs worker processes sharing the masking regions.  Errors are reported at the end, with
+    #  any number of jobs.
+    #
+    #  Arguments:
+    #      maple_file_texts (list): lines from the list of maple files.
+    #      mask (dict): masking regions from load_mask().
+    #      output_dir_text (str): directory for the masked maple files.
+    #      jobs (int): number of worker processes.
+    #      engine (str): 'python', 'numpy' or 'mmap', see mask_maple_file().
+    #      binary (bool): write binary maple files, see mask_maple_file().
+    #      file_metrics (list): the metrics of each maple file are appended, see write_masked_maple(),
+    #                           None to collect none.
+    #      shard (tuple): (index, count) to mask only the maple files of one shard of the list, see
+    #                     maple_shard.py; None for all.
+    #      qc (bool): write a QC summary next to each masked maple file, see maple_qc.py.
+    #      normalize (bool): sort the records of the maple files not sorted, see write_masked_maple().
+    #
+    #  Returns:
+    #     int: exit code, 0 if every file was masked, 1 if any file failed.
+
+    if shard:
+        maple_file_texts = [maple_file_text for maple_file_text in maple_file_texts if maple_file_text.strip()]
+        selected = maple_shard.select_shard(maple_file_texts, shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(selected)} of {len(maple_file_texts)} maple files", file=sys.stderr)
+        maple_file_texts = selected
+    collect_metrics = file_metrics is not None
+    if jobs <= 1:
+        init_mask_worker(mask, output_dir_text, engine, binary, collect_metrics, qc, normalize)
+        results = [mask_list_file(maple_file_text) for maple_file_text in maple_file_texts]
+    else:
+        with multiprocessing.Pool(jobs, initializer=init_mask_worker,
+                                  initargs=(mask, output_dir_text, engine, binary, collect_metrics, qc, normalize)) as pool:
+            results = list(pool.imap(mask_list_file, maple_file_texts, chunksize=4))
+
+    if collect_metrics:
+        file_metrics.extend(metrics for maple_file_text, error, metrics in results)
+
+    failures = [(maple_file_text.strip(), error) for maple_file_text, error, metrics in results if error]
+    for maple_file_text, error in failures:
+        print(f"FAILED {maple_file_text}: {error}", file=sys.stderr)
+    print(f"Masked {len(results) - len(failures)} of {len(results)} maple files, {len(failures)} failed", file=sys.stderr)
+
+    return 1 if failures else 0
+
+#
+#END of def mask_maple_list(maple_file_texts, mask, output_dir_text, jobs=1, engine='python', binary=False,
+#                           file_metrics=None, shard=None, qc=False, normalize=False):
+#
+
+
+def mask_bed_file(args):
+
+    #  Returns the .bed file of the masking regions of the run: the -m .bed file, or with
+    #  --normalize its normalized .bed file, cached, see maple_normalize.normalized_bed().
+
+    if not args.normalize:
+        return args.mask_file
+    bed_file_text, status = maple_normalize.normalized_bed(args.mask_file, args.normalize_dir)
+    if status != 'clean':
+        print(f"{args.mask_file}: masking regions {status} in {bed_file_text}", file=sys.stderr)
+    return bed_file_text
+
+#
+#END of def mask_bed_file(args):
+#
+
+
+def mask_parameters(args):
+
+    #  Returns everything but the maple file the masked maple files of a run depend on, for the
+    #  manifest: the .bed and contig map files by their SHA-256, -c and --binary, and --qc and
+    #  --normalize when given.  The engine and jobs do not change the masked files.
+
+    parameters = {'mask_bed': maple_manifest.file_hash(args.mask_file), 'contig': args.contig,
+                  'contig_map': maple_manifest.file_hash(args.contig_map) if args.contig_map else None,
+                  'binary': args.binary}
+    if args.qc:
+        parameters['qc'] = True
+    if args.normalize:
+        parameters['normalize'] = True
+    return parameters
+
+#
+#END of def mask_parameters(args):
+#
+
+
+def mask_manifest(outputs, manifest_file_text, mask, parameters, jobs=1, engine='python', binary=False,
+                  dry_run=False, file_metrics=None, shard=None, qc=False, normalize=False):
+
+    #  Masks the maple files whose masked file is not up to date in the manifest, and records the
+    #  masked files written.  The manifest is written even when the run is stopped.
+    #
+    #  Arguments:
+    #      outputs (list): (path to the maple file, path to the masked maple file) of each file.
+    #      manifest_file_text (str): Path to the manifest, see maple_manifest.py; created if needed.
+    #      mask (dict): masking regions from load_mask().
+    #      parameters (dict): from mask_parameters().
+    #      jobs, engine, binary, qc, normalize: see mask_files().
+    #      dry_run (bool): only list the maple files to mask and why, to stdout.
+    #      file_metrics (list): the metrics of each file masked are appended, None to collect none.
+    #      shard (tuple): (index, count) to mask only the maple files of one shard of outputs; the shard
+    #                     is recorded in the manifest, with the SHA-256 of each masked file, see
+    #                     maple_shard.py; None for all.
+    #
+    #  Returns:
+    #     int: exit code, 0 if every file was masked, 1 if any file failed.
+    #
+    #  Raises:
+    #     ValueError, IOError: the manifest cannot be read or written.
+
+    manifest = maple_manifest.read_manifest(manifest_file_text)
+    if shard:
+        manifest['shard'] = maple_shard.shard_record(outputs, shard, 'mask_maple', VERSION, parameters)
+        selected = [(maple_file_path, maple_fileout) for maple_file_path, maple_fileout in outputs
+                    if maple_shard.in_shard(maple_file_path, shard)]
+        print(f"Shard {shard[0]}/{shard[1]}: {len(selected)} of {len(outputs)} maple files", file=sys.stderr)
+        outputs = selected
+    todo, up_to_date = maple_manifest.plan_outputs(manifest, outputs, 'mask_maple', VERSION, parameters)
+    if dry_run:
+        sys.stdout.write(maple_manifest.format_plan(todo, up_to_date))
+        return 0
+    print(f"{len(up_to_date)} masked maple files up to date, masking {len(todo)}", file=sys.stderr)
+
+    # the maple files as they are before masking
+    input_states = {maple_file_path: maple_manifest.file_state(maple_file_path,
+                                                                manifest['outputs'].get(os.path.normpath(maple_fileout)))
+                    for maple_file_path, maple_fileout, reason in todo}
+    failures = 0
+    try:
+        results = mask_files([(maple_file_path, maple_fileout) for maple_file_path, maple_fileout, reason in todo],
+                             mask, jobs, engine, binary, file_metrics is not None, qc, normalize)
+        for (maple_file_path, maple_fileout, reason), (path, error, metrics) in zip(todo, results):
+            if file_metrics is not None:
+                file_metrics.append(metrics)
+            if error:
+                failures += 1
+                print(f"FAILED {maple_file_path}: {error}", file=sys.stderr)
+            elif input_states[maple_file_path] is not None:
+                maple_manifest.record_output(manifest, maple_fileout, 'mask_maple', VERSION, maple_file_path,
+                                             input_states[maple_file_path], parameters, output_hash=shard is not None)
+    finally:
+        maple_manifest.write_manifest(manifest_file_text, manifest)
+    print(f"Masked {len(todo) - failures} of {len(todo)} maple files, {failures} failed", file=sys.stderr)
+
+    return 1 if failures else 0
+
+#
+#END of def mask_manifest(outputs, manifest_file_text, mask, parameters, jobs=1, engine='python', binary=False,
+#                         dry_run=False, file_metrics=None, shard=None, qc=False, normalize=False):
+#
+
+
+def process_arguments_mask(argv=None):
 
     #  Checks to see that 3 arguments are entered on the command line
     #
@@ -77,6 +1503,14 @@ def process_arguments_mask():
     #      2) .bed file (str): .bed file containing masking regions
     #      3) directory to use to store all processed masked .maple files
     #
+    #  Instead of 1) and 3) a single maple file, of one or many samples, can be given with -i
+    #  and masked into the -o maple file.
+    #
+    #  argv (list): the arguments, default sys.argv[1:].
+    #
+    #  Returns:
+    #     argparse.Namespace: the arguments.
+    #
     #  No return unless 3 valid arguments have been entered.
     #
     parser = argparse.ArgumentParser(description='''A script that takes three command-line arguments.
@@ -89,181 +1523,162 @@ def process_arguments_mask():
         if an 'n' or '-' region spans the masking region, then only those sequences outside of the masking
         region are written to the output maple file.'''
     ,formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument('-l','--list_maple_files',help='The name of the input ile containing the maple files to mask.',required=True)
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument('-l','--list_maple_files',help='The name of the input ile containing the maple files to mask.')
+    input_group.add_argument('-i','--input_file',help='The name of one maple file, of one or many samples, to mask into -o; - for stdin.')
     parser.add_argument('-m','--mask_file', help='The name of the input .bed file containing the masking regions.',required=True)
-    parser.add_argument('-d','--output_directory', help='The name of the output directory containing the masked maple files.',required=True)    
-    parser.add_argument('-v','--verbose',action='store_true',help='Enable verbose output')
-    args = parser.parse_args()
-
-    global list_maple_files   # The first argument
-    global mask_file          # The second argument
-    global output_dir         # The third argument
-    global list_maple_text    # The text of the list filename
-    global mask_file_text     # The text of the mask file
-    global output_dir_text    # The text of the output directory
-    list_maple_files = ""     # Initialize list filename
-    mask_file = ""            # Initialize mask filename
-    output_dir = ""           # Initialize output directory
-
-    list_maple_files = args.list_maple_files
-    list_maple_text = list_maple_files
-    mask_file = args.mask_file
-    mask_file_text = mask_file
-    output_dir = args.output_directory
-    output_dir_text = output_dir
-    
-#            
-#END of def process_arguments_mask():
-#
-
-# Check the command line arguments
-process_arguments_mask()
-
-# open input files
-try:  # open list of maple files
-    with open(list_maple_text, 'r') as flistin:  # open list of maple files to read    
-
-        try:  # open bed file with masking regions
-            with open(mask_file_text, 'r') as fbedin:     # open bed file which contains masking regions            
-
-                # for each line in current maple file file
-                for line in flistin:
-
-                    try:  # open next maple file in list of maple files
-                        # debug print("line: " + line.strip())
-                        
-                        with open(line.strip(), 'r') as fin:  # Open the maple file for reading
-                            dirs = line.split('/')            # split line by '/'
-                            dir_len = len(dirs)               # get number of '/'s
-                            if dir_len >= 1:
-                                SRR_file = dirs[dir_len-1]        # get filename (last of '/') if any
-                            else:
-                                print(f"Error in format of contents of list of maples - {e}")
-                                print(f"Can be list of files separated by newline.")
-                                print(f"Can be list of files in another directory e.g. ../this.maple")
-    
-                            try:   # open file for writing masked maples in new directory 
-                                with open(output_dir_text + "/" + SRR_file.strip(),'w') as fout:   # open file for writing masked maples in new directory
-                                    
-
-                                    # Reset the bed file after every maple file search
-                                    fbedin.seek(0)
-    
-                                    # for each mask region in bed file
-                                    for region in fbedin:
-        
-                                        positions = region.strip().split('\t')  # split the line into columns
-                                        if len(positions) >= 2:
-                                            start_pos = int(positions[1])+1         # start_position of mask region (zero-based, half-open coordinates)
-                                            end_pos = int(positions[2])             # end_position of mask region   (no need to modify the index)
-                                        else:
-                                            print(f"Error in format of contents of mask file, no tabs? - {e}")
-                                        
-                                        for aline in fin:  # For each line in the maple file
-
-                                            # if at the header line, write to output masked file and skip to the next line
-                                            if '>' in aline:
-                                                fout.write(aline)
-                                                aline = fin.readline()
-
-                                            columns = aline.strip().split('\t') # split the line into columns, may be two or three columns
-                                            if len(columns) >= 2:
-                                                location = int(columns[1])          # location is the sequence position of the edit
-                                                if_n = columns[0]                   # if_n is type of base '-','n','A','C','G' or 'T'
-                                                extension = 0                       # extension is > 0 only if base is 'n' or '-' then 'n' or '-' can span 
-                                                if (if_n == 'n') or (if_n == '-'):          # more than one position '-', 'n' spans can span a masking region
-                                                    extension = int(columns[2])     # we will check if the location+extension region spans any masking region
-                                            else:
-                                                print(f"Error in format of contents of maple file, no tabs? - {e}")
-
-                                            # if location in the maple file is > the end_position of the current region, then read next masking region
-                                            while (location > end_pos) and region:
-                                                region = fbedin.readline()
-
-                                                if region:
-                                                    positions = region.strip().split('\t') # split the line into columns
-                                                    if len(positions) >= 2:
-                                                        start_pos = int(positions[1])+1        # start_position of the mask region (zero-based, half-open coords)
-                                                        end_pos = int(positions[2])            # end_position of the mask region   (no need to modify the index)
-                                                    else:
-                                                        print(f"Error in format of contents of mask file, no tabs? - {e}")
-                                                
-                                            # debug if location == 3147913:
-                                            # debug    i = 10
-                
-                                            if (extension > 0) and region and aline:
-                                                #  if (start_pos <= location) and (end_pos < location+extension) and (end_pos >= location):             
-                                                #    S----------E    'n's or '-'s after of masking region are not masked                                      
-                                                #             *++++
-
-                                                if (start_pos <= location) and (end_pos < location+extension) and (end_pos >= location):
-                                                    to_length = location+extension-end_pos-1
-                                                    if to_length > 0:
-                                                        fout.write('n\t' + str(end_pos+1) + '\t' + str(to_length) + '\n')                    
-
-                                                #  if (start_pos >= location+extension):
-                                                #        S----------E   'n's or '-'s prior to masking region are not masked                                      
-                                                # *++++
-                                                elif (start_pos >= location+extension):
-                                                    fout.write(aline)
-                    
-                                                #  if (start_pos > location) and (start_pos < location+extension) and (end_pos > location+extension): 
-                                                #    S----------E    'n's or '-'s prior to masking region are not masked                                      
-                                                # *++++                                                                                               
-
-                                                elif (start_pos > location) and (start_pos < location+extension) and (end_pos > location+extension):
-                                                    fout.write('n\t' + str(location) + '\t' + str(start_pos-location) + '\n')                    
-                    
-                                                #  if (start_pos > location) and (start_pos < location+extension) and (end_pos < location+extension): 
-                                                #    S----------E    'n's or '-'s prior to and after masking region are not masked                            
-                                                #  *+++++++++++++++
-
-                                                elif (start_pos > location) and (start_pos < location+extension) and (end_pos < location+extension): 
-                                                    fout.write('n\t' + str(location) + '\t' + str(start_pos-location) + '\n')
-                                                    to_length = location+extension-end_pos-1
-                                                    if to_length > 0:
-                                                        fout.write('n\t' + str(end_pos+1) + '\t' + str(to_length) + '\n')
-                                                    
-                                            elif (extension == 0) and region and aline:  # if the extension ==  0
-                            
-                                                #  if (end_pos < location)                                                                            
-                                                #    S----------E    Do not mask this position
-                                                #                    *                                                                                   
-                                                #  if (start_pos > location)                                                                          
-                                                #    S----------E    Do not mask this position                                                         
-                                                #  *
-                                                if (start_pos > location) or (end_pos < location):
-                                                    fout.write(aline)
-                                            else:
-                                                fout.write(aline)
-                    
-                                        #end for aline in fin:  # For each line in the maple file                                                    
-                                    #end for region in fbedin:  # file containing masked regions
-                                #end with open("mask_chrom1/" + SRR_file.strip(),'w') as fout:   # open file for writing masked maples in new directory
-                                
-                            except FileNotFoundError as e:  # for output masked maple file written in new directory
-                                print(f"Error: The file was not found - {e}")
-                            except IOError as e:
-                                print(f"Error reading the file - {e}")
-
-                        #end with open(line.strip(), 'r') as fin:  # Open the maple file for reading
-                        
-                    except FileNotFoundError as e:  # for next maple file in list of maple files, fin
-                        print(f"Error: The file was not found - {e}")
-                    except IOError as e:
-                        print(f"Error reading the file - {e}")
-                        
-                #end for line in flistin:
-            #end with open("fasTAN.bed", 'r') as fbedin:     # open bed file which contains masking regions
-            
-        except FileNotFoundError as e:   # for bed file with masking regions, fbedin
-            print(f"Error: The file was not found - {e}")
-        except IOError as e:
-            print(f"Error reading the file - {e}")
-            
-    #end with open("chrom_nhin.list", 'r') as flistin:  # open list of maple files to read
-    
-except FileNotFoundError as e:    # for list of maple files, flistin
-    print(f"Error: The file was not found - {e}")
-except IOError as e:
-    print(f"Error reading the file - {e}")
+    parser.add_argument('-d','--output_directory', help='The name of the output directory containing the masked maple files (with -l).')    
+    parser.add_argument('-o','--output_file','--output', help='The name of the masked maple file (with -i), - for stdout; default stdout for -i -.')
+    parser.add_argument('-c','--contig', help='The .bed chromosome (first column) to use for every maple file; default picked by the maple header.')
+    parser.add_argument('-C','--contig_map', help='A file mapping maple headers, or chromosome numbers, to .bed chromosomes (two tab separated columns).')
+    parser.add_argument('-j','--jobs', help='The number of worker processes masking maple files concurrently; default 1.',type=int,default=1)
+    parser.add_argument('-e','--engine', help='The masking engine, python (default), numpy (whole file at once, needs numpy) or mmap (reads only\nthe records near a masking region, needs the records sorted and not overlapping).',choices=['python','numpy','mmap'],default='python')
+    parser.add_argument('--binary',action='store_true',help='Write binary maple files (.mapleb, see maple_binary.py); default text.\nThe maple files of the list may be text or binary.')
+    parser.add_argument('--manifest',help='A manifest of the masked maple files written (see maple_manifest.py), created if needed: the\nmasked files up to date (same maple file content, masking regions and version) are skipped, the others\nmasked and recorded.')
+    parser.add_argument('--dry_run',action='store_true',help='With --manifest, list the maple files to mask and why, without masking.')
+    parser.add_argument('--shard',help='I/N: with -l, mask only the I-th of N shards of the list, picked by a hash of the sample name,\nto run a list on N nodes; with --manifest the shard is recorded for maple_shard.py to check.')
+    parser.add_argument('--qc',action='store_true',help='Write a QC summary next to each masked maple file (.qc.json, see maple_qc.py): the records,\n\'n\' bases and SNPs of each header and the records and bases masked; masks with -e python.')
+    parser.add_argument('--normalize',action='store_true',help='Normalize the inputs, each checked in one pass and used as it is when clean: the .bed regions\nsorted and merged into a .bed file cached next to the .bed file (fasTAN.<hash>.normalized.bed) for\nlater runs, and the records of a maple file not sorted by position sorted (masked with -e python);\nsee maple_normalize.py.')
+    parser.add_argument('--normalize_dir',help='With --normalize, the directory of the cached normalized .bed files; default that of the .bed file.')
+    parser.add_argument('--metrics_json',help='Write the metrics of the run to this JSON file: phase times and records kept, dropped\nand trimmed and bases masked of each maple file, see maple_metrics.py.')
+    parser.add_argument('--profile',help='Profile the run with cProfile and write the stats to this file (the main process only).')
+    parser.add_argument('-v','--verbose',action='store_true',help='Print the metrics of each maple file to stderr.')
+    args = parser.parse_args(argv)
+
+    if (args.engine == 'numpy') and (np is None):
+        parser.error("-e numpy needs the numpy package, install it or use -e python")
+
+    if args.jobs < 1:
+        parser.error("-j/--jobs must be at least 1")
+    if args.list_maple_files and not args.output_directory:
+        parser.error("-l/--list_maple_files needs -d/--output_directory")
+    if (args.input_file == maple_io.STDIO) and not args.output_file:
+        args.output_file = maple_io.STDIO
+    if args.input_file and not args.output_file:
+        parser.error("-i/--input_file needs -o/--output_file")
+    if maple_io.STDIO in (args.input_file, args.output_file) and args.manifest:
+        parser.error("--manifest cannot be used with stdin or stdout")
+    if (args.output_file == maple_io.STDIO) and args.qc:
+        parser.error("--qc cannot be used with the masked maple file written to stdout")
+    if args.dry_run and not args.manifest:
+        parser.error("--dry_run needs --manifest")
+    if args.normalize_dir and not args.normalize:
+        parser.error("--normalize_dir needs --normalize")
+    if args.shard:
+        if not args.list_maple_files:
+            parser.error("--shard needs -l/--list_maple_files")
+        try:
+            args.shard = maple_shard.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    return args
+
+#
+#END of def process_arguments_mask(argv=None):
+#
+
+
+def main(argv=None):
+
+    #  The command line tool: masks the -i maple file or the maple files of the -l list, see
+    #  process_arguments_mask().
+    #
+    #  Arguments:
+    #      argv (list): the command line arguments, default sys.argv[1:].
+    #
+    #  Returns:
+    #     int: exit code.
+
+    # Check the command line arguments
+    args = process_arguments_mask(argv)
+
+    file_metrics = [] if (args.metrics_json or args.verbose) else None
+    start = time.perf_counter()
+    exit_code = 0
+
+    with maple_metrics.profiled(args.profile):
+
+        # mask the maple files whose masked file is not up to date
+        if args.manifest:
+            try:
+                if args.input_file:
+                    outputs = [(args.input_file, args.output_file)]
+                else:
+                    with open(args.list_maple_files, 'r') as flistin:
+                        outputs = [(line.strip(), masked_filename(line, args.output_directory, args.binary))
+                                   for line in flistin if line.strip()]
+                mask = load_mask(mask_bed_file(args), args.contig, args.contig_map)
+                exit_code = mask_manifest(outputs, args.manifest, mask, mask_parameters(args), args.jobs, args.engine,
+                                          args.binary, args.dry_run, file_metrics, args.shard, args.qc, args.normalize)
+            except FileNotFoundError as e:
+                print(f"Error: The file was not found - {e}")
+                exit_code = 1
+            except (IOError, ValueError) as e:
+                print(f"Error reading the file - {e}")
+                exit_code = 1
+
+        # mask a single, possibly multi-sample, maple file
+        elif args.input_file:
+            metrics = None
+            if file_metrics is not None:
+                metrics = {'input': args.input_file, 'error': None}
+                file_metrics.append(metrics)
+            try:
+                mask = load_mask(mask_bed_file(args), args.contig, args.contig_map)
+                write_masked_maple(args.input_file, args.output_file, mask, args.engine, args.binary, metrics,
+                                   maple_qc.qc_filename(args.output_file) if args.qc else None, args.normalize)
+            except FileNotFoundError as e:
+                error = f"Error: The file was not found - {e}"
+            except (IOError, maple_binary.MapleFormatError) as e:
+                error = f"Error reading the file - {e}"
+            else:
+                error = None
+            if error:
+                print(error, file=sys.stderr if args.output_file == maple_io.STDIO else sys.stdout)
+                exit_code = 1
+                if metrics is not None:
+                    metrics['error'] = error
+
+        # open input files
+        else:
+            try:  # open list of maple files
+                with open(args.list_maple_files, 'r') as flistin:  # open list of maple files to read
+                    maple_file_texts = flistin.readlines()
+
+                try:  # read the bed file with masking regions, once for all maple files
+                    mask = load_mask(mask_bed_file(args), args.contig, args.contig_map)
+
+                    # mask each maple file in the list
+                    exit_code = mask_maple_list(maple_file_texts, mask, args.output_directory, args.jobs, args.engine,
+                                                args.binary, file_metrics, args.shard, args.qc, args.normalize)
+
+                except FileNotFoundError as e:   # for bed file with masking regions, or contig map
+                    print(f"Error: The file was not found - {e}")
+                    exit_code = 1
+                except IOError as e:
+                    print(f"Error reading the file - {e}")
+                    exit_code = 1
+
+            except FileNotFoundError as e:    # for list of maple files, flistin
+                print(f"Error: The file was not found - {e}")
+                exit_code = 1
+            except IOError as e:
+                print(f"Error reading the file - {e}")
+                exit_code = 1
+
+    if args.verbose:
+        for metrics in file_metrics:
+            print(maple_metrics.summary_line(metrics), file=sys.stderr)
+    if args.metrics_json:
+        maple_metrics.write_metrics_json(args.metrics_json, 'mask_maple', file_metrics, time.perf_counter() - start,
+                                         argv)
+    return exit_code
+
+#
+#END of def main(argv=None):
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
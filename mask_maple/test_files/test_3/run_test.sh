@@ -0,0 +1,51 @@
+#!/bin/bash
+set -beu -o pipefail
+
+mkdir -p out
+python3 ../../mask_maple.py -l test.list -m mask_multi.bed -C contig.map -d out
+diff -r expected out
+
+# the same maple file masked as a single multi-sample file
+python3 ../../mask_maple.py -i multi.maple -m mask_multi.bed -C contig.map -o combined.maple
+cmp expected/multi.maple combined.maple
+rm combined.maple
+
+# the mmap engine writes the same masked maple files
+mkdir -p out_mmap
+python3 ../../mask_maple.py -l test.list -m mask_multi.bed -C contig.map -d out_mmap -e mmap
+diff -r out out_mmap
+python3 ../../mask_maple.py -i multi.maple -m mask_multi.bed -C contig.map -o combined.maple -e mmap
+cmp expected/multi.maple combined.maple
+rm combined.maple
+
+# without the contig map no header matches a chromosome of the .bed file: warned about, not masked
+python3 ../../mask_maple.py -i multi.maple -m mask_multi.bed -o combined.maple 2> combined.stderr
+cmp multi.maple combined.maple
+test "$(grep -c "^Warning: maple header '>multi_[12]' matches no chromosome of the .bed file" combined.stderr)" = 2
+rm combined.maple combined.stderr
+
+# a .bed file of a single chromosome masks a maple file of one header whatever the header, and no header of a maple
+# file of several
+grep -P '^chr1\t' mask_multi.bed > chr1.bed
+sed -n '1,/^>multi_2/p' multi.maple | sed '$d' > one.maple
+python3 ../../mask_maple.py -i one.maple -m chr1.bed -o one_masked.maple
+python3 ../../mask_maple.py -i one.maple -m chr1.bed -c chr1 -o one_contig.maple
+cmp one_contig.maple one_masked.maple
+! cmp -s one.maple one_masked.maple
+for engine in python numpy mmap; do
+    python3 ../../mask_maple.py -i multi.maple -m chr1.bed -o combined.maple -e $engine 2> combined.stderr
+    cmp multi.maple combined.maple
+    test "$(grep -c "^Warning: maple header '>multi_[12]' matches no chromosome of the .bed file" combined.stderr)" = 2
+done
+rm chr1.bed one.maple one_masked.maple one_contig.maple combined.maple combined.stderr
+
+# a missing list of maple files or .bed file is an error, exit code 1
+status=0
+python3 ../../mask_maple.py -l missing.list -m mask_multi.bed -C contig.map -d out > missing.stdout || status=$?
+test "$status" = 1
+grep -q '^Error: The file was not found' missing.stdout
+status=0
+python3 ../../mask_maple.py -l test.list -m missing.bed -C contig.map -d out > missing.stdout || status=$?
+test "$status" = 1
+grep -q '^Error: The file was not found' missing.stdout
+rm missing.stdout